@@ -0,0 +1,236 @@
+"""Offline benchmark suite for every pipeline stage.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run_benchmarks --sizes 1000,10000
+    python -m benchmarks.run_benchmarks --sizes 1000 --save-baseline
+    python -m benchmarks.run_benchmarks --sizes 1000 --baseline benchmarks/baselines/baseline.json
+
+Each benchmark is run ``--repeat`` times on a deterministic synthetic corpus
+(see benchmarks/synthetic.py); the median wall time is stored per
+``<benchmark>@<rules>`` key. With ``--baseline`` the run exits non-zero if any
+benchmark is slower than the baseline by more than ``--threshold``.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import ensure_corpus
+from scripts.attack_path import compute_path_coverage
+from scripts.coupling_graph import CouplingGraph, community_table, louvain, node_table
+from scripts.hierarchy import rollup_sigma_maps
+from scripts.metrics import (
+    compute_coverage,
+    compute_logsource_telemetry_metrics,
+    compute_rule_density,
+    compute_segment_coverage,
+    compute_technique_coupling,
+    compute_weighted_metrics,
+)
+from scripts.parse_mitre import get_cloud_techniques, get_lateral_techniques, load_mitre
+from scripts.parse_sigma import extract_sigma_mappings
+from scripts.semantic_clustering import build_rule_corpus
+from scripts.taxonomy import load_taxonomy
+from scripts.telemetry_gap import compute_telemetry_gap
+
+BASELINE_DIR = os.path.join("benchmarks", "baselines")
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "baseline.json")
+
+
+def _quiet(func, *args, **kwargs):
+    # Pipeline functions print progress lines; keep them out of the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def _time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _quiet(func)
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "repeat": repeat,
+    }
+
+
+def _bench_clustering(rule_meta):
+    paths, texts = build_rule_corpus(rule_meta, max_rules=len(rule_meta))
+    try:
+        from sklearn.cluster import KMeans
+        from sklearn.feature_extraction.text import HashingVectorizer
+    except ImportError:
+        return paths
+    # Sentence embeddings need a model download, so the benchmark clusters
+    # hashed bag-of-words vectors instead; it still exercises corpus building
+    # and KMeans at the configured scale.
+    emb = HashingVectorizer(n_features=256).fit_transform(texts)
+    KMeans(n_clusters=10, random_state=42, n_init=3).fit_predict(emb)
+    return paths
+
+
+def _bench_communities(sigma_map, techniques):
+    graph = CouplingGraph.from_sigma_map(sigma_map)
+    df_nodes = node_table(graph, louvain(graph))
+    return community_table(graph, df_nodes, sigma_map, techniques)
+
+
+def build_benchmarks(mitre_path, rules_dir):
+    """Return an ordered list of (name, zero-arg callable) for one corpus."""
+    all_tech = _quiet(load_mitre, mitre_path)
+    cloud = get_cloud_techniques(all_tech)
+    lateral = get_lateral_techniques(all_tech)
+    sigma_map, rule_meta = _quiet(extract_sigma_mappings, rules_dir)
+
+    return [
+        ("load_mitre", lambda: load_mitre(mitre_path)),
+        ("segment_techniques", lambda: (get_cloud_techniques(all_tech), get_lateral_techniques(all_tech))),
+        ("segment_coverage", lambda: compute_segment_coverage(all_tech, sigma_map, load_taxonomy())),
+        ("parse_sigma", lambda: extract_sigma_mappings(rules_dir)),
+        ("rollup", lambda: rollup_sigma_maps(sigma_map, all_tech)),
+        ("coverage", lambda: compute_coverage(all_tech, sigma_map)),
+        ("rule_density", lambda: compute_rule_density(all_tech, sigma_map)),
+        ("weighted_metrics", lambda: compute_weighted_metrics(all_tech, sigma_map)),
+        (
+            "logsource_telemetry_metrics",
+            lambda: compute_logsource_telemetry_metrics(all_tech, sigma_map, rule_meta),
+        ),
+        ("technique_coupling", lambda: compute_technique_coupling(sigma_map, min_shared=2)),
+        ("coupling_communities", lambda: _bench_communities(sigma_map, all_tech)),
+        ("path_coverage", lambda: (compute_path_coverage(cloud, sigma_map), compute_path_coverage(lateral, sigma_map))),
+        ("telemetry_gap", lambda: compute_telemetry_gap(all_tech, sigma_map, rule_meta)),
+        ("clustering", lambda: _bench_clustering(rule_meta)),
+    ]
+
+
+def run_suite(sizes, n_techniques=600, repeat=3, seed=42, work_dir=None, only=None):
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), "dcahap-bench")
+    results = {}
+    failed = {}
+    for n_rules in sizes:
+        mitre_path, rules_dir = ensure_corpus(work_dir, n_rules, n_techniques=n_techniques, seed=seed)
+        for name, func in build_benchmarks(mitre_path, rules_dir):
+            if only and name not in only:
+                continue
+            key = f"{name}@{n_rules}"
+            try:
+                results[key] = _time(func, repeat)
+            except Exception as exc:
+                failed[key] = f"{type(exc).__name__}: {exc}"
+                print(f"[!] {key} failed: {failed[key]}")
+                continue
+            print(f"  {key:<40} {results[key]['median_s'] * 1e3:10.2f} ms")
+
+    return {
+        "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "techniques": n_techniques,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+        "failed": failed,
+    }
+
+
+def compare(current, baseline, threshold=0.25):
+    """Check a run against a baseline.
+
+    Returns (regressions, missing): regressions are [(key, baseline_s,
+    current_s, ratio)] for benchmarks slower than the threshold, missing are
+    baseline keys the current run did not produce (renamed or crashed
+    benchmarks). Both fail the regression gate."""
+    regressions = []
+    missing = []
+    for key, base in baseline.get("results", {}).items():
+        cur = current["results"].get(key)
+        if not cur:
+            missing.append(key)
+            continue
+        if base["median_s"] <= 0:
+            continue
+        ratio = cur["median_s"] / base["median_s"]
+        if ratio > 1.0 + threshold:
+            regressions.append((key, base["median_s"], cur["median_s"], ratio))
+    return regressions, missing
+
+
+def _selected(baseline, sizes, only):
+    """The part of a baseline covered by this run's --sizes / --only selection."""
+    results = {}
+    for key, value in baseline.get("results", {}).items():
+        name, _, n_rules = key.rpartition("@")
+        if int(n_rules) in sizes and (not only or name in only):
+            results[key] = value
+    return {**baseline, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline pipeline benchmarks")
+    parser.add_argument("--sizes", default="1000", help="comma-separated rule counts, e.g. 1000,10000,100000")
+    parser.add_argument("--techniques", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=None, help="where synthetic corpora are generated and reused")
+    parser.add_argument("--only", default=None, help="comma-separated benchmark names to run")
+    parser.add_argument("--out", default=None, help="write results JSON to this path")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store results as {DEFAULT_BASELINE}")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = set(args.only.split(",")) if args.only else None
+    print(f"[+] Running benchmarks for sizes {sizes} (repeat={args.repeat})")
+    current = run_suite(
+        sizes,
+        n_techniques=args.techniques,
+        repeat=args.repeat,
+        seed=args.seed,
+        work_dir=args.work_dir,
+        only=only,
+    )
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"[+] Saved benchmark results to {args.out}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(DEFAULT_BASELINE, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"[+] Saved baseline to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions, missing = compare(current, _selected(baseline, sizes, only), args.threshold)
+        if regressions:
+            print(f"[!] {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}:")
+            for key, base, cur, ratio in regressions:
+                print(f"    {key:<40} {base * 1e3:10.2f} ms -> {cur * 1e3:10.2f} ms ({ratio:.2f}x)")
+        if missing:
+            print(f"[!] {len(missing)} baseline benchmark(s) missing from this run:")
+            for key in missing:
+                print(f"    {key}")
+        if regressions or missing:
+            return 1
+        print("[+] No regressions against baseline.")
+    return 1 if current["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
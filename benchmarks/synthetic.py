@@ -0,0 +1,290 @@
+"""Deterministic synthetic ATT&CK bundles and Sigma rule trees for offline benchmarks."""
+import json
+import os
+import random
+import uuid
+
+# Bump when the generated content changes so cached corpora are regenerated.
+CORPUS_VERSION = 2
+
+TACTICS = [
+    "reconnaissance",
+    "resource-development",
+    "initial-access",
+    "execution",
+    "persistence",
+    "privilege-escalation",
+    "defense-evasion",
+    "credential-access",
+    "discovery",
+    "lateral-movement",
+    "collection",
+    "command-and-control",
+    "exfiltration",
+    "impact",
+]
+
+# (platform set, weight) - roughly the platform mix of the Enterprise matrix.
+PLATFORM_PROFILES = [
+    (["Windows"], 30),
+    (["Windows", "Linux", "macOS"], 25),
+    (["Linux", "macOS"], 8),
+    (["IaaS", "SaaS", "Office 365", "Azure AD", "Google Workspace"], 10),
+    (["IaaS"], 5),
+    (["Azure AD", "Office 365"], 5),
+    (["Containers"], 3),
+    (["Network"], 4),
+    (["PRE"], 5),
+    (["Windows", "IaaS", "Linux"], 5),
+]
+
+# (logsource, weight, detection fields) - roughly the SigmaHQ folder mix.
+LOGSOURCE_PROFILES = [
+    ({"product": "windows", "category": "process_creation"}, 40, ["Image", "CommandLine", "ParentImage"]),
+    ({"product": "windows", "category": "registry_set"}, 8, ["TargetObject", "Details"]),
+    ({"product": "windows", "category": "file_event"}, 6, ["TargetFilename", "Image"]),
+    ({"product": "windows", "service": "security"}, 8, ["EventID", "LogonType", "TargetUserName"]),
+    ({"product": "windows", "category": "network_connection"}, 4, ["DestinationPort", "DestinationIp", "Image"]),
+    ({"product": "windows", "category": "ps_script"}, 6, ["ScriptBlockText"]),
+    ({"product": "linux", "category": "process_creation"}, 7, ["Image", "CommandLine"]),
+    ({"product": "aws", "service": "cloudtrail"}, 6, ["eventSource", "eventName", "userIdentity.type"]),
+    ({"product": "azure", "service": "signinlogs"}, 3, ["ResultType", "AppDisplayName"]),
+    ({"product": "gcp", "service": "gcp.audit"}, 2, ["gcp.audit.method_name"]),
+    ({"category": "proxy"}, 3, ["c-uri", "cs-host"]),
+    ({"category": "dns"}, 2, ["query"]),
+    ({"product": "m365", "service": "threat_management"}, 1, ["eventName"]),
+]
+
+# Real ATT&CK data sources and components, so the logsource mapping in
+# scripts/telemetry_gap.py resolves most of them and leaves a realistic gap.
+DATA_SOURCES = {
+    "Process": [
+        "Process Creation",
+        "Process Access",
+        "Process Termination",
+        "Process Modification",
+        "OS API Execution",
+    ],
+    "Command": ["Command Execution"],
+    "Script": ["Script Execution"],
+    "Module": ["Module Load"],
+    "Driver": ["Driver Load", "Driver Metadata"],
+    "File": ["File Creation", "File Modification", "File Deletion", "File Access", "File Metadata"],
+    "Windows Registry": [
+        "Windows Registry Key Creation",
+        "Windows Registry Key Modification",
+        "Windows Registry Key Deletion",
+        "Windows Registry Key Access",
+    ],
+    "Network Traffic": ["Network Connection Creation", "Network Traffic Flow", "Network Traffic Content"],
+    "Logon Session": ["Logon Session Creation", "Logon Session Metadata"],
+    "User Account": ["User Account Authentication", "User Account Modification", "User Account Creation"],
+    "Active Directory": [
+        "Active Directory Object Access",
+        "Active Directory Object Modification",
+        "Active Directory Credential Request",
+    ],
+    "Scheduled Job": ["Scheduled Job Creation", "Scheduled Job Modification"],
+    "Service": ["Service Creation", "Service Modification", "Service Metadata"],
+    "WMI": ["WMI Creation"],
+    "Named Pipe": ["Named Pipe Metadata"],
+    "Application Log": ["Application Log Content"],
+    "Cloud Service": ["Cloud Service Modification", "Cloud Service Disable", "Cloud Service Enumeration"],
+    "Cloud Storage": ["Cloud Storage Access", "Cloud Storage Modification", "Cloud Storage Creation"],
+    "Instance": ["Instance Creation", "Instance Modification", "Instance Start"],
+    "Container": ["Container Creation", "Container Start"],
+    "Pod": ["Pod Creation"],
+    "Drive": ["Drive Access", "Drive Creation"],
+    "Firmware": ["Firmware Modification"],
+    "Sensor Health": ["Host Status"],
+}
+
+MODIFIERS = ["", "|contains", "|endswith", "|startswith", "|contains|all", "|re"]
+
+WORDS = (
+    "powershell cmd rundll32 regsvr32 mshta certutil bitsadmin wmic schtasks net "
+    "psexec winrm ssh rdp smb admin token secret bucket policy role console login "
+    "encoded download invoke payload dump lsass registry run service remote share"
+).split()
+
+
+def _weighted(rng, profiles):
+    return rng.choices(profiles, weights=[p[1] for p in profiles], k=1)[0]
+
+
+def _stable_uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_stix_bundle(path, n_techniques=600, seed=42):
+    """Write an ATT&CK-like STIX bundle and return the technique IDs it contains.
+
+    About 60% of the techniques are sub-techniques of an earlier parent, and
+    each technique is linked to data components via ``detects`` relationships."""
+    rng = random.Random(seed)
+    objects = []
+
+    data_components = []
+    for ds_name, dc_names in DATA_SOURCES.items():
+        ds_ref = f"x-mitre-data-source--{_stable_uuid(rng)}"
+        objects.append({"type": "x-mitre-data-source", "id": ds_ref, "name": ds_name})
+        for dc_name in dc_names:
+            dc_ref = f"x-mitre-data-component--{_stable_uuid(rng)}"
+            objects.append(
+                {
+                    "type": "x-mitre-data-component",
+                    "id": dc_ref,
+                    "name": dc_name,
+                    "x_mitre_data_source_ref": ds_ref,
+                }
+            )
+            data_components.append(dc_ref)
+
+    tech_ids = []
+    parents = []
+    next_parent = 1000
+    for _ in range(n_techniques):
+        if parents and rng.random() < 0.6:
+            parent = rng.choice(parents)
+            parent["subs"] += 1
+            tech_id = f"{parent['id']}.{parent['subs']:03d}"
+            is_sub = True
+        else:
+            tech_id = f"T{next_parent}"
+            next_parent += 1
+            parents.append({"id": tech_id, "subs": 0})
+            is_sub = False
+
+        platforms = _weighted(rng, PLATFORM_PROFILES)[0]
+        phases = rng.sample(TACTICS, k=rng.choices([1, 2, 3], weights=[70, 25, 5])[0])
+        if rng.random() < 0.04 and "lateral-movement" not in phases:
+            phases.append("lateral-movement")
+
+        stix_id = f"attack-pattern--{_stable_uuid(rng)}"
+        objects.append(
+            {
+                "type": "attack-pattern",
+                "id": stix_id,
+                "name": " ".join(rng.choices(WORDS, k=3)).title(),
+                "description": " ".join(rng.choices(WORDS, k=rng.randint(20, 120))),
+                "x_mitre_detection": " ".join(rng.choices(WORDS, k=rng.randint(0, 150))),
+                "x_mitre_platforms": list(platforms),
+                "x_mitre_is_subtechnique": is_sub,
+                "kill_chain_phases": [
+                    {"kill_chain_name": "mitre-attack", "phase_name": p} for p in phases
+                ],
+                "external_references": [
+                    {"source_name": "mitre-attack", "external_id": tech_id}
+                ],
+                "revoked": rng.random() < 0.02,
+                "x_mitre_deprecated": rng.random() < 0.03,
+            }
+        )
+        for dc_ref in rng.sample(data_components, k=rng.randint(0, 4)):
+            objects.append(
+                {
+                    "type": "relationship",
+                    "id": f"relationship--{_stable_uuid(rng)}",
+                    "relationship_type": "detects",
+                    "source_ref": dc_ref,
+                    "target_ref": stix_id,
+                }
+            )
+        tech_ids.append(tech_id)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "bundle", "id": f"bundle--{_stable_uuid(rng)}", "objects": objects}, f)
+    return tech_ids
+
+
+def _render_rule(rng, tech_ids, weights):
+    logsource, _, fields = _weighted(rng, LOGSOURCE_PROFILES)
+    n_tags = rng.choices([1, 2, 3], weights=[60, 30, 10])[0]
+    tags = {t.lower() for t in rng.choices(tech_ids, weights=weights, k=n_tags)}
+
+    lines = [
+        f"title: {' '.join(rng.choices(WORDS, k=4)).title()}",
+        f"id: {_stable_uuid(rng)}",
+        "status: test",
+        f"date: {rng.randint(2017, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    ]
+    if rng.random() < 0.5:
+        lines.append(f"modified: {rng.randint(2020, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+    lines.append("tags:")
+    tactic = rng.choice(TACTICS).replace("-", "_")
+    lines.append(f"    - attack.{tactic}")
+    lines.extend(f"    - attack.{t}" for t in sorted(tags))
+    lines.append("logsource:")
+    lines.extend(f"    {k}: {v}" for k, v in logsource.items())
+    lines.append("detection:")
+
+    selections = []
+    for s in range(rng.choices([1, 2, 3], weights=[55, 35, 10])[0]):
+        name = f"selection_{s}"
+        selections.append(name)
+        lines.append(f"    {name}:")
+        for field in rng.sample(fields, k=rng.randint(1, len(fields))):
+            mod = rng.choice(MODIFIERS)
+            values = rng.sample(WORDS, k=rng.randint(1, 4))
+            lines.append(f"        {field}{mod}:")
+            lines.extend(f"            - '{v}'" for v in values)
+    if rng.random() < 0.3:
+        lines.append("    filter:")
+        lines.append(f"        {fields[0]}|contains: '{rng.choice(WORDS)}'")
+        condition = "1 of selection_* and not filter"
+    elif len(selections) > 1:
+        condition = " or ".join(selections)
+    else:
+        condition = selections[0]
+    lines.append(f"    condition: {condition}")
+    lines.append(f"level: {rng.choice(['low', 'medium', 'high', 'critical'])}")
+
+    folder = logsource.get("product") or logsource.get("category")
+    sub = logsource.get("category") or logsource.get("service") or "generic"
+    return os.path.join(folder, sub), "\n".join(lines) + "\n"
+
+
+def generate_sigma_tree(root, tech_ids, n_rules=1000, seed=42, broken_ratio=0.001):
+    """Write ``n_rules`` Sigma YAML files under ``root/rules`` and return that directory.
+
+    Technique popularity follows a Zipf-like curve so a few techniques attract
+    most rules, as in SigmaHQ. A small share of files is left unparsable to
+    exercise the error path."""
+    rng = random.Random(seed)
+    rules_dir = os.path.join(root, "rules")
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(tech_ids))]
+    shuffled = list(tech_ids)
+    rng.shuffle(shuffled)
+
+    created = set()
+    for i in range(n_rules):
+        subdir, text = _render_rule(rng, shuffled, weights)
+        out_dir = os.path.join(rules_dir, subdir)
+        if out_dir not in created:
+            os.makedirs(out_dir, exist_ok=True)
+            created.add(out_dir)
+        if rng.random() < broken_ratio:
+            text = "title: [unterminated\n"
+        with open(os.path.join(out_dir, f"rule_{i:06d}.yml"), "w", encoding="utf-8") as f:
+            f.write(text)
+    return rules_dir
+
+
+def ensure_corpus(work_dir, n_rules, n_techniques=600, seed=42):
+    """Generate (or reuse) a corpus keyed by the generator version, size and seed.
+
+    Returns (mitre_path, rules_dir)."""
+    corpus_dir = os.path.join(work_dir, f"corpus_v{CORPUS_VERSION}_t{n_techniques}_r{n_rules}_s{seed}")
+    mitre_path = os.path.join(corpus_dir, "enterprise-attack.json")
+    marker = os.path.join(corpus_dir, ".complete")
+    rules_dir = os.path.join(corpus_dir, "sigma", "rules")
+    if os.path.exists(marker):
+        return mitre_path, rules_dir
+
+    print(f"[+] Generating synthetic corpus: {n_techniques} techniques, {n_rules} rules")
+    tech_ids = generate_stix_bundle(mitre_path, n_techniques=n_techniques, seed=seed)
+    generate_sigma_tree(os.path.join(corpus_dir, "sigma"), tech_ids, n_rules=n_rules, seed=seed)
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write("ok\n")
+    return mitre_path, rules_dir
@@ -1,17 +1,21 @@
+import argparse
 import os
 
-from scripts.download_mitre import download_mitre
+from scripts import profiling
+from scripts.profiling import stage
+from scripts.download_mitre import DOMAINS, download_mitre
 from scripts.download_sigma import download_sigma
-from scripts.parse_mitre import (
-    load_mitre,
-    get_cloud_techniques,
-    get_lateral_techniques,
-)
-from scripts.parse_sigma import extract_sigma_mappings
+from scripts.parse_mitre import load_mitre
+from scripts.parse_sigma import extract_sigma_mappings, resolve_roots
+from scripts.hierarchy import ROLLUP_MODES, rollup_rule_meta, rollup_sigma_map
+from scripts.taxonomy import TAXONOMY_FILE, load_taxonomy
+from scripts.rule_index import load_or_build_index
+from scripts.coupling_graph import COMMUNITY_METHODS, CouplingGraph, community_table, node_table
 from scripts.metrics import (
-    compute_coverage,
     compute_rule_density,
     compute_logsource_telemetry_metrics,
+    compute_origin_metrics,
+    compute_segment_coverage,
     compute_weighted_metrics,
     compute_technique_coupling,
 )
@@ -23,121 +27,335 @@ from scripts.visualize_advanced import (
     histogram_coupling,
 )
 from scripts.semantic_clustering import run_clustering
+from scripts.results_store import FORMATS, RESULTS_DIR, ResultsStore
+from scripts.results import PipelineResults
+from scripts.plot_lorenz import run_lorenz
+from scripts.export_latex import run_latex_export
+from scripts.timeline_analysis import run_timeline
+from scripts.sigma_eval import (
+    compute_empirical_coverage,
+    find_event_files,
+    print_replay_stats,
+    replay_events,
+    rule_hits_table,
+)
+from scripts.rule_dedup import compute_dedup_metrics, dedup_sigma_map, find_duplicate_rules
 from scripts.attack_path import compute_path_coverage
 from scripts.telemetry_gap import compute_telemetry_gap
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detection coverage analysis pipeline")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="output/profile",
+        default=None,
+        metavar="DIR",
+        help="record per-stage timings/memory and write a JSON summary and Chrome trace to DIR",
+    )
+    parser.add_argument(
+        "--no-trace-memory",
+        action="store_true",
+        help="with --profile, skip tracemalloc peak-memory tracking",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=sorted(FORMATS),
+        default="parquet",
+        help="table format of the consolidated results store under output/results",
+    )
+    parser.add_argument(
+        "--csv",
+        action="store_true",
+        help="also export the flat output/*.csv files",
+    )
+    parser.add_argument(
+        "--attack-mirror",
+        default=None,
+        metavar="URL_OR_DIR",
+        help="fetch ATT&CK bundles from this base URL or directory instead of GitHub",
+    )
+    parser.add_argument(
+        "--attack-domains",
+        nargs="+",
+        choices=DOMAINS,
+        default=["enterprise-attack"],
+        help="ATT&CK domains to download (fetched in parallel)",
+    )
+    parser.add_argument(
+        "--sigma-mirror",
+        default=None,
+        metavar="GIT_REMOTE",
+        help="clone/pull Sigma from this git remote or local clone instead of GitHub",
+    )
+    parser.add_argument(
+        "--rules-root",
+        action="append",
+        default=None,
+        metavar="[NAME=]PATH",
+        help="Sigma rule repository to ingest (repeatable; earlier roots win on duplicate "
+        "rule ids/content). Default: the SigmaHQ rules under data/sigma",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="processes for parsing rule shards (default: CPU count)",
+    )
+    parser.add_argument(
+        "--taxonomy",
+        default=TAXONOMY_FILE,
+        help="YAML file defining the technique segments (default: config/taxonomy.yml)",
+    )
+    parser.add_argument(
+        "--rollup",
+        choices=ROLLUP_MODES,
+        default="exact",
+        help="attribute sub-technique rules to their parent (parent) or parent rules to "
+        "sub-techniques (children) before computing metrics",
+    )
+    parser.add_argument(
+        "--community",
+        choices=sorted(COMMUNITY_METHODS),
+        default="louvain",
+        help="community detection method for the technique coupling graph",
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=0.8,
+        help="Jaccard similarity above which two rules count as near-duplicates",
+    )
+    parser.add_argument(
+        "--events",
+        nargs="+",
+        default=None,
+        metavar="PATH",
+        help="JSON/JSONL event files or directories to replay through the compiled Sigma rules",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes for event replay (default: CPU count)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        profiling.enable(trace_memory=not args.no_trace_memory)
+
     os.makedirs("output/figures", exist_ok=True)
+    store = ResultsStore(RESULTS_DIR, fmt=args.output_format, csv_export=args.csv)
 
     print("=== STEP 1: Download datasets ===")
-    download_mitre()
-    download_sigma()
+    with stage("download"):
+        download_mitre(domains=args.attack_domains, mirror=args.attack_mirror)
+        download_sigma(mirror=args.sigma_mirror)
 
     print("\n=== STEP 2: Parse MITRE ATT&CK ===")
-    all_tech = load_mitre()
-    cloud = get_cloud_techniques(all_tech)
-    lateral = get_lateral_techniques(all_tech)
-    print(f"[+] Total techniques: {len(all_tech)}")
-    print(f"[+] Cloud techniques (heuristic): {len(cloud)}")
-    print(f"[+] Lateral-movement techniques: {len(lateral)}")
+    with stage("parse_mitre"):
+        all_tech = load_mitre()
+        taxonomy = load_taxonomy(args.taxonomy)
+        membership = taxonomy.membership(all_tech)
+        segments = taxonomy.split(all_tech, membership)
+        print(f"[+] Total techniques: {len(all_tech)}")
+        for name, techs in segments.items():
+            print(f"[+] Segment {name}: {len(techs)} techniques")
+        for name in ("cloud", "lateral"):
+            if name not in segments:
+                print(f"[!] Taxonomy {args.taxonomy} defines no '{name}' segment; its tables will be empty")
+        cloud = segments.get("cloud", [])
+        lateral = segments.get("lateral", [])
 
     print("\n=== STEP 3: Parse Sigma rules ===")
-    sigma_map, rule_meta = extract_sigma_mappings()
+    with stage("parse_sigma"):
+        roots = resolve_roots(args.rules_root)
+        sigma_map, rule_meta = extract_sigma_mappings(roots=roots, workers=args.parse_workers)
+        sigma_map = rollup_sigma_map(sigma_map, all_tech, mode=args.rollup)
+        if args.rollup != "exact":
+            rule_meta = rollup_rule_meta(rule_meta, sigma_map)
+            print(f"[+] Rolled up Sigma mappings ({args.rollup}): {len(sigma_map)} techniques")
+        load_or_build_index(rule_meta, roots=roots)
+        results = PipelineResults(
+            all_tech,
+            segments,
+            sigma_map,
+            rule_meta,
+            store=store,
+        )
 
     print("\n=== STEP 4: Basic metrics ===")
-    cloud_cov, _ = compute_coverage(cloud, sigma_map)
-    lat_cov, _ = compute_coverage(lateral, sigma_map)
-    print(f"[+] Cloud coverage (any rule):   {cloud_cov:.3f}")
-    print(f"[+] Lateral coverage (any rule): {lat_cov:.3f}")
+    with stage("basic_metrics"):
+        df_segments = compute_segment_coverage(all_tech, sigma_map, taxonomy, membership)
+        results.put("segment_coverage", df_segments)
+        for row in df_segments.itertuples():
+            print(f"[+] {row.segment} coverage (any rule): {row.coverage:.3f}")
+        coverage = dict(zip(df_segments["segment"], df_segments["coverage"]))
+        cloud_cov = coverage.get("cloud", 0.0)
+        lat_cov = coverage.get("lateral", 0.0)
 
-    df_cloud_density = compute_rule_density(cloud, sigma_map)
-    df_lat_density = compute_rule_density(lateral, sigma_map)
-    df_cloud_density.to_csv("output/rule_density_cloud.csv", index=False)
-    df_lat_density.to_csv("output/rule_density_lateral.csv", index=False)
-    print("[+] Saved basic density CSVs under output/")
+        df_cloud_density = compute_rule_density(cloud, sigma_map)
+        df_lat_density = compute_rule_density(lateral, sigma_map)
+        results.put("rule_density", df_cloud_density, segment="cloud")
+        results.put("rule_density", df_lat_density, segment="lateral")
+        results.put("origin_metrics", compute_origin_metrics(cloud, sigma_map, rule_meta), segment="cloud")
+        results.put("origin_metrics", compute_origin_metrics(lateral, sigma_map, rule_meta), segment="lateral")
+        print(f"[+] Saved basic density tables under {store.root}")
 
     print("\n=== STEP 5: Advanced per-technique metrics ===")
-    df_cloud_weight = compute_weighted_metrics(cloud, sigma_map)
-    df_lat_weight = compute_weighted_metrics(lateral, sigma_map)
-    df_cloud_logtele = compute_logsource_telemetry_metrics(cloud, sigma_map, rule_meta)
-    df_lat_logtele = compute_logsource_telemetry_metrics(lateral, sigma_map, rule_meta)
+    with stage("advanced_metrics"):
+        df_cloud_weight = compute_weighted_metrics(cloud, sigma_map)
+        df_lat_weight = compute_weighted_metrics(lateral, sigma_map)
+        df_cloud_logtele = compute_logsource_telemetry_metrics(cloud, sigma_map, rule_meta)
+        df_lat_logtele = compute_logsource_telemetry_metrics(lateral, sigma_map, rule_meta)
 
-    df_cloud_full = df_cloud_weight.merge(
-        df_cloud_logtele, on=["technique", "name"], how="left"
-    )
-    df_lat_full = df_lat_weight.merge(
-        df_lat_logtele, on=["technique", "name"], how="left"
-    )
-    df_cloud_full.to_csv("output/technique_metrics_cloud.csv", index=False)
-    df_lat_full.to_csv("output/technique_metrics_lateral.csv", index=False)
-    print("[+] Saved advanced technique metrics under output/")
+        df_cloud_full = df_cloud_weight.merge(
+            df_cloud_logtele, on=["technique", "name"], how="left"
+        )
+        df_lat_full = df_lat_weight.merge(
+            df_lat_logtele, on=["technique", "name"], how="left"
+        )
+        results.put("technique_metrics", df_cloud_full, segment="cloud")
+        results.put("technique_metrics", df_lat_full, segment="lateral")
+        print(f"[+] Saved advanced technique metrics under {store.root}")
 
     print("\n=== STEP 6: Technique coupling ===")
-    df_coupling = compute_technique_coupling(sigma_map, min_shared=2)
-    df_coupling.to_csv("output/technique_coupling.csv", index=False)
-    print("[+] Saved technique_coupling.csv")
+    with stage("coupling"):
+        graph = CouplingGraph.from_sigma_map(sigma_map)
+        df_coupling = compute_technique_coupling(sigma_map, min_shared=2, graph=graph)
+        results.put("technique_coupling", df_coupling)
+        print("[+] Saved technique_coupling table")
 
-    print("\n=== STEP 7: Visualizations (basic) ===")
-    if len(df_cloud_density) and len(df_lat_density):
-        plot_coverage(cloud_cov, lat_cov)
-        plot_rule_density(df_cloud_density, df_lat_density)
-    else:
-        print("[!] Skipping basic plots: density data empty.")
-
-    print("\n=== STEP 8: Visualizations (advanced) ===")
-    if len(df_cloud_full) and len(df_lat_full):
-        scatter_difficulty_vs_rules(
-            df_cloud_full,
-            "Cloud Techniques: Difficulty vs Rule Count",
-            "cloud_difficulty_vs_rules.png",
+        communities = COMMUNITY_METHODS[args.community](graph)
+        df_nodes = node_table(graph, communities, min_shared=2)
+        df_communities = community_table(
+            graph, df_nodes, sigma_map, all_tech, segments=segments
         )
-        scatter_difficulty_vs_rules(
-            df_lat_full,
-            "Lateral Techniques: Difficulty vs Rule Count",
-            "lateral_difficulty_vs_rules.png",
+        results.put("coupling_nodes", df_nodes)
+        results.put("coupling_communities", df_communities)
+        print(
+            f"[+] Coupling graph: {len(graph)} techniques, {graph.n_edges} edges, "
+            f"{len(df_communities)} communities ({args.community})"
         )
-        scatter_weighted_vs_rules(
-            df_cloud_full,
-            "Cloud Techniques: Weighted Rule Score vs Rule Count",
-            "cloud_weighted_vs_rules.png",
+
+        graph.save_npz("output/graph/coupling.npz")
+        graph.write_edgelist("output/graph/coupling_edges.tsv")
+        graph.write_graphml(
+            "output/graph/coupling.graphml",
+            node_attrs={"community": communities, "rule_count": graph.rule_counts, "pagerank": df_nodes["pagerank"].to_numpy()},
         )
-        scatter_weighted_vs_rules(
-            df_lat_full,
-            "Lateral Techniques: Weighted Rule Score vs Rule Count",
-            "lateral_weighted_vs_rules.png",
+        print("[+] Saved coupling graph to output/graph/ (npz, edge list, GraphML)")
+
+    print("\n=== STEP 7: Visualizations (basic) ===")
+    with stage("plots_basic"):
+        if len(df_cloud_density) and len(df_lat_density):
+            plot_coverage(cloud_cov, lat_cov)
+            plot_rule_density(df_cloud_density, df_lat_density)
+        else:
+            print("[!] Skipping basic plots: density data empty.")
+
+    print("\n=== STEP 8: Visualizations (advanced) ===")
+    with stage("plots_advanced"):
+        if len(df_cloud_full) and len(df_lat_full):
+            scatter_difficulty_vs_rules(
+                df_cloud_full,
+                "Cloud Techniques: Difficulty vs Rule Count",
+                "cloud_difficulty_vs_rules.png",
+            )
+            scatter_difficulty_vs_rules(
+                df_lat_full,
+                "Lateral Techniques: Difficulty vs Rule Count",
+                "lateral_difficulty_vs_rules.png",
+            )
+            scatter_weighted_vs_rules(
+                df_cloud_full,
+                "Cloud Techniques: Weighted Rule Score vs Rule Count",
+                "cloud_weighted_vs_rules.png",
+            )
+            scatter_weighted_vs_rules(
+                df_lat_full,
+                "Lateral Techniques: Weighted Rule Score vs Rule Count",
+                "lateral_weighted_vs_rules.png",
+            )
+            boxplot_logsource_telemetry(df_cloud_full, df_lat_full)
+        else:
+            print("[!] Skipping advanced scatter/box plots: technique metrics empty.")
+
+        histogram_coupling(
+            df_coupling,
+            "Technique Coupling Distribution (All Techniques)",
+            "technique_coupling_hist.png",
         )
-        boxplot_logsource_telemetry(df_cloud_full, df_lat_full)
-    else:
-        print("[!] Skipping advanced scatter/box plots: technique metrics empty.")
-
-    histogram_coupling(
-        df_coupling,
-        "Technique Coupling Distribution (All Techniques)",
-        "technique_coupling_hist.png",
-    )
 
     print("\n=== STEP 9: Optional semantic clustering ===")
-    run_clustering(rule_meta)
+    with stage("clustering"):
+        df_clusters = run_clustering(rule_meta, out_csv=None)
+        if df_clusters is not None:
+            results.put("semantic_clusters", df_clusters)
+            print("[+] Saved semantic_clusters table")
 
     print("\n=== STEP 10: Attack Path Coverage (Kill-chain DAG) ===")
-    df_cloud_paths = compute_path_coverage(cloud, sigma_map)
-    df_lat_paths = compute_path_coverage(lateral, sigma_map)
+    with stage("attack_paths"):
+        df_cloud_paths = compute_path_coverage(cloud, sigma_map)
+        df_lat_paths = compute_path_coverage(lateral, sigma_map)
 
-    df_cloud_paths.to_csv("output/attack_paths_cloud.csv", index=False)
-    df_lat_paths.to_csv("output/attack_paths_lateral.csv", index=False)
-    print("[+] Saved attack-path coverage CSVs")
+        results.put("attack_paths", df_cloud_paths, segment="cloud")
+        results.put("attack_paths", df_lat_paths, segment="lateral")
+        print("[+] Saved attack-path coverage tables")
 
     print("\n=== STEP 11: Telemetry Gap Analysis (MITRE vs Sigma) ===")
-    df_cloud_tgap = compute_telemetry_gap(cloud, sigma_map, rule_meta)
-    df_lat_tgap = compute_telemetry_gap(lateral, sigma_map, rule_meta)
+    with stage("telemetry_gap"):
+        df_cloud_tgap = compute_telemetry_gap(cloud, sigma_map, rule_meta)
+        df_lat_tgap = compute_telemetry_gap(lateral, sigma_map, rule_meta)
 
-    df_cloud_tgap.to_csv("output/telemetry_gap_cloud.csv", index=False)
-    df_lat_tgap.to_csv("output/telemetry_gap_lateral.csv", index=False)
-    print("[+] Saved telemetry gap CSVs")
+        results.put("telemetry_gap", df_cloud_tgap, segment="cloud")
+        results.put("telemetry_gap", df_lat_tgap, segment="lateral")
+        print("[+] Saved telemetry gap tables")
+
+    print("\n=== STEP 12: Near-duplicate rules (MinHash/LSH) ===")
+    with stage("rule_dedup"):
+        df_dups = find_duplicate_rules(rule_meta, threshold=args.dedup_threshold)
+        dedup_map = dedup_sigma_map(sigma_map, df_dups)
+        results.put("rule_duplicates", df_dups)
+        results.put("dedup_metrics", compute_dedup_metrics(cloud, sigma_map, dedup_map), segment="cloud")
+        results.put("dedup_metrics", compute_dedup_metrics(lateral, sigma_map, dedup_map), segment="lateral")
+        cloud_dedup_density = compute_rule_density(cloud, dedup_map)
+        lat_dedup_density = compute_rule_density(lateral, dedup_map)
+        print(f"[+] Cloud rules/technique (raw -> dedup):   "
+              f"{df_cloud_density['rule_count'].mean():.2f} -> {cloud_dedup_density['rule_count'].mean():.2f}")
+        print(f"[+] Lateral rules/technique (raw -> dedup): "
+              f"{df_lat_density['rule_count'].mean():.2f} -> {lat_dedup_density['rule_count'].mean():.2f}")
+        print("[+] Saved rule_duplicates and dedup_metrics tables")
+
+    print("\n=== STEP 13: Empirical coverage (Sigma rule replay) ===")
+    with stage("rule_replay"):
+        if args.events:
+            hits, unsupported, replay_stats = replay_events(
+                find_event_files(args.events), rule_meta, workers=args.workers
+            )
+            print_replay_stats(replay_stats)
+            results.put("rule_hits", rule_hits_table(hits, unsupported, rule_meta))
+            results.put("empirical_coverage", compute_empirical_coverage(cloud, sigma_map, hits), segment="cloud")
+            results.put("empirical_coverage", compute_empirical_coverage(lateral, sigma_map, hits), segment="lateral")
+            print("[+] Saved rule_hits and empirical_coverage tables")
+        else:
+            print("[!] No --events given, skipping rule replay.")
+
+    print("\n=== STEP 14: Post-processing (Lorenz, LaTeX, timeline) ===")
+    with stage("post_processing"):
+        run_lorenz(results)
+        run_latex_export(results)
+        run_timeline(results)
 
     print("\n=== DONE ===")
-    print("Check the 'output' directory for CSVs and 'output/figures' for figures.")
+    print(f"Check '{store.root}' for result tables and 'output/figures' for figures.")
+
+    if args.profile:
+        profiling.write_reports(args.profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+import numpy as np
+
+from .profiling import profiled
+
+# Cap on the working memory of one chunk of resamples; resamples are processed
+# in chunks of rows so 10k+ resamples of large segments stay bounded.
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+# float64 buffers alive per resample row at peak: the resample matrix plus one
+# working copy (the int32 index matrix before the gather, or the sort /
+# partition copy inside a statistic), with slack for boolean temporaries.
+# The statistics below avoid further full-size temporaries.
+ROW_BUFFERS = 2.25
+
+
+def _row_gini(matrix):
+    """Gini coefficient of every row; same formula as plot_lorenz.calculate_gini."""
+    values = np.sort(matrix, axis=1)
+    values += 0.0000001
+    n = values.shape[1]
+    weights = 2 * np.arange(1, n + 1) - n - 1.0
+    return (values @ weights) / (n * values.sum(axis=1))
+
+
+STATISTICS = {
+    "coverage": lambda m: (m > 0).mean(axis=1),
+    "mean": lambda m: m.mean(axis=1),
+    "median": lambda m: np.median(m, axis=1),
+    "gini": _row_gini,
+}
+
+
+def _chunk_rows(n, chunk_bytes):
+    return max(1, int(chunk_bytes // max(n * 8 * ROW_BUFFERS, 1)))
+
+
+def _statistic_funcs(statistics):
+    unknown = [s for s in statistics if s not in STATISTICS]
+    if unknown:
+        raise ValueError(f"Unknown statistic(s) {unknown}, expected one of {sorted(STATISTICS)}")
+    return {s: STATISTICS[s] for s in statistics}
+
+
+@profiled("bootstrap_ci")
+def bootstrap_ci(
+    values,
+    statistics=("coverage", "mean", "median", "gini"),
+    n_resamples=10000,
+    ci=0.95,
+    seed=42,
+    chunk_bytes=DEFAULT_CHUNK_BYTES,
+):
+    """Percentile bootstrap confidence intervals for one sample.
+
+    Each chunk draws an (rows x n) index matrix and evaluates every statistic
+    row-wise, so there is no per-resample Python loop.
+
+    Returns {statistic: {"estimate", "low", "high"}}."""
+    values = np.asarray(values, dtype=float)
+    funcs = _statistic_funcs(statistics)
+    n = len(values)
+    if n == 0:
+        return {s: {"estimate": 0.0, "low": 0.0, "high": 0.0} for s in funcs}
+
+    rng = np.random.default_rng(seed)
+    draws = {s: np.empty(n_resamples) for s in funcs}
+    rows = _chunk_rows(n, chunk_bytes)
+    for start in range(0, n_resamples, rows):
+        stop = min(start + rows, n_resamples)
+        index = rng.integers(0, n, size=(stop - start, n), dtype=np.int32 if n < 2**31 else np.int64)
+        sample = values[index]
+        del index
+        for s, func in funcs.items():
+            draws[s][start:stop] = func(sample)
+        del sample  # free before the next chunk's index matrix is drawn
+
+    alpha = (1.0 - ci) / 2.0
+    out = {}
+    for s, func in funcs.items():
+        low, high = np.quantile(draws[s], [alpha, 1.0 - alpha])
+        out[s] = {
+            "estimate": float(func(values[np.newaxis, :])[0]),
+            "low": float(low),
+            "high": float(high),
+        }
+    return out
+
+
+@profiled("permutation_test")
+def permutation_test(
+    a,
+    b,
+    statistics=("coverage", "mean", "median", "gini"),
+    n_permutations=10000,
+    seed=42,
+    chunk_bytes=DEFAULT_CHUNK_BYTES,
+):
+    """Two-sided permutation test for stat(a) - stat(b).
+
+    Returns {statistic: {"diff", "p_value"}}; the p-value uses the (k + 1) / (n + 1)
+    correction so it is never exactly zero."""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    funcs = _statistic_funcs(statistics)
+    if len(a) == 0 or len(b) == 0:
+        return {s: {"diff": 0.0, "p_value": 1.0} for s in funcs}
+
+    pooled = np.concatenate([a, b])
+    n_a = len(a)
+    observed = {
+        s: float(func(a[np.newaxis, :])[0] - func(b[np.newaxis, :])[0])
+        for s, func in funcs.items()
+    }
+    extreme = {s: 0 for s in funcs}
+
+    rng = np.random.default_rng(seed)
+    rows = _chunk_rows(len(pooled), chunk_bytes)
+    for start in range(0, n_permutations, rows):
+        count = min(rows, n_permutations - start)
+        shuffled = rng.permuted(np.broadcast_to(pooled, (count, len(pooled))), axis=1)
+        left, right = shuffled[:, :n_a], shuffled[:, n_a:]
+        for s, func in funcs.items():
+            diffs = func(left) - func(right)
+            # Small tolerance so ties with the observed value count as extreme.
+            extreme[s] += int(np.count_nonzero(np.abs(diffs) >= abs(observed[s]) - 1e-12))
+        del shuffled, left, right
+
+    return {
+        s: {"diff": observed[s], "p_value": (extreme[s] + 1) / (n_permutations + 1)}
+        for s in funcs
+    }
+
+
+def compare_segments(df_a, df_b, column="rule_count", n_resamples=10000, ci=0.95, seed=42):
+    """Bootstrap CIs for both segments plus permutation p-values for their difference."""
+    a = df_a[column].to_numpy()
+    b = df_b[column].to_numpy()
+    return {
+        "a": bootstrap_ci(a, n_resamples=n_resamples, ci=ci, seed=seed),
+        "b": bootstrap_ci(b, n_resamples=n_resamples, ci=ci, seed=seed + 1),
+        "test": permutation_test(a, b, n_permutations=n_resamples, seed=seed + 2),
+        "ci": ci,
+        "n_resamples": n_resamples,
+    }
@@ -0,0 +1,330 @@
+"""Sparse technique coupling graph, community detection and centrality.
+
+Nodes are techniques, and an edge weight is the number of Sigma rules two
+techniques share. The graph is held as a symmetric CSR adjacency (indptr /
+indices / data NumPy arrays) and built from the technique x rule incidence
+in one pass. It is saved in the same .npz layout as
+``scipy.sparse.save_npz``, so ``scipy.sparse.load_npz`` reads it directly.
+GraphML and edge-list exports are streamed edge by edge.
+
+Louvain (modularity), label propagation and PageRank all work on the CSR
+arrays directly, so no graph library is required.
+"""
+import os
+from collections import Counter
+from itertools import combinations
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+import pandas as pd
+
+from .profiling import profiled
+
+
+class CouplingGraph:
+    """Symmetric weighted technique graph in CSR form."""
+
+    def __init__(self, labels, indptr, indices, data, rule_counts=None):
+        self.labels = list(labels)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.rule_counts = rule_counts if rule_counts is not None else np.zeros(len(self.labels), dtype=np.int64)
+
+    @classmethod
+    @profiled("build_coupling_graph")
+    def from_sigma_map(cls, sigma_map):
+        labels = list(sigma_map)
+        n = len(labels)
+        by_rule = {}
+        rule_counts = np.zeros(n, dtype=np.int64)
+        for node, tid in enumerate(labels):
+            rules = set(sigma_map[tid])
+            rule_counts[node] = len(rules)
+            for rule in rules:
+                by_rule.setdefault(rule, []).append(node)
+
+        keys = [i * n + j for nodes in by_rule.values() if len(nodes) > 1 for i, j in combinations(nodes, 2)]
+        keys, weights = np.unique(np.asarray(keys, dtype=np.int64), return_counts=True)
+        rows, cols = keys // n, keys % n
+        # Store both directions so every row lists all of its neighbours.
+        return cls.from_edges(labels, np.concatenate([rows, cols]), np.concatenate([cols, rows]),
+                              np.concatenate([weights, weights]), rule_counts)
+
+    @classmethod
+    def from_edges(cls, labels, rows, cols, weights, rule_counts=None):
+        n = len(labels)
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return cls(labels, indptr, cols[order].astype(np.int32), weights[order].astype(np.float64), rule_counts)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def n_edges(self):
+        return int((self.row_ids() < self.indices).sum())
+
+    def row_ids(self):
+        return np.repeat(np.arange(len(self.labels)), np.diff(self.indptr))
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def strength(self):
+        """Weighted degree (self-loops included once per direction stored)."""
+        return np.bincount(self.row_ids(), weights=self.data, minlength=len(self.labels))
+
+    # -- persistence / export ------------------------------------------------
+
+    def save_npz(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            format=np.array(b"csr"),
+            shape=np.array([len(self.labels), len(self.labels)]),
+            indptr=self.indptr,
+            indices=self.indices,
+            data=self.data,
+            labels=np.array(self.labels, dtype=str),
+            rule_counts=self.rule_counts,
+        )
+        return path
+
+    @classmethod
+    def load_npz(cls, path):
+        with np.load(path) as f:
+            return cls(f["labels"].tolist(), f["indptr"], f["indices"], f["data"], f["rule_counts"])
+
+    def iter_edges(self):
+        """(source label, target label, weight) for each undirected edge once."""
+        labels = self.labels
+        for i in range(len(labels)):
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                j = self.indices[k]
+                if i < j:
+                    yield labels[i], labels[j], self.data[k]
+
+    def write_edgelist(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("source\ttarget\tweight\n")
+            for a, b, w in self.iter_edges():
+                f.write(f"{a}\t{b}\t{w:g}\n")
+        return path
+
+    def write_graphml(self, path, node_attrs=None):
+        """Stream GraphML; ``node_attrs`` maps attribute name -> per-node array."""
+        node_attrs = node_attrs or {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+            f.write('  <key id="weight" for="edge" attr.name="weight" attr.type="double"/>\n')
+            for name, values in node_attrs.items():
+                kind = "double" if np.issubdtype(np.asarray(values).dtype, np.floating) else "long"
+                f.write(f'  <key id={quoteattr(name)} for="node" attr.name={quoteattr(name)} attr.type="{kind}"/>\n')
+            f.write('  <graph id="coupling" edgedefault="undirected">\n')
+            for i, label in enumerate(self.labels):
+                f.write(f"    <node id={quoteattr(label)}>")
+                for name, values in node_attrs.items():
+                    f.write(f"<data key={quoteattr(name)}>{values[i]}</data>")
+                f.write("</node>\n")
+            for a, b, w in self.iter_edges():
+                f.write(
+                    f'    <edge source={quoteattr(a)} target={quoteattr(b)}><data key="weight">{w:g}</data></edge>\n'
+                )
+            f.write("  </graph>\n</graphml>\n")
+        return path
+
+
+# -- community detection ------------------------------------------------------
+
+
+def modularity(graph, membership, resolution=1.0):
+    m2 = graph.data.sum()
+    if m2 == 0:
+        return 0.0
+    rows = graph.row_ids()
+    internal = graph.data[membership[rows] == membership[graph.indices]].sum()
+    tot = np.bincount(membership, weights=graph.strength())
+    return float(internal / m2 - resolution * (tot ** 2).sum() / m2 ** 2)
+
+
+def _louvain_pass(indptr, indices, data, strength, m2, resolution, order):
+    """Local-moving phase: move nodes to the neighbouring community with the
+    best modularity gain until no move improves it."""
+    n = len(strength)
+    comm = list(range(n))
+    tot = strength.tolist()
+    indptr, indices, data = indptr.tolist(), indices.tolist(), data.tolist()
+    k = tot[:]
+    moved = False
+    improved = True
+    while improved:
+        improved = False
+        for i in order:
+            ci = comm[i]
+            ki = k[i]
+            links = {}
+            for p in range(indptr[i], indptr[i + 1]):
+                j = indices[p]
+                if j != i:
+                    cj = comm[j]
+                    links[cj] = links.get(cj, 0.0) + data[p]
+            tot[ci] -= ki
+            scale = resolution * ki / m2
+            best, best_gain = ci, links.get(ci, 0.0) - tot[ci] * scale
+            for c, w in links.items():
+                gain = w - tot[c] * scale
+                if gain > best_gain + 1e-12:
+                    best, best_gain = c, gain
+            tot[best] += ki
+            if best != ci:
+                comm[i] = best
+                improved = moved = True
+    return np.asarray(comm), moved
+
+
+@profiled("louvain")
+def louvain(graph, resolution=1.0, seed=42):
+    """Louvain community detection; returns a community id per node."""
+    n = len(graph)
+    membership = np.arange(n)
+    m2 = graph.data.sum()
+    if m2 == 0:
+        return membership
+    rng = np.random.default_rng(seed)
+    indptr, indices, data = graph.indptr, graph.indices, graph.data
+    strength = graph.strength()
+    while True:
+        comm, moved = _louvain_pass(indptr, indices, data, strength, m2, resolution, rng.permutation(len(strength)).tolist())
+        if not moved:
+            break
+        _, comm = np.unique(comm, return_inverse=True)
+        membership = comm[membership]
+        # Aggregate: one node per community, edge weights summed (self-loops
+        # keep the internal weight so strengths are preserved).
+        size = comm.max() + 1
+        rows = np.repeat(np.arange(len(strength)), np.diff(indptr))
+        keys, inverse = np.unique(comm[rows] * size + comm[indices], return_inverse=True)
+        weights = np.bincount(inverse, weights=data)
+        agg = CouplingGraph.from_edges(range(size), keys // size, keys % size, weights)
+        indptr, indices, data = agg.indptr, agg.indices, agg.data
+        strength = agg.strength()
+    return membership
+
+
+@profiled("label_propagation")
+def label_propagation(graph, max_iter=100, seed=42):
+    """Weighted asynchronous label propagation; returns a community id per node."""
+    n = len(graph)
+    labels = list(range(n))
+    indptr, indices, data = graph.indptr.tolist(), graph.indices.tolist(), graph.data.tolist()
+    rng = np.random.default_rng(seed)
+    for _ in range(max_iter):
+        changed = False
+        for i in rng.permutation(n).tolist():
+            weights = {}
+            for p in range(indptr[i], indptr[i + 1]):
+                j = indices[p]
+                if j != i:
+                    weights[labels[j]] = weights.get(labels[j], 0.0) + data[p]
+            if not weights:
+                continue
+            top = max(weights.values())
+            if weights.get(labels[i]) == top:
+                continue
+            labels[i] = min(lab for lab, w in weights.items() if w == top)
+            changed = True
+        if not changed:
+            break
+    _, membership = np.unique(labels, return_inverse=True)
+    return membership
+
+
+COMMUNITY_METHODS = {"louvain": louvain, "label_propagation": label_propagation}
+
+
+@profiled("pagerank")
+def pagerank(graph, damping=0.85, tol=1e-10, max_iter=200):
+    """Weighted PageRank by power iteration over the CSR arrays."""
+    n = len(graph)
+    if n == 0:
+        return np.zeros(0)
+    rows = graph.row_ids()
+    strength = graph.strength()
+    dangling = strength == 0
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        share = np.divide(x, strength, out=np.zeros(n), where=~dangling)
+        nxt = np.bincount(rows, weights=graph.data * share[graph.indices], minlength=n)
+        nxt = damping * (nxt + x[dangling].sum() / n) + (1.0 - damping) / n
+        if np.abs(nxt - x).sum() < tol:
+            return nxt
+        x = nxt
+    return x
+
+
+# -- tables -------------------------------------------------------------------
+
+
+def node_table(graph, membership, min_shared=2):
+    """Per-technique community, centrality and coupling score."""
+    strong = graph.data >= min_shared
+    return pd.DataFrame(
+        {
+            "technique": graph.labels,
+            "community": membership,
+            "rule_count": graph.rule_counts,
+            "degree": graph.degree(),
+            "strength": graph.strength(),
+            "pagerank": pagerank(graph),
+            "coupling_score": np.bincount(graph.row_ids()[strong], minlength=len(graph)),
+        }
+    )
+
+
+def community_table(graph, df_nodes, sigma_map, techniques=(), segments=None):
+    """Per-community size, rules, rule density, cohesion, dominant tactic and
+    segment breakdown.
+
+    ``segments`` maps a segment name (cloud, lateral) to its technique list;
+    ``<segment>_techniques`` counts the community's techniques in the segment
+    and ``<segment>_share`` is that count over the segment size."""
+    info = {t["id"].upper(): t for t in techniques}
+    segments = {name: {t["id"].upper() for t in techs} for name, techs in (segments or {}).items()}
+    membership = df_nodes["community"].to_numpy()
+    rows = graph.row_ids()
+    n_comm = int(membership.max()) + 1 if len(membership) else 0
+    same = membership[rows] == membership[graph.indices]
+    internal = np.bincount(membership[rows], weights=graph.data * same, minlength=n_comm)
+    incident = np.bincount(membership[rows], weights=graph.data, minlength=n_comm)
+
+    out = []
+    for community, group in df_nodes.groupby("community", sort=True):
+        techs = group.sort_values("pagerank", ascending=False)["technique"].tolist()
+        rules = set()
+        tactics = Counter()
+        for tid in techs:
+            rules.update(sigma_map.get(tid, []))
+            tactics.update(info.get(tid, {}).get("killchain") or [])
+        row = {
+            "community": community,
+            "size": len(techs),
+            "rules": len(rules),
+            "mean_rule_density": group["rule_count"].mean(),
+            "internal_weight": internal[community] / 2,
+            "cohesion": internal[community] / incident[community] if incident[community] else 1.0,
+            "dominant_tactic": tactics.most_common(1)[0][0] if tactics else "",
+            "top_techniques": ", ".join(techs[:10]),
+        }
+        for name, members in segments.items():
+            in_seg = sum(1 for t in techs if t in members)
+            row[f"{name}_techniques"] = in_seg
+            row[f"{name}_share"] = in_seg / len(members) if members else 0.0
+        out.append(row)
+    if not out:
+        return pd.DataFrame(out)
+    return pd.DataFrame(out).sort_values(["size", "rules"], ascending=False).reset_index(drop=True)
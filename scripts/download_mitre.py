@@ -1,22 +1,55 @@
 import os
-import json
-import requests
 
-MITRE_URL = (
-    "https://raw.githubusercontent.com/mitre/cti/master/"
+from .fetch import MirrorChecksums, fetch, fetch_many
+
+MITRE_BASE = "https://raw.githubusercontent.com/mitre/cti/master/"
+MITRE_URL = MITRE_BASE + "enterprise-attack/enterprise-attack.json"
+OUT = os.path.join("data", "enterprise-attack.json")
+DOMAINS = ("enterprise-attack", "mobile-attack", "ics-attack")
+# Release tags of mitre/cti are named "ATT&CK-v14.1".
+MITRE_VERSION_URL = (
+    "https://raw.githubusercontent.com/mitre/cti/ATT%26CK-{version}/"
     "enterprise-attack/enterprise-attack.json"
 )
-OUT = os.path.join("data", "enterprise-attack.json")
+VERSIONS_DIR = os.path.join("data", "attack")
+
+
+def domain_path(domain):
+    return OUT if domain == "enterprise-attack" else os.path.join("data", f"{domain}.json")
+
+
+def download_mitre(domains=("enterprise-attack",), mirror=None, workers=4):
+    """Fetch ATT&CK domain bundles in parallel, skipping unchanged ones.
+
+    Returns {local path: True if it was (re)downloaded}."""
+    print(f"[+] Checking MITRE ATT&CK {', '.join(domains)} ({mirror or MITRE_BASE})")
+    jobs = [
+        (MITRE_BASE + f"{d}/{d}.json", domain_path(d), f"{d}/{d}.json")
+        for d in domains
+    ]
+    changed = fetch_many(jobs, mirror=mirror, workers=workers)
+    print(f"[+] MITRE data available under {', '.join(changed)}")
+    return changed
+
 
+def download_mitre_version(version, out_dir=VERSIONS_DIR, mirror=None):
+    """Fetch one ATT&CK release (e.g. "v14.1") unless it is already current.
 
-def download_mitre():
-    os.makedirs("data", exist_ok=True)
-    print(f"[+] Downloading MITRE ATT&CK Enterprise JSON from {MITRE_URL}")
-    resp = requests.get(MITRE_URL)
-    resp.raise_for_status()
-    with open(OUT, "w", encoding="utf-8") as f:
-        json.dump(resp.json(), f, indent=2)
-    print(f"[+] Saved MITRE data to {OUT}")
+    On a mirror the release is looked up as <version>/enterprise-attack/enterprise-attack.json."""
+    version = version if version.startswith("v") else f"v{version}"
+    path = os.path.join(out_dir, f"enterprise-attack-{version}.json")
+    if os.path.exists(path) and not mirror:
+        # Release tags are immutable; no need to revalidate.
+        return path
+    name = f"{version}/enterprise-attack/enterprise-attack.json"
+    fetch(
+        MITRE_VERSION_URL.format(version=version),
+        path,
+        name=name,
+        mirror=mirror,
+        checksums=MirrorChecksums(mirror),
+    )
+    return path
 
 
 if __name__ == "__main__":
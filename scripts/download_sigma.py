@@ -1,23 +1,39 @@
 import os
 import subprocess
 
+from .profiling import count
+
 SIGMA_DIR = os.path.join("data", "sigma")
+SIGMA_URL = "https://github.com/SigmaHQ/sigma.git"
+
+
+def _git(*args, capture=False):
+    result = subprocess.run(["git", *args], check=True, capture_output=capture, text=capture)
+    return result.stdout.strip() if capture else None
+
 
+def download_sigma(mirror=None):
+    """Clone or update the Sigma repository from upstream or a git mirror.
 
-def download_sigma():
+    ``mirror`` may be any git remote, including a local clone for air-gapped
+    runs. An existing checkout is compared with the remote HEAD via
+    ``git ls-remote`` first and only pulled when they differ."""
+    remote = mirror or SIGMA_URL
     os.makedirs("data", exist_ok=True)
     if not os.path.exists(SIGMA_DIR):
-        print("[+] Cloning SigmaHQ repository...")
-        subprocess.run(
-            ["git", "clone", "https://github.com/SigmaHQ/sigma.git", SIGMA_DIR],
-            check=True,
-        )
+        print(f"[+] Cloning Sigma rules from {remote}...")
+        _git("clone", remote, SIGMA_DIR)
+        count("downloads")
     else:
-        print("[+] SigmaHQ repo already exists, pulling latest changes...")
-        subprocess.run(
-            ["git", "-C", SIGMA_DIR, "pull"],
-            check=True,
-        )
+        local_head = _git("-C", SIGMA_DIR, "rev-parse", "HEAD", capture=True)
+        remote_head = _git("ls-remote", remote, "HEAD", capture=True).split("\t", 1)[0]
+        if local_head == remote_head:
+            count("cache_hits")
+            print(f"[+] SigmaHQ repo is up to date ({local_head[:12]})")
+        else:
+            print("[+] SigmaHQ repo already exists, pulling latest changes...")
+            _git("-C", SIGMA_DIR, "pull", "--ff-only", remote, "HEAD")
+            count("downloads")
     print(f"[+] Sigma rules available under {SIGMA_DIR}")
 
 
@@ -0,0 +1,443 @@
+"""Logsource-indexed dispatch of events to compiled Sigma rules.
+
+Most rules only apply to one ``logsource`` (product/service/category), and
+most of those pin a field to a literal (``EventID: 4624``,
+``eventName: ConsoleLogin``) or require a substring (``CommandLine|contains``).
+EventRouter classifies each event once, looks up the rules for its
+logsource, and narrows them with an inverted index built from:
+
+* anchors   - plain-equality values of a required field -> rules
+* literals  - required substrings of a field -> rules
+* keys      - the set of fields a rule requires to be present
+
+A rule whose condition has alternatives (``a or b``, ``1 of selection_*``)
+is indexed under every branch, so it only runs when one of them may match.
+
+Only the surviving candidates run their full matcher. Used by
+sigma_eval.replay_events(routed=True).
+"""
+import fnmatch
+
+from .sigma_eval import ESCAPED_WILDCARD, MISSING, WILDCARD, field_getter, tokenize_condition, value_str
+
+# Sysmon EventID -> Sigma logsource categories (an event can belong to several).
+SYSMON_CATEGORIES = {
+    1: ["process_creation"],
+    2: ["file_change"],
+    3: ["network_connection"],
+    5: ["process_termination"],
+    6: ["driver_load"],
+    7: ["image_load"],
+    8: ["create_remote_thread"],
+    9: ["raw_access_thread"],
+    10: ["process_access"],
+    11: ["file_event"],
+    12: ["registry_event", "registry_add", "registry_delete"],
+    13: ["registry_event", "registry_set"],
+    14: ["registry_event", "registry_rename"],
+    15: ["create_stream_hash"],
+    17: ["pipe_created"],
+    18: ["pipe_created"],
+    19: ["wmi_event"],
+    20: ["wmi_event"],
+    21: ["wmi_event"],
+    22: ["dns_query"],
+    23: ["file_delete"],
+    25: ["process_tampering"],
+    26: ["file_delete"],
+}
+
+# Windows Channel (lower-case) -> Sigma service.
+WINDOWS_CHANNELS = {
+    "security": "security",
+    "system": "system",
+    "application": "application",
+    "microsoft-windows-sysmon/operational": "sysmon",
+    "microsoft-windows-powershell/operational": "powershell",
+    "windows powershell": "powershell-classic",
+    "microsoft-windows-windows defender/operational": "windefend",
+    "microsoft-windows-taskscheduler/operational": "taskscheduler",
+    "microsoft-windows-wmi-activity/operational": "wmi",
+    "microsoft-windows-bits-client/operational": "bits-client",
+    "microsoft-windows-dns-client/operational": "dns-client",
+}
+
+WINDOWS_EVENT_CATEGORIES = {
+    ("security", 4688): ["process_creation"],
+    ("powershell", 4103): ["ps_module"],
+    ("powershell", 4104): ["ps_script"],
+    ("powershell-classic", 400): ["ps_classic_start"],
+}
+
+# Preferred anchor fields: highly selective and present on almost every event.
+ANCHOR_PREFERENCE = ("EventID", "eventName", "eventSource", "operationName", "Operation")
+
+
+def _norm(value):
+    return str(value).lower() if value else None
+
+
+def _event_id(event):
+    try:
+        return int(event.get("EventID"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_event(event):
+    """Return the (product, service, category) logsources an event belongs to.
+
+    An empty list means the event could not be classified. Simulation
+    datasets can bypass the heuristics with an explicit ``_logsource`` dict."""
+    hint = event.get("_logsource")
+    if isinstance(hint, dict):
+        return [(_norm(hint.get("product")), _norm(hint.get("service")), _norm(hint.get("category")))]
+
+    channel = event.get("Channel")
+    if channel:
+        service = WINDOWS_CHANNELS.get(str(channel).lower(), _norm(channel))
+        eid = _event_id(event)
+        if service == "sysmon":
+            categories = SYSMON_CATEGORIES.get(eid, [None])
+        else:
+            categories = WINDOWS_EVENT_CATEGORIES.get((service, eid), [None])
+        return [("windows", service, c) for c in categories]
+
+    if "eventSource" in event and ("awsRegion" in event or "eventVersion" in event):
+        return [("aws", "cloudtrail", None)]
+    if isinstance(event.get("protoPayload"), dict):
+        return [("gcp", "gcp.audit", None)]
+    category = str(event.get("category") or "")
+    if category in ("SignInLogs", "NonInteractiveUserSignInLogs"):
+        return [("azure", "signinlogs", None)]
+    if category == "AuditLogs":
+        return [("azure", "auditlogs", None)]
+    if category == "Administrative" or "resourceId" in event and "operationName" in event:
+        return [("azure", "activitylogs", None)]
+    if "Workload" in event and "Operation" in event:
+        return [("m365", None, None)]
+    if event.get("type") in ("SYSCALL", "EXECVE", "PATH", "USER_LOGIN") and "msg" in event:
+        return [("linux", "auditd", None)]
+    return []
+
+
+# Conditions with more alternatives than this are not analysed (always run).
+MAX_ALTERNATIVES = 64
+
+
+def _conjoin(factors):
+    """AND of alternatives: single-alternative factors hold in every branch;
+    the first multi-branch factor is expanded and the others dropped, which
+    keeps a necessary (if weaker) condition without a cross product."""
+    known = [f for f in factors if f is not None]
+    if not known:
+        return None
+    common = [m for f in known if len(f) == 1 for m in f[0]]
+    multi = [f for f in known if len(f) > 1]
+    return [common + alt for alt in multi[0]] if multi else [common]
+
+
+class _Requirements:
+    """Necessary conditions of a Sigma condition, as alternatives.
+
+    Every event a rule matches satisfies at least one alternative, and an
+    alternative is a list of search maps that must all match. ``None`` means
+    nothing is known (the rule is never skipped). Negations are treated as
+    unknown; ``or`` and ``1 of`` give one alternative per branch."""
+
+    def __init__(self, tokens, detection):
+        self.tokens = tokens
+        self.pos = 0
+        self.detection = detection
+        self.names = [n for n in detection if n not in ("condition", "timeframe")]
+
+    def _peek(self):
+        return self.tokens[self.pos].lower() if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        alts = self._or()
+        return alts if self.pos == len(self.tokens) else None
+
+    def _or(self):
+        alts = self._and()
+        while self._peek() == "or":
+            self._next()
+            more = self._and()
+            alts = None if alts is None or more is None else alts + more
+        if alts is not None and len(alts) > MAX_ALTERNATIVES:
+            return None
+        return alts
+
+    def _and(self):
+        factors = [self._not()]
+        while self._peek() == "and":
+            self._next()
+            factors.append(self._not())
+        return _conjoin(factors)
+
+    def _not(self):
+        if self._peek() == "not":
+            self._next()
+            self._not()
+            return None
+        return self._atom()
+
+    def _atom(self):
+        tok = self._peek()
+        if tok is None or tok == ")":
+            return None
+        if tok == "(":
+            self._next()
+            alts = self._or()
+            if self._peek() == ")":
+                self._next()
+            return alts
+        if tok in ("1", "any", "all") and self.pos + 2 < len(self.tokens) and self.tokens[self.pos + 1].lower() == "of":
+            quantifier = self._next().lower()
+            self._next()
+            target = self._next()
+            if target.lower() == "them":
+                names = [n for n in self.names if not n.startswith("_")]
+            else:
+                names = [n for n in self.names if fnmatch.fnmatchcase(n, target)]
+            parts = [self._search(n) for n in names]
+            if quantifier == "all":
+                return _conjoin(parts)
+            if not parts or None in parts:
+                return None
+            return [alt for part in parts for alt in part]
+        return self._search(self._next())
+
+    def _search(self, name):
+        search = self.detection.get(name)
+        if isinstance(search, dict):
+            return [[search]]
+        if isinstance(search, list) and search and all(isinstance(d, dict) for d in search):
+            return [[d] for d in search]
+        return None
+
+
+def condition_alternatives(detection):
+    """Alternatives of required search maps for a rule (see _Requirements)."""
+    condition = detection.get("condition")
+    conditions = condition if isinstance(condition, list) else [condition]
+    alts = []
+    for cond in conditions:
+        if cond is None:
+            return None
+        branch = _Requirements(tokenize_condition(str(cond)), detection).parse()
+        if branch is None:
+            return None
+        alts.extend(branch)
+    return alts if len(alts) <= MAX_ALTERNATIVES else None
+
+
+def _literal(value):
+    if isinstance(value, bool) or value is None:
+        return None
+    text = str(value).lower()
+    if not text or WILDCARD.search(text) or ESCAPED_WILDCARD.search(text):
+        return None
+    return text
+
+
+def _conjunction_prefilter(searches):
+    """Cheapest necessary condition for a list of search maps that must all match."""
+    anchors = []
+    literals = []
+    keys = set()
+    for search in searches:
+        for key, value in search.items():
+            field, *mods = str(key).split("|")
+            mods = {m.lower() for m in mods}
+            values = value if isinstance(value, list) else [value]
+            if "exists" in mods or None in values:
+                continue
+            if "." not in field:
+                keys.add(field)
+            texts = [_literal(v) for v in values]
+            if None in texts or "all" in mods:
+                continue
+            if not mods:
+                anchors.append((field, set(texts)))
+            elif mods <= {"contains", "startswith", "endswith"}:
+                literals.append((field, set(texts)))
+
+    if anchors:
+        anchors.sort(
+            key=lambda a: (
+                ANCHOR_PREFERENCE.index(a[0]) if a[0] in ANCHOR_PREFERENCE else len(ANCHOR_PREFERENCE),
+                len(a[1]),
+            )
+        )
+        return ("anchor", anchors[0][0], anchors[0][1])
+    if literals:
+        # The field whose shortest literal is longest is the most selective.
+        field, texts = max(literals, key=lambda lit: min(len(t) for t in lit[1]))
+        return ("literal", field, texts)
+    if keys:
+        return ("keys", frozenset(keys))
+    return None
+
+
+def extract_prefilter(detection):
+    """Cheapest necessary condition for a rule, used to index it.
+
+    Returns one of ("anchor", field, {values}), ("literal", field, {substrings}),
+    ("keys", frozenset(fields)), ("union", [prefilter, ...]) for conditions
+    with several alternatives (``a or b``, ``1 of selection_*``), or None when
+    the rule must always be evaluated."""
+    if not isinstance(detection, dict):
+        return None
+    alts = condition_alternatives(detection)
+    if not alts:
+        return None
+    branches = []
+    for alt in alts:
+        pf = _conjunction_prefilter(alt)
+        if pf is None:
+            return None
+        if pf not in branches:
+            branches.append(pf)
+    return branches[0] if len(branches) == 1 else ("union", branches)
+
+
+def _event_strings(value):
+    if value is MISSING or value is None:
+        return ()
+    if isinstance(value, list):
+        return [value_str(v).lower() for v in value if v is not None]
+    return (value_str(value).lower(),)
+
+
+class _Plan:
+    """Candidate index for one combination of event logsources."""
+
+    def __init__(self, rule_ids, prefilters):
+        anchors = {}
+        literals = {}
+        self.keyed = []
+        self.always = []
+        self.union = False
+        for i in rule_ids:
+            pf = prefilters[i]
+            if pf is None:
+                self.always.append(i)
+                continue
+            if pf[0] == "union":
+                # A rule indexed under several branches can come up twice.
+                self.union = True
+            for branch in pf[1] if pf[0] == "union" else [pf]:
+                if branch[0] == "anchor":
+                    by_value = anchors.setdefault(branch[1], {})
+                    for v in branch[2]:
+                        by_value.setdefault(v, []).append(i)
+                elif branch[0] == "literal":
+                    by_literal = literals.setdefault(branch[1], {})
+                    for v in branch[2]:
+                        by_literal.setdefault(v, []).append(i)
+                else:
+                    self.keyed.append((i, branch[1]))
+        self.anchors = [(field_getter(f), values) for f, values in anchors.items()]
+        self.literals = [(field_getter(f), list(lits.items())) for f, lits in literals.items()]
+        self.size = len(rule_ids)
+
+    def candidates(self, event):
+        cands = list(self.always)
+        for get, values in self.anchors:
+            for s in _event_strings(get(event)):
+                hit = values.get(s)
+                if hit:
+                    cands.extend(hit)
+        for get, lits in self.literals:
+            for s in _event_strings(get(event)):
+                for lit, ids in lits:
+                    if lit in s:
+                        cands.extend(ids)
+        if self.keyed:
+            keys = event.keys()
+            cands.extend(i for i, req in self.keyed if req <= keys)
+        return set(cands) if (self.anchors or self.literals or self.union) else cands
+
+
+class EventRouter:
+    """Dispatch events to the compiled rules of their logsource.
+
+    ``unclassified`` controls events classify_event() cannot place: "all"
+    (default) evaluates them against every rule so nothing is missed,
+    "generic" only against rules without a logsource constraint."""
+
+    def __init__(self, compiled, rule_meta, unclassified="all"):
+        self.matchers = [match for _, match in compiled]
+        self.prefilters = []
+        self.by_logsource = {}
+        for i, (path, _) in enumerate(compiled):
+            meta = rule_meta.get(path, {})
+            key = (
+                _norm(meta.get("log_product")),
+                _norm(meta.get("log_service")),
+                _norm(meta.get("log_category")),
+            )
+            self.by_logsource.setdefault(key, []).append(i)
+            self.prefilters.append(extract_prefilter(meta.get("detection")))
+        self.unclassified = unclassified
+        self._plans = {}
+        self._class_cache = {}
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.evaluations = 0
+        self.unclassified_events = 0
+
+    def _rules_for(self, classes):
+        if not classes:
+            if self.unclassified == "all":
+                return list(range(len(self.matchers)))
+            return list(self.by_logsource.get((None, None, None), []))
+        ids = set()
+        for product, service, category in classes:
+            for p in {product, None}:
+                for s in {service, None}:
+                    for c in {category, None}:
+                        ids.update(self.by_logsource.get((p, s, c), ()))
+        return sorted(ids)
+
+    def plan(self, classes):
+        key = tuple(classes)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = _Plan(self._rules_for(classes), self.prefilters)
+        return plan
+
+    def _classes(self, event):
+        # Windows events are classified by (Channel, EventID); cache that pair.
+        channel = event.get("Channel")
+        if channel is not None and "_logsource" not in event:
+            ck = (channel, event.get("EventID"))
+            classes = self._class_cache.get(ck)
+            if classes is None:
+                classes = self._class_cache[ck] = classify_event(event)
+            return classes
+        return classify_event(event)
+
+    def matches(self, event):
+        classes = self._classes(event)
+        if not classes:
+            self.unclassified_events += 1
+        cands = self.plan(classes).candidates(event)
+        self.evaluations += len(cands)
+        matchers = self.matchers
+        return [i for i in cands if matchers[i](event)]
+
+    def take_counters(self):
+        counters = {
+            "evaluations": self.evaluations,
+            "unclassified_events": self.unclassified_events,
+        }
+        self._reset_counters()
+        return counters
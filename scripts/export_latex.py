@@ -1,9 +1,21 @@
-import pandas as pd
+import os
+
+from .bootstrap_stats import compare_segments
+from .plot_lorenz import calculate_gini
+from .results_store import read_table
+
+CI_ROWS = [
+    ("coverage", "Coverage (rule>0)"),
+    ("mean", "Mean Rule Density"),
+    ("median", "Median Rule Density"),
+    ("gini", "Gini Coefficient"),
+]
 
 
 def load_density():
-    df_cloud = pd.read_csv("output/rule_density_cloud.csv")
-    df_lat = pd.read_csv("output/rule_density_lateral.csv")
+    cols = ["technique", "rule_count"]
+    df_cloud = read_table("rule_density", columns=cols, segments="cloud")
+    df_lat = read_table("rule_density", columns=cols, segments="lateral")
     return df_cloud, df_lat
 
 
@@ -17,6 +29,8 @@ def basic_stats(df_cloud, df_lat):
         "lat_mean": df_lat["rule_count"].mean() if len(df_lat) else 0,
         "cloud_median": df_cloud["rule_count"].median() if len(df_cloud) else 0,
         "lat_median": df_lat["rule_count"].median() if len(df_lat) else 0,
+        "cloud_gini": calculate_gini(df_cloud["rule_count"].values) if len(df_cloud) else 0,
+        "lat_gini": calculate_gini(df_lat["rule_count"].values) if len(df_lat) else 0,
     }
     return stats
 
@@ -26,12 +40,13 @@ def latex_summary_table(stats):
 \\centering
 \\begin{{tabular}}{{lcc}}
 \\toprule
- & Cloud Techniques & Lateral Movement Techniques \\
+ & Cloud Techniques & Lateral Movement Techniques \\\\
 \\midrule
-# Techniques & {stats["cloud_total"]} & {stats["lat_total"]} \\
-Coverage (rule>0) & {stats["cloud_cov"]:.2f} & {stats["lat_cov"]:.2f} \\
-Mean Rule Density & {stats["cloud_mean"]:.2f} & {stats["lat_mean"]:.2f} \\
-Median Rule Density & {stats["cloud_median"]:.0f} & {stats["lat_median"]:.0f} \\
+\\# Techniques & {stats["cloud_total"]} & {stats["lat_total"]} \\\\
+Coverage (rule>0) & {stats["cloud_cov"]:.2f} & {stats["lat_cov"]:.2f} \\\\
+Mean Rule Density & {stats["cloud_mean"]:.2f} & {stats["lat_mean"]:.2f} \\\\
+Median Rule Density & {stats["cloud_median"]:.0f} & {stats["lat_median"]:.0f} \\\\
+Gini Coefficient & {stats["cloud_gini"]:.2f} & {stats["lat_gini"]:.2f} \\\\
 \\bottomrule
 \\end{{tabular}}
 \\caption{{Summary of Sigma rule coverage and density for cloud vs lateral-movement techniques.}}
@@ -39,9 +54,53 @@ Median Rule Density & {stats["cloud_median"]:.0f} & {stats["lat_median"]:.0f} \\
 \\end{{table}}"""
 
 
+def latex_ci_table(comparison):
+    """Bootstrap CIs per segment and permutation-test p-values for cloud vs lateral."""
+
+    def cell(entry):
+        return f"{entry['estimate']:.2f} [{entry['low']:.2f}, {entry['high']:.2f}]"
+
+    rows = "\n".join(
+        f"{label} & {cell(comparison['a'][key])} & {cell(comparison['b'][key])} & "
+        f"{comparison['test'][key]['p_value']:.4f} \\\\"
+        for key, label in CI_ROWS
+    )
+    level = int(round(comparison["ci"] * 100))
+    return f"""\\begin{{table}}[!ht]
+\\centering
+\\begin{{tabular}}{{lccc}}
+\\toprule
+ & Cloud Techniques & Lateral Movement Techniques & $p$ (permutation) \\\\
+\\midrule
+{rows}
+\\bottomrule
+\\end{{tabular}}
+\\caption{{Point estimates with {level}\\% bootstrap confidence intervals ({comparison["n_resamples"]} resamples) and two-sided permutation-test $p$-values for cloud vs lateral-movement techniques.}}
+\\label{{tab:coverage-ci}}
+\\end{{table}}"""
+
+
+def run_latex_export(results, out_path="output/latex/coverage_summary.tex", n_resamples=10000, seed=42):
+    """Write the summary and CI tables for an in-memory pipeline run and return the LaTeX."""
+    df_cloud = results.table("rule_density", "cloud")
+    df_lat = results.table("rule_density", "lateral")
+    table = latex_summary_table(basic_stats(df_cloud, df_lat))
+    if len(df_cloud) and len(df_lat):
+        comparison = compare_segments(df_cloud, df_lat, n_resamples=n_resamples, seed=seed)
+        table += "\n\n" + latex_ci_table(comparison)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(table + "\n")
+    print(f"[+] Saved LaTeX summary table to {out_path}")
+    return table
+
+
 if __name__ == "__main__":
     df_c, df_l = load_density()
     s = basic_stats(df_c, df_l)
     print("\n=== LaTeX summary table ===\n")
     print(latex_summary_table(s))
+    if len(df_c) and len(df_l):
+        print("\n=== LaTeX bootstrap CI table ===\n")
+        print(latex_ci_table(compare_segments(df_c, df_l)))
     print("\n===========================\n")
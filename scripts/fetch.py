@@ -0,0 +1,218 @@
+"""Conditional, streaming dataset downloads with an optional mirror.
+
+fetch() keeps a ``<file>.meta.json`` sidecar next to every downloaded file
+(ETag, Last-Modified, size, SHA-256). The next run sends If-None-Match /
+If-Modified-Since, so an unchanged dataset costs a single 304 round trip.
+Changed files are streamed to a temporary file in the target directory,
+hashed while writing, and moved into place with an atomic rename, so an
+interrupted download never leaves a truncated dataset behind.
+
+A mirror is either a base URL (e.g. a local stand-in server) or a local
+directory laid out like the upstream paths, for air-gapped runs. A mirror may
+publish a ``SHA256SUMS`` file (``sha256sum`` format, names relative to the
+mirror root); files listed there are verified before they replace the local
+copy. On an HTTP mirror it is only requested once a file actually changed.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .profiling import count
+
+CHUNK_SIZE = 1 << 20
+TIMEOUT = 60
+CHECKSUM_FILE = "SHA256SUMS"
+
+
+def _meta_path(dest):
+    return dest + ".meta.json"
+
+
+def _load_meta(dest):
+    try:
+        with open(_meta_path(dest), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # A sidecar without its file (or with a different size) is stale.
+    if not os.path.exists(dest) or os.path.getsize(dest) != meta.get("size"):
+        return {}
+    return meta
+
+
+def _save_meta(dest, meta):
+    tmp = _meta_path(dest) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, _meta_path(dest))
+
+
+def _stream_to(dest, chunks, expected_sha256=None):
+    """Write chunks to dest via a temp file + atomic rename; returns (size, sha256)."""
+    directory = os.path.dirname(dest) or "."
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".fetch-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        sha = digest.hexdigest()
+        if expected_sha256 and sha != expected_sha256.lower():
+            raise ValueError(f"Checksum mismatch for {dest}: expected {expected_sha256}, got {sha}")
+        # mkstemp creates 0600 files; datasets should be readable like any other download.
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return size, sha
+
+
+def _iter_file(path):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def resolve_source(url, name, mirror=None):
+    """Where to fetch ``name`` from: the mirror (URL or directory) or ``url``."""
+    if not mirror:
+        return url
+    if mirror.startswith(("http://", "https://")):
+        return mirror.rstrip("/") + "/" + name
+    if mirror.startswith("file://"):
+        mirror = mirror[len("file://"):]
+    return os.path.join(mirror, *name.split("/"))
+
+
+def load_checksums(mirror, session=None):
+    """{name: sha256} from the mirror's SHA256SUMS file; {} if it has none."""
+    if not mirror:
+        return {}
+    source = resolve_source(None, CHECKSUM_FILE, mirror)
+    if source.startswith(("http://", "https://")):
+        resp = (session or requests).get(source, timeout=TIMEOUT)
+        if resp.status_code == 404:
+            return {}
+        resp.raise_for_status()
+        text = resp.text
+    else:
+        try:
+            with open(source, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return {}
+    sums = {}
+    for line in text.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2:
+            # "*name" marks binary mode in sha256sum output.
+            sums[parts[1].strip().lstrip("*")] = parts[0].lower()
+    print(f"[+] Verifying mirror files against {source} ({len(sums)} entries)")
+    return sums
+
+
+class MirrorChecksums:
+    """A mirror's SHA256SUMS, loaded on first use and shared between threads."""
+
+    def __init__(self, mirror, session=None):
+        self.mirror = mirror
+        self.session = session
+        self._sums = None
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            if self._sums is None:
+                self._sums = load_checksums(self.mirror, self.session)
+        return self._sums.get(name)
+
+
+def fetch(url, dest, name=None, mirror=None, sha256=None, session=None, checksums=None):
+    """Download ``url`` to ``dest`` unless the local copy is current.
+
+    ``name`` is the path of the file relative to the upstream base, used to
+    locate it on a mirror. Returns True if the file was (re)written, False on
+    a cache hit. With ``sha256`` the new content must match it, and a local
+    copy with a different recorded hash is fetched again. ``checksums``
+    (a MirrorChecksums) supplies ``sha256`` from the mirror; over HTTP it is
+    only consulted after a 200, so a 304 costs no extra request."""
+    name = name or os.path.basename(dest)
+    source = resolve_source(url, name, mirror)
+    remote = source.startswith(("http://", "https://"))
+    if checksums is not None and sha256 is None and not remote:
+        sha256 = checksums.get(name)
+    meta = _load_meta(dest)
+    if sha256 and meta.get("sha256") != sha256.lower():
+        meta = {}
+
+    if not remote:
+        stat = os.stat(source)
+        if meta.get("source") == source and meta.get("mtime") == stat.st_mtime and meta.get("size") == stat.st_size:
+            count("cache_hits")
+            print(f"[+] {dest} is up to date ({source})")
+            return False
+        size, sha = _stream_to(dest, _iter_file(source), sha256)
+        _save_meta(dest, {"source": source, "mtime": stat.st_mtime, "size": size, "sha256": sha})
+        count("downloads")
+        print(f"[+] Copied {source} -> {dest} ({size / 1e6:.1f} MB)")
+        return True
+
+    headers = {}
+    if meta.get("source") == source:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    http = session or requests
+    with http.get(source, headers=headers, stream=True, timeout=TIMEOUT) as resp:
+        if resp.status_code == 304:
+            count("cache_hits")
+            print(f"[+] {dest} is up to date ({source})")
+            return False
+        resp.raise_for_status()
+        if checksums is not None and sha256 is None:
+            sha256 = checksums.get(name)
+        size, sha = _stream_to(dest, resp.iter_content(CHUNK_SIZE), sha256)
+        _save_meta(
+            dest,
+            {
+                "source": source,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "size": size,
+                "sha256": sha,
+            },
+        )
+    count("downloads")
+    print(f"[+] Downloaded {source} -> {dest} ({size / 1e6:.1f} MB)")
+    return True
+
+
+def fetch_many(jobs, mirror=None, workers=4):
+    """Fetch several (url, dest, name) jobs concurrently; returns {dest: changed}.
+
+    Files listed in the mirror's SHA256SUMS are verified."""
+    if not jobs:
+        return {}
+    checksums = MirrorChecksums(mirror)
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = {
+            dest: pool.submit(fetch, url, dest, name=name, mirror=mirror, checksums=checksums)
+            for url, dest, name in jobs
+        }
+        return {dest: future.result() for dest, future in futures.items()}
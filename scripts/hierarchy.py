@@ -0,0 +1,129 @@
+"""ATT&CK sub-technique hierarchy and parent/child rollup of Sigma mappings.
+
+Sigma tags mix parent IDs (T1078) and sub-technique IDs (T1078.004), and every
+metric looks techniques up by exact key in ``sigma_map``. Instead of teaching
+each metric about prefixes, the map itself is rolled up once:
+
+* ``exact``    - tags as written
+* ``parent``   - a parent also owns every rule of its sub-techniques
+* ``children`` - a sub-technique also owns the rules tagged on its parent
+
+The rolled-up map is a drop-in ``sigma_map`` for every metric, path and gap
+function; ``rollup_rule_meta`` brings each rule's ``techniques`` in line with
+it for consumers that read tags from ``rule_meta`` (timeline, rule index).
+"""
+from .profiling import profiled
+
+ROLLUP_MODES = ("exact", "parent", "children")
+
+
+def parent_id(tid):
+    """T1078.004 -> T1078; None for a top-level technique."""
+    return tid.split(".", 1)[0] if "." in tid else None
+
+
+def build_hierarchy(technique_ids):
+    """{parent ID: [sub-technique IDs]} for the given technique IDs.
+
+    Parents referenced only through a sub-technique are included too, so Sigma
+    tags on techniques missing from the bundle still roll up."""
+    tree = {}
+    for tid in technique_ids:
+        tid = tid.upper()
+        parent = parent_id(tid)
+        if parent:
+            tree.setdefault(parent, []).append(tid)
+        else:
+            tree.setdefault(tid, [])
+    for subs in tree.values():
+        subs.sort()
+    return tree
+
+
+def technique_tree(techniques, extra_ids=()):
+    """{parent ID: [sub-technique IDs]} from the ``parent`` / ``subtechniques``
+    fields load_mitre() precomputes.
+
+    IDs not covered by those fields (``extra_ids`` such as Sigma tags on
+    techniques missing from the bundle, or technique dicts without the
+    fields) are placed with build_hierarchy()."""
+    tree = {}
+    known = set()
+    rest = set()
+    for t in techniques:
+        tid = t["id"].upper()
+        if "subtechniques" not in t:
+            rest.add(tid)
+            continue
+        known.add(tid)
+        if t.get("parent"):
+            tree.setdefault(t["parent"].upper(), [])
+        else:
+            tree.setdefault(tid, [])
+            known.update(s.upper() for s in t["subtechniques"])
+    for t in techniques:
+        # Sub-techniques whose parent is not in the bundle still need a slot.
+        if "subtechniques" in t and t.get("parent"):
+            subs = tree[t["parent"].upper()]
+            if t["id"].upper() not in subs:
+                subs.append(t["id"].upper())
+    rest.update(tid.upper() for tid in extra_ids)
+    for parent, subs in build_hierarchy(rest - known).items():
+        tree.setdefault(parent, []).extend(s for s in subs if s not in tree[parent])
+    for subs in tree.values():
+        subs.sort()
+    return tree
+
+
+@profiled("rollup_sigma_maps")
+def rollup_sigma_maps(sigma_map, techniques=()):
+    """All rollup modes of ``sigma_map`` in one bottom-up pass over the tree.
+
+    ATT&CK is two levels deep, so for every parent the children's rule lists
+    are merged into the parent (``parent``) and the parent's own rules are
+    pushed down to each child (``children``) in the same visit."""
+    tree = technique_tree(techniques, sigma_map)
+    up = {}
+    down = {}
+    for parent, subs in tree.items():
+        own = sigma_map.get(parent, [])
+        merged = dict.fromkeys(own)
+        for sub in subs:
+            sub_rules = sigma_map.get(sub, [])
+            merged.update(dict.fromkeys(sub_rules))
+            if own or sub_rules:
+                down[sub] = list(dict.fromkeys(sub_rules + own))
+        if merged:
+            up[parent] = list(merged)
+        if own:
+            down[parent] = list(own)
+        for sub in subs:
+            if sub in sigma_map:
+                up[sub] = list(sigma_map[sub])
+    return {"exact": sigma_map, "parent": up, "children": down}
+
+
+def rollup_sigma_map(sigma_map, techniques=(), mode="exact"):
+    """``sigma_map`` rolled up according to ``mode`` (see ROLLUP_MODES)."""
+    if mode not in ROLLUP_MODES:
+        raise ValueError(f"Unknown rollup mode {mode!r}; expected one of {ROLLUP_MODES}")
+    if mode == "exact":
+        return sigma_map
+    return rollup_sigma_maps(sigma_map, techniques)[mode]
+
+
+def rollup_rule_meta(rule_meta, sigma_map):
+    """``rule_meta`` whose ``techniques`` match a (rolled-up) ``sigma_map``.
+
+    Rollup only ever adds techniques to a rule; those are appended after the
+    rule's own tags. Changed rules are copied, the input is not modified."""
+    extra = {}
+    for tid, paths in sigma_map.items():
+        for path in paths:
+            extra.setdefault(path, set()).add(tid)
+    out = {}
+    for path, meta in rule_meta.items():
+        own = meta.get("techniques") or []
+        added = extra.get(path, set()).difference(own)
+        out[path] = dict(meta, techniques=list(own) + sorted(added)) if added else meta
+    return out
@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
+from .coupling_graph import CouplingGraph
 from .parse_mitre import heuristic_difficulty_score, heuristic_popularity_score
+from .profiling import profiled
 
 
 def compute_coverage(techniques, sigma_map):
@@ -10,6 +13,25 @@ def compute_coverage(techniques, sigma_map):
     return coverage_ratio, covered
 
 
+def compute_segment_coverage(techniques, sigma_map, taxonomy, membership=None):
+    """Technique count, covered count and coverage for every taxonomy segment.
+
+    A single reduction over the technique x segment membership matrix."""
+    if membership is None:
+        membership = taxonomy.membership(techniques)
+    covered = np.fromiter((t["id"].upper() in sigma_map for t in techniques), dtype=bool, count=len(techniques))
+    sizes = membership.sum(axis=0)
+    hits = covered @ membership.astype(np.int64)
+    return pd.DataFrame(
+        {
+            "segment": taxonomy.segments,
+            "techniques": sizes,
+            "covered": hits,
+            "coverage": np.divide(hits, sizes, out=np.zeros(len(sizes)), where=sizes > 0),
+        }
+    )
+
+
 def compute_rule_density(techniques, sigma_map):
     rows = []
     for t in techniques:
@@ -25,6 +47,46 @@ def compute_rule_density(techniques, sigma_map):
     return df
 
 
+def filter_sigma_map(sigma_map, rule_meta, origin):
+    """sigma_map restricted to the rules of one origin (rule repository)."""
+    filtered = {}
+    for tid, paths in sigma_map.items():
+        kept = [p for p in paths if rule_meta.get(p, {}).get("origin") == origin]
+        if kept:
+            filtered[tid] = kept
+    return filtered
+
+
+def compute_origin_metrics(techniques, sigma_map, rule_meta):
+    """Coverage and rule density of each rule origin on its own.
+
+    ``unique_techniques`` counts techniques covered by no other origin."""
+    origins = sorted({m.get("origin") for m in rule_meta.values() if m.get("origin")})
+    per_origin = {o: filter_sigma_map(sigma_map, rule_meta, o) for o in origins}
+    rows = []
+    for origin, sub_map in per_origin.items():
+        coverage, covered = compute_coverage(techniques, sub_map)
+        density = compute_rule_density(techniques, sub_map)
+        others = set()
+        for other, other_map in per_origin.items():
+            if other != origin:
+                others.update(other_map)
+        rows.append(
+            {
+                "origin": origin,
+                "rules": len({p for t in techniques for p in sub_map.get(t["id"].upper(), [])}),
+                "techniques_covered": len(covered),
+                "coverage": coverage,
+                "mean_rule_density": density["rule_count"].mean() if len(density) else 0.0,
+                "unique_techniques": sum(1 for t in covered if t["id"].upper() not in others),
+            }
+        )
+    return pd.DataFrame(
+        rows,
+        columns=["origin", "rules", "techniques_covered", "coverage", "mean_rule_density", "unique_techniques"],
+    )
+
+
 def compute_logsource_telemetry_metrics(techniques, sigma_map, rule_meta):
     rows = []
     for t in techniques:
@@ -90,17 +152,16 @@ def compute_weighted_metrics(techniques, sigma_map):
     return df
 
 
-def compute_technique_coupling(sigma_map, min_shared=2):
-    techniques = list(sigma_map.keys())
-    rows = []
-    for i, t in enumerate(techniques):
-        rules_t = set(sigma_map[t])
-        coupling = 0
-        for j, u in enumerate(techniques):
-            if i == j:
-                continue
-            shared = rules_t.intersection(sigma_map[u])
-            if len(shared) >= min_shared:
-                coupling += 1
-        rows.append({"technique": t, "coupling_score": coupling})
-    return pd.DataFrame(rows, columns=["technique", "coupling_score"])
+@profiled("compute_technique_coupling")
+def compute_technique_coupling(sigma_map, min_shared=2, graph=None):
+    """Number of other techniques each technique shares >= min_shared rules with.
+
+    Read off the sparse shared-rule graph (see coupling_graph); pass a
+    prebuilt ``graph`` to avoid building it twice."""
+    graph = graph or CouplingGraph.from_sigma_map(sigma_map)
+    strong = graph.data >= min_shared
+    scores = np.bincount(graph.row_ids()[strong], minlength=len(graph))
+    return pd.DataFrame(
+        {"technique": graph.labels, "coupling_score": scores},
+        columns=["technique", "coupling_score"],
+    )
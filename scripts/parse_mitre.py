@@ -1,15 +1,99 @@
 import json
 import os
 
+from .hierarchy import build_hierarchy, parent_id
+from .profiling import profiled
+from .taxonomy import TAXONOMY_FILE, load_taxonomy
+
 MITRE_FILE = os.path.join("data", "enterprise-attack.json")
 
 
-def load_mitre():
-    with open(MITRE_FILE, "r", encoding="utf-8") as f:
+def _active(obj):
+    return not obj.get("revoked") and not obj.get("x_mitre_deprecated")
+
+
+def build_stix_index(objects):
+    """Hash-indexed data-source -> data-component -> technique maps.
+
+    One pass over the STIX objects collects every object kind into dicts keyed
+    by STIX id; the relationship edges are resolved afterwards by lookup. Both
+    ATT&CK encodings are supported:
+
+    * v10-v17: ``detects`` relationships from x-mitre-data-component to
+      attack-pattern, components pointing at their x-mitre-data-source;
+    * v18+: ``detects`` relationships from x-mitre-detection-strategy to
+      attack-pattern, strategies -> x-mitre-analytic -> log source references
+      -> data component.
+
+    Returns a dict with ``sources`` {id: name}, ``components`` {id: {name,
+    source}}, ``source_components`` {source name: {component names}} and
+    ``technique_components`` {attack-pattern id: {component ids}}."""
+    sources = {}
+    components = {}
+    strategies = {}
+    analytics = {}
+    detects = []
+    for obj in objects:
+        kind = obj.get("type")
+        if kind == "relationship":
+            if obj.get("relationship_type") == "detects" and _active(obj):
+                detects.append((obj.get("source_ref"), obj.get("target_ref")))
+        elif kind == "x-mitre-data-component":
+            if _active(obj):
+                components[obj["id"]] = obj
+        elif kind == "x-mitre-data-source":
+            sources[obj["id"]] = obj.get("name", "")
+        elif kind == "x-mitre-detection-strategy":
+            if _active(obj):
+                strategies[obj["id"]] = obj.get("x_mitre_analytic_refs", [])
+        elif kind == "x-mitre-analytic":
+            analytics[obj["id"]] = [
+                ref.get("x_mitre_data_component_ref")
+                for ref in obj.get("x_mitre_log_source_references", [])
+            ]
+
+    index_components = {}
+    source_components = {}
+    for cid, obj in components.items():
+        source = sources.get(obj.get("x_mitre_data_source_ref"), "")
+        index_components[cid] = {"name": obj.get("name", ""), "source": source}
+        source_components.setdefault(source, set()).add(obj.get("name", ""))
+
+    technique_components = {}
+    for src, target in detects:
+        if src in index_components:
+            technique_components.setdefault(target, set()).add(src)
+        elif src in strategies:
+            linked = technique_components.setdefault(target, set())
+            for aid in strategies[src]:
+                linked.update(c for c in analytics.get(aid, ()) if c in index_components)
+
+    return {
+        "sources": sources,
+        "components": index_components,
+        "source_components": source_components,
+        "technique_components": technique_components,
+    }
+
+
+def _component_label(component):
+    if component["source"]:
+        return f"{component['source']}: {component['name']}"
+    return component["name"]
+
+
+@profiled("load_mitre")
+def load_mitre(path=MITRE_FILE):
+    with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
+    objects = data.get("objects", [])
+    index = build_stix_index(objects)
+    components = index["components"]
+    technique_components = index["technique_components"]
+
     techniques = []
-    for obj in data.get("objects", []):
+    for obj in objects:
         if obj.get("type") != "attack-pattern":
             continue
 
@@ -30,6 +114,15 @@ def load_mitre():
         detection_text = obj.get("x_mitre_detection", "") or ""
         description = obj.get("description", "") or ""
 
+        linked = [components[c] for c in technique_components.get(obj["id"], ())]
+        if linked:
+            data_sources = sorted({_component_label(c) for c in linked})
+            data_components = sorted({c["name"] for c in linked})
+        else:
+            # Pre-v10 bundles only carry "Source: Component" strings.
+            data_sources = sorted(set(obj.get("x_mitre_data_sources") or []))
+            data_components = sorted({ds.split(": ", 1)[-1] for ds in data_sources})
+
         techniques.append(
             {
                 "id": tech_id,
@@ -40,39 +133,35 @@ def load_mitre():
                 "description": description,
                 "revoked": obj.get("revoked", False),
                 "deprecated": obj.get("x_mitre_deprecated", False),
+                "data_sources": data_sources,
+                "data_components": data_components,
             }
         )
 
+    tree = build_hierarchy(t["id"] for t in techniques)
+    for t in techniques:
+        t["parent"] = parent_id(t["id"])
+        t["subtechniques"] = tree.get(t["id"], [])
+
     return techniques
 
 
+def _taxonomy_segment(techniques, name):
+    taxonomy = load_taxonomy()
+    if name not in taxonomy.segments:
+        print(f"[!] Taxonomy {TAXONOMY_FILE} defines no '{name}' segment; using no techniques")
+        return []
+    return taxonomy.select(techniques, name)
+
+
 def get_cloud_techniques(techniques):
-    # Broad heuristic for cloud-related platforms
-    cloud_keys = {
-        "AWS",
-        "AZURE",
-        "GCP",
-        "AZURE AD",
-        "OFFICE 365",
-        "SAAS",
-        "IAAS",
-        "GOOGLE WORKSPACE",
-        "GOOGLE CLOUD PLATFORM",
-        "MICROSOFT 365",
-        "O365",
-        "CONTAINER",
-        "KUBERNETES",
-    }
-    cloud = []
-    for t in techniques:
-        plats = [p.upper() for p in (t.get("platforms") or [])]
-        if any(any(k in p for k in cloud_keys) for p in plats):
-            cloud.append(t)
-    return cloud
+    """Techniques of the ``cloud`` segment of the default taxonomy ([] if undefined)."""
+    return _taxonomy_segment(techniques, "cloud")
 
 
 def get_lateral_techniques(techniques):
-    return [t for t in techniques if "lateral-movement" in (t.get("killchain") or [])]
+    """Techniques of the ``lateral`` segment of the default taxonomy ([] if undefined)."""
+    return _taxonomy_segment(techniques, "lateral")
 
 
 def heuristic_difficulty_score(detection_text: str) -> float:
@@ -1,7 +1,18 @@
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+
 import yaml
 
+from .profiling import collect, count, init_worker, is_enabled, merge, profiled, stage
+
 SIGMA_ROOT = os.path.join("data", "sigma")
+RULE_SUFFIXES = (".yml", ".yaml")
+# SigmaHQ ships placeholder rules that need pipeline-specific expansion.
+SKIP_RULE_DIRS = {"rules-placeholder"}
+# libyaml-backed loader when PyYAML was built with it (~10x faster).
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 def find_rules_dir():
@@ -20,6 +31,67 @@ def find_rules_dir():
     raise RuntimeError("Sigma rule directory not found under data/sigma. Check repo structure.")
 
 
+def rule_dirs(root):
+    """Rule directories under a repository root.
+
+    A checkout such as data/sigma yields all of its ``rules*`` folders
+    (rules, rules-emerging-threats, rules-threat-hunting, ...); any other
+    directory is used as is."""
+    subdirs = sorted(
+        d
+        for d in os.listdir(root)
+        if d.startswith("rules") and d not in SKIP_RULE_DIRS and os.path.isdir(os.path.join(root, d))
+    )
+    return [os.path.join(root, d) for d in subdirs] or [root]
+
+
+def parse_root_spec(spec):
+    """"name=path" -> (name, path); a bare path is named after its directory."""
+    if "=" in spec and not os.path.exists(spec):
+        name, path = spec.split("=", 1)
+        return name, path
+    return os.path.basename(os.path.normpath(spec)), spec
+
+
+def resolve_roots(roots=None, rules_dir=None):
+    """(origin, path) pairs from "name=path" specs or pairs; default: the SigmaHQ rules."""
+    if not roots:
+        return [("sigmahq", rules_dir or find_rules_dir())]
+    return [parse_root_spec(r) if isinstance(r, str) else tuple(r) for r in roots]
+
+
+def _shards(origin, root):
+    """One (origin, files) shard per top-level subtree of each rule directory."""
+    shards = {}
+    for base in rule_dirs(root):
+        for dirpath, _, files in os.walk(base):
+            subtree = os.path.relpath(dirpath, base).split(os.sep)[0]
+            for file in files:
+                if file.endswith(RULE_SUFFIXES):
+                    shards.setdefault((base, subtree), []).append(os.path.join(dirpath, file))
+    return [(origin, sorted(files)) for _, files in sorted(shards.items())]
+
+
+def _date_str(value):
+    # YAML turns 2023-01-31 into a date but leaves 2023/01/31 as a string.
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def rule_techniques(rule):
+    """ATT&CK technique IDs from a rule's ``attack.tNNNN`` tags."""
+    tags = rule.get("tags", [])
+    if not isinstance(tags, list):
+        return []
+    techniques = []
+    for t in tags:
+        if isinstance(t, str) and t.lower().startswith("attack.t"):
+            techniques.append(t.split("attack.", 1)[-1].upper())
+    return techniques
+
+
+@profiled("categorize_telemetry", trace=False)
 def categorize_telemetry(rule: dict) -> set:
     """Very rough heuristic based on 'logsource' and 'detection' fields."""
     categories = set()
@@ -58,55 +130,134 @@ def categorize_telemetry(rule: dict) -> set:
     return categories
 
 
-def extract_sigma_mappings():
-    rules_dir = find_rules_dir()
-    print(f"[+] Using Sigma rules from: {rules_dir}")
-    technique_map = {}
-    rule_meta = {}
+def _content_hash(rule):
+    # Logsource + detection only, so re-tagged or re-titled copies still match.
+    body = json.dumps(
+        {"logsource": rule.get("logsource"), "detection": rule.get("detection")},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _parse_shard(shard):
+    """Parse one shard; returns (rule metadata list, files parsed, parse errors, profile stats).
+
+    Runs in a pool worker, so profiling (categorize_telemetry, the shard
+    itself) is collected here and merged by the parent."""
+    with collect() as stats, stage("parse_shard"):
+        metas, parsed, errors = _parse_files(*shard)
+    return metas, parsed, errors, stats
 
-    for root, _, files in os.walk(rules_dir):
-        for file in files:
-            if not file.endswith((".yml", ".yaml")):
-                continue
-            path = os.path.join(root, file)
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    rule = yaml.safe_load(f) or {}
-            except Exception:
-                continue
-
-            tags = rule.get("tags", [])
-            if not isinstance(tags, list):
-                continue
-
-            techniques = []
-            for t in tags:
-                if isinstance(t, str) and t.lower().startswith("attack.t"):
-                    tech = t.split("attack.", 1)[-1].upper()
-                    techniques.append(tech)
-
-            if not techniques:
-                continue
-
-            logsource = rule.get("logsource", {}) or {}
-            product = logsource.get("product")
-            service = logsource.get("service")
-            category = logsource.get("category")
-            telemetry = categorize_telemetry(rule)
-
-            meta = {
+
+def _parse_files(origin, files):
+    metas = []
+    parsed = errors = 0
+    for path in files:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rule = yaml.load(f, Loader=YAML_LOADER) or {}
+        except Exception:
+            errors += 1
+            continue
+        parsed += 1
+
+        techniques = rule_techniques(rule)
+        if not techniques:
+            continue
+
+        logsource = rule.get("logsource", {}) or {}
+        telemetry = categorize_telemetry(rule)
+        metas.append(
+            {
                 "title": rule.get("title", ""),
-                "log_product": product,
-                "log_service": service,
-                "log_category": category,
+                "id": rule.get("id"),
+                "date": _date_str(rule.get("date")),
+                "modified": _date_str(rule.get("modified")),
+                "techniques": techniques,
+                "log_product": logsource.get("product"),
+                "log_service": logsource.get("service"),
+                "log_category": logsource.get("category"),
                 "telemetry": sorted(list(telemetry)),
+                "detection": rule.get("detection") or {},
                 "path": path,
+                "origin": origin,
+                "content_hash": _content_hash(rule),
+                "duplicates": [],
             }
-            rule_meta[path] = meta
+        )
+    return metas, parsed, errors
+
+
+@profiled("extract_sigma_mappings")
+def extract_sigma_mappings(rules_dir=None, roots=None, workers=None):
+    """Build {technique: [rule paths]} and {rule path: metadata}.
+
+    ``roots`` is a list of (origin, path) pairs or "name=path" strings; by
+    default only the SigmaHQ rules dir is read. Every root is split into one
+    shard per subtree and the shards are parsed in parallel. Results are
+    merged in a single pass in root order. A rule whose Sigma ``id`` or
+    detection content was already seen in an earlier root is recorded in the
+    first copy's ``duplicates`` instead of being counted twice; technique tags
+    only the duplicate carries are added to the first copy. Every rule is
+    tagged with its ``origin``."""
+    roots = resolve_roots(roots, rules_dir)
+    for origin, root in roots:
+        print(f"[+] Using Sigma rules from: {root} ({origin})")
+
+    shards = [shard for origin, root in roots for shard in _shards(origin, root)]
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+
+    technique_map = {}
+    rule_meta = {}
+    by_id = {}
+    by_hash = {}
+    duplicates = inherited = 0
+
+    # Workers profile categorize_telemetry and each shard; merge() folds it back.
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(is_enabled(),))
+    try:
+        # map() yields in submission order, so the first root always wins.
+        results = pool.map(_parse_shard, shards) if pool else map(_parse_shard, shards)
+        for metas, parsed, errors, stats in results:
+            merge(stats)
+            count("files_parsed", parsed)
+            count("parse_errors", errors)
+            for meta in metas:
+                origin = meta["origin"]
+                kept = by_id.get(meta["id"]) if meta["id"] else None
+                if kept is None or rule_meta[kept]["origin"] == origin:
+                    kept = by_hash.get(meta["content_hash"])
+                if kept is not None and rule_meta[kept]["origin"] != origin:
+                    kept_meta = rule_meta[kept]
+                    kept_meta["duplicates"].append(meta["path"])
+                    duplicates += 1
+                    # The content hash ignores tags: a fork that adds technique
+                    # tags still contributes them, credited to the kept rule.
+                    for tech in meta["techniques"]:
+                        if tech not in kept_meta["techniques"]:
+                            kept_meta["techniques"].append(tech)
+                            technique_map.setdefault(tech, []).append(kept)
+                            inherited += 1
+                    continue
 
-            for tech in techniques:
-                technique_map.setdefault(tech, []).append(path)
+                path = meta["path"]
+                rule_meta[path] = meta
+                if meta["id"]:
+                    by_id.setdefault(meta["id"], path)
+                by_hash.setdefault(meta["content_hash"], path)
+                for tech in meta["techniques"]:
+                    technique_map.setdefault(tech, []).append(path)
+    finally:
+        if pool:
+            pool.shutdown()
 
+    if duplicates:
+        print(f"[+] Skipped {duplicates} rules already present in an earlier root.")
+    if inherited:
+        print(f"[+] Added {inherited} technique tags from skipped duplicates to the rules they duplicate.")
     print(f"[+] Extracted mappings for {len(technique_map)} ATT&CK techniques from Sigma.")
     return technique_map, rule_meta
 
@@ -0,0 +1,285 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Instrumentation is off by default; every hook below short-circuits on this
+# flag so an unprofiled run only pays for a global lookup per call.
+_ENABLED = False
+_TRACE_MEMORY = False
+_T0 = 0.0
+
+_SPANS = []
+_AGGREGATES = {}
+_COUNTERS = {}
+_LOCAL = threading.local()
+_LOCK = threading.Lock()
+
+
+def enable(trace_memory=True):
+    global _ENABLED, _TRACE_MEMORY, _T0
+    reset()
+    _ENABLED = True
+    _TRACE_MEMORY = trace_memory
+    _T0 = time.perf_counter()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _ENABLED
+    _ENABLED = False
+    if _TRACE_MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def reset():
+    _SPANS.clear()
+    _AGGREGATES.clear()
+    _COUNTERS.clear()
+    _LOCAL.stack = []
+
+
+def _stack():
+    stack = getattr(_LOCAL, "stack", None)
+    if stack is None:
+        stack = _LOCAL.stack = []
+    return stack
+
+
+def count(counter, n=1):
+    """Increment a named counter (files_parsed, parse_errors, cache_hits, ...).
+
+    The counter is attributed to the innermost open stage and to the run total."""
+    if not _ENABLED:
+        return
+    with _LOCK:
+        _COUNTERS[counter] = _COUNTERS.get(counter, 0) + n
+    stack = _stack()
+    if stack:
+        span_counters = stack[-1]["counters"]
+        span_counters[counter] = span_counters.get(counter, 0) + n
+
+
+@contextmanager
+def stage(name):
+    """Record wall time, CPU time, peak traced memory and counters for a block."""
+    if not _ENABLED:
+        yield
+        return
+
+    stack = _stack()
+    span = {"name": name, "counters": {}, "_peak": 0, "_mem_start": 0}
+    if _TRACE_MEMORY and tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+        tracemalloc.reset_peak()
+        span["_mem_start"] = current
+
+    stack.append(span)
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        stack.pop()
+
+        peak_mem = 0
+        if _TRACE_MEMORY and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], span["_peak"])
+            peak_mem = max(peak - span["_mem_start"], 0)
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+
+        with _LOCK:
+            _SPANS.append(
+                {
+                    "name": name,
+                    "start": start - _T0,
+                    "wall": wall,
+                    "cpu": cpu,
+                    "peak_mem": peak_mem,
+                    "counters": span["counters"],
+                    "depth": len(stack),
+                    "tid": threading.get_ident(),
+                }
+            )
+
+
+def _aggregate(name, wall, cpu, calls=1):
+    with _LOCK:
+        agg = _AGGREGATES.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+        agg["calls"] += calls
+        agg["wall"] += wall
+        agg["cpu"] += cpu
+
+
+def profiled(name=None, trace=True):
+    """Decorator form of stage().
+
+    With trace=False the function is only aggregated (call count, wall, CPU),
+    which keeps per-item helpers such as categorize_telemetry cheap to profile."""
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            if trace:
+                with stage(label):
+                    return func(*args, **kwargs)
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _aggregate(label, time.perf_counter() - start, time.process_time() - cpu_start)
+
+        return wrapper
+
+    return decorator
+
+
+def init_worker(enabled):
+    """ProcessPoolExecutor initializer: mirror the parent's on/off state.
+
+    Workers only aggregate; memory is traced per process and not reported."""
+    global _ENABLED, _TRACE_MEMORY
+    reset()
+    _ENABLED = enabled
+    _TRACE_MEMORY = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+@contextmanager
+def collect():
+    """Record into an empty profile and yield the stats dict filled on exit.
+
+    Work shipped to a pool worker runs inside collect() and returns the stats
+    with its result; the parent folds them in with merge(). The enclosing
+    profile is restored afterwards, so the same code also works in-process.
+    Stages opened inside are reported as aggregates."""
+    stats = {}
+    if not _ENABLED:
+        yield stats
+        return
+    with _LOCK:
+        saved = (list(_SPANS), dict(_AGGREGATES), dict(_COUNTERS))
+        _SPANS.clear()
+        _AGGREGATES.clear()
+        _COUNTERS.clear()
+    saved_stack = _stack()
+    _LOCAL.stack = []
+    try:
+        yield stats
+    finally:
+        with _LOCK:
+            aggregates = {k: dict(v) for k, v in _AGGREGATES.items()}
+            for span in _SPANS:
+                agg = aggregates.setdefault(span["name"], {"calls": 0, "wall": 0.0, "cpu": 0.0})
+                agg["calls"] += 1
+                agg["wall"] += span["wall"]
+                agg["cpu"] += span["cpu"]
+            stats["aggregates"] = aggregates
+            stats["counters"] = dict(_COUNTERS)
+            _SPANS[:] = saved[0]
+            _AGGREGATES.clear()
+            _AGGREGATES.update(saved[1])
+            _COUNTERS.clear()
+            _COUNTERS.update(saved[2])
+        _LOCAL.stack = saved_stack
+
+
+def merge(stats):
+    """Fold the stats of a collect() block (e.g. from a worker) into this profile."""
+    if not _ENABLED or not stats:
+        return
+    for label, agg in stats.get("aggregates", {}).items():
+        _aggregate(label, agg["wall"], agg["cpu"], calls=agg["calls"])
+    for counter, n in stats.get("counters", {}).items():
+        count(counter, n)
+
+
+def summary():
+    """Per-stage totals plus run-wide counters, as a JSON-serialisable dict."""
+    stages = {}
+    for span in _SPANS:
+        entry = stages.setdefault(
+            span["name"],
+            {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mem_bytes": 0, "counters": {}},
+        )
+        entry["calls"] += 1
+        entry["wall_s"] += span["wall"]
+        entry["cpu_s"] += span["cpu"]
+        entry["peak_mem_bytes"] = max(entry["peak_mem_bytes"], span["peak_mem"])
+        for key, value in span["counters"].items():
+            entry["counters"][key] = entry["counters"].get(key, 0) + value
+
+    for label, agg in _AGGREGATES.items():
+        entry = stages.setdefault(
+            label,
+            {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mem_bytes": 0, "counters": {}},
+        )
+        entry["calls"] += agg["calls"]
+        entry["wall_s"] += agg["wall"]
+        entry["cpu_s"] += agg["cpu"]
+
+    return {
+        "total_wall_s": time.perf_counter() - _T0 if _ENABLED else None,
+        "memory_traced": _TRACE_MEMORY,
+        "counters": dict(_COUNTERS),
+        "stages": stages,
+    }
+
+
+def chrome_trace():
+    """Spans as Chrome trace-event JSON (load in chrome://tracing or Perfetto)."""
+    pid = os.getpid()
+    events = []
+    for span in _SPANS:
+        args = {
+            "cpu_ms": round(span["cpu"] * 1e3, 3),
+            "peak_mem_bytes": span["peak_mem"],
+        }
+        args.update(span["counters"])
+        events.append(
+            {
+                "name": span["name"],
+                "cat": "stage",
+                "ph": "X",
+                "ts": round(span["start"] * 1e6, 1),
+                "dur": round(span["wall"] * 1e6, 1),
+                "pid": pid,
+                "tid": span["tid"],
+                "args": args,
+            }
+        )
+    events.sort(key=lambda e: (e["ts"], -e["dur"]))
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_reports(out_dir="output/profile"):
+    os.makedirs(out_dir, exist_ok=True)
+    summary_path = os.path.join(out_dir, "profile_summary.json")
+    trace_path = os.path.join(out_dir, "profile_trace.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary(), f, indent=2)
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f)
+    print(f"[+] Saved profile summary to {summary_path}")
+    print(f"[+] Saved Chrome trace to {trace_path}")
+    return summary_path, trace_path
@@ -0,0 +1,53 @@
+from .results_store import RESULTS_DIR, read_table
+
+
+class PipelineResults:
+    """In-memory results of a pipeline run.
+
+    Holds the parsed ATT&CK techniques, the technique segments (cloud,
+    lateral), the Sigma rule index (sigma_map / rule_meta, including rule
+    dates) and every result table, so post-processing stages such as the
+    Lorenz curve, LaTeX export and timeline work without touching disk.
+
+    Tables added with put() are also written to the attached ResultsStore."""
+
+    def __init__(self, techniques, segments, sigma_map, rule_meta, store=None, root=None):
+        self.techniques = techniques
+        self.segments = segments
+        self.sigma_map = sigma_map
+        self.rule_meta = rule_meta
+        self.store = store
+        self.root = root or (store.root if store is not None else RESULTS_DIR)
+        self.tables = {}
+
+    def put(self, name, df, segment=None):
+        self.tables[(name, segment)] = df
+        if self.store is not None:
+            self.store.write(name, df, segment=segment)
+        return df
+
+    def table(self, name, segment=None, columns=None):
+        df = self.tables.get((name, segment))
+        if df is not None:
+            return df[columns] if columns else df
+        df = read_table(name, columns=columns, segments=segment, root=self.root)
+        if columns is None:
+            self.tables[(name, segment)] = df
+        return df
+
+    @classmethod
+    def from_store(cls, root=RESULTS_DIR, with_rules=False):
+        """Rebuild a results object from a previous run's store.
+
+        The Sigma rule index is only re-parsed when ``with_rules`` is set,
+        since that means walking the whole rule tree again."""
+        sigma_map, rule_meta = {}, {}
+        if with_rules:
+            from .parse_sigma import extract_sigma_mappings
+
+            sigma_map, rule_meta = extract_sigma_mappings()
+        segments = {}
+        for seg in ("cloud", "lateral"):
+            df = read_table("rule_density", columns=["technique", "name"], segments=seg, root=root)
+            segments[seg] = [{"id": t, "name": n} for t, n in zip(df["technique"], df["name"])]
+        return cls([], segments, sigma_map, rule_meta, root=root)
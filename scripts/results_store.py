@@ -0,0 +1,159 @@
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    from pyarrow import feather
+    HAVE_ARROW = True
+except Exception:
+    HAVE_ARROW = False
+
+RESULTS_DIR = os.path.join("output", "results")
+LEGACY_CSV_DIR = "output"
+MANIFEST = "manifest.json"
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+
+def legacy_csv_name(name, segment=None):
+    """Historic flat CSV name, e.g. ('rule_density', 'cloud') -> rule_density_cloud.csv."""
+    return f"{name}_{segment}.csv" if segment else f"{name}.csv"
+
+
+class ResultsStore:
+    """Single dataset directory holding every pipeline table plus a manifest.
+
+    Tables are split into segments (cloud, lateral, ...) so readers can load
+    only the slice they need. Parquet and Arrow IPC keep dtypes and are
+    zstd-compressed; CSV is used when pyarrow is missing. ``csv_export``
+    additionally writes the historic ``output/<table>_<segment>.csv`` files.
+
+    An existing manifest is extended, so several writers (main.py, the
+    version diff) can share one store. The first write of a table through a
+    store replaces that table's previous segments and files."""
+
+    def __init__(self, root=RESULTS_DIR, fmt="parquet", csv_export=False, csv_dir=LEGACY_CSV_DIR):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}', expected one of {sorted(FORMATS)}")
+        if fmt != "csv" and not HAVE_ARROW:
+            print("[!] pyarrow not available, falling back to CSV for the results store.")
+            fmt = "csv"
+        self.root = root
+        self.fmt = fmt
+        self.csv_export = csv_export
+        self.csv_dir = csv_dir
+        os.makedirs(root, exist_ok=True)
+        self.manifest = load_manifest(root) or {"tables": {}}
+        self.manifest["format"] = fmt
+        self._written = set()
+
+    def write(self, name, df, segment=None):
+        seg_key = segment or "all"
+        table_dir = os.path.join(self.root, name)
+        os.makedirs(table_dir, exist_ok=True)
+        path = os.path.join(table_dir, seg_key + FORMATS[self.fmt])
+
+        if name not in self._written:
+            self._drop(name, keep=path)
+            self._written.add(name)
+
+        if self.fmt == "parquet":
+            df.to_parquet(path, index=False, compression="zstd")
+        elif self.fmt == "arrow":
+            feather.write_feather(df.reset_index(drop=True), path, compression="zstd")
+        else:
+            df.to_csv(path, index=False)
+
+        table = self.manifest["tables"].setdefault(name, {"segmented": segment is not None, "segments": {}})
+        table["segments"][seg_key] = {
+            "file": os.path.relpath(path, self.root),
+            "format": self.fmt,
+            "rows": int(len(df)),
+            "bytes": os.path.getsize(path),
+            "columns": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        }
+        self._save_manifest()
+
+        if self.csv_export:
+            os.makedirs(self.csv_dir, exist_ok=True)
+            df.to_csv(os.path.join(self.csv_dir, legacy_csv_name(name, segment)), index=False)
+        return path
+
+    def _drop(self, name, keep=None):
+        """Forget a table written by an earlier run and remove its files."""
+        table = self.manifest["tables"].pop(name, None)
+        if table is None:
+            return
+        for info in table["segments"].values():
+            path = os.path.join(self.root, info["file"])
+            if path != keep and os.path.exists(path):
+                os.remove(path)
+
+    def _save_manifest(self):
+        tmp = os.path.join(self.root, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+
+
+def load_manifest(root=RESULTS_DIR):
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_file(path, fmt, columns, dtypes):
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    if fmt == "arrow":
+        return feather.read_table(path, columns=columns).to_pandas()
+    # CSV store: restore the numeric dtypes recorded in the manifest.
+    df = pd.read_csv(path, usecols=columns)
+    typed = {c: t for c, t in dtypes.items() if c in df.columns and t != "object"}
+    return df.astype(typed) if typed else df
+
+
+def read_table(name, columns=None, segments=None, root=RESULTS_DIR, csv_dir=LEGACY_CSV_DIR):
+    """Load a table (optionally a subset of columns/segments) from the store.
+
+    Segmented tables gain a ``segment`` column when more than one segment is
+    read. Falls back to the historic flat CSVs when no store exists."""
+    if isinstance(segments, str):
+        segments = [segments]
+    manifest = load_manifest(root)
+
+    if manifest is None or name not in manifest["tables"]:
+        return _read_legacy_csv(name, columns, segments, csv_dir)
+
+    table = manifest["tables"][name]
+    wanted = segments or list(table["segments"])
+    file_columns = [c for c in columns if c != "segment"] if columns else None
+    frames = []
+    for seg in wanted:
+        info = table["segments"].get(seg)
+        if info is None:
+            raise KeyError(f"Segment '{seg}' not found for table '{name}'")
+        # Manifests written before per-segment dtypes kept one set per table.
+        dtypes = info.get("columns", table.get("columns", {}))
+        fmt = info.get("format", manifest["format"])
+        df = _read_file(os.path.join(root, info["file"]), fmt, file_columns, dtypes)
+        if table["segmented"] and (len(wanted) > 1 or (columns and "segment" in columns)):
+            df["segment"] = seg
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def _read_legacy_csv(name, columns, segments, csv_dir):
+    frames = []
+    for seg in segments or [None]:
+        path = os.path.join(csv_dir, legacy_csv_name(name, seg))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No results store entry or CSV found for '{name}' ({path})")
+        df = pd.read_csv(path, usecols=[c for c in columns if c != "segment"] if columns else None)
+        if seg and segments and len(segments) > 1:
+            df["segment"] = seg
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
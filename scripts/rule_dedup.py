@@ -0,0 +1,273 @@
+"""Near-duplicate Sigma rule detection with MinHash signatures and LSH banding.
+
+Forks of the same detection across product folders inflate ``rule_count`` and
+``weighted_rule_score``. Each rule is shingled into normalised
+``field|modifiers=value`` tokens (selection names are ignored, so renamed
+forks still collide), MinHash signatures are computed in vectorised NumPy
+batches, and LSH banding yields candidate pairs without comparing every
+pair of rules. Candidates are confirmed with exact Jaccard similarity.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .metrics import compute_weighted_metrics
+from .profiling import profiled
+
+_PRIME = (1 << 61) - 1
+_MASK32 = (1 << 32) - 1
+# Size of the (num_perm x tokens) hash matrix and of pairwise signature
+# comparisons per batch.
+BATCH_BYTES = 16 << 20
+# Band buckets up to this size are expanded into all member pairs; larger
+# (template-like) buckets are split around a few pivot rules instead.
+MAX_BUCKET = 64
+MAX_PIVOTS = 16
+
+
+def _walk_values(value):
+    if isinstance(value, list):
+        for v in value:
+            yield from _walk_values(v)
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield from (f"{str(k).lower()}={x}" for x in _walk_values(v))
+    else:
+        yield str(value).strip().lower()
+
+
+def rule_shingles(meta, logsource=False):
+    """Normalised token set of a rule's detection fields and values.
+
+    The logsource is left out by default so that forks of a rule in
+    different product folders still collide; ``logsource=True`` adds it."""
+    tokens = set()
+    if logsource:
+        for key in ("log_product", "log_service", "log_category"):
+            if meta.get(key):
+                tokens.add(f"{key}={str(meta[key]).lower()}")
+    detection = meta.get("detection") or {}
+    for name, search in detection.items():
+        if name in ("condition", "timeframe"):
+            continue
+        maps = search if isinstance(search, list) else [search]
+        for item in maps:
+            if isinstance(item, dict):
+                for field, value in item.items():
+                    field_key, *mods = str(field).lower().split("|")
+                    prefix = "|".join([field_key] + sorted(mods))
+                    tokens.update(f"{prefix}={v}" for v in _walk_values(value))
+            else:
+                tokens.update(f"keyword={v}" for v in _walk_values(item))
+    return tokens
+
+
+def _hash_token(token):
+    # blake2b rather than hash(): stable across processes and runs.
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+@profiled("minhash_signatures")
+def minhash_signatures(shingle_sets, num_perm=128, seed=42):
+    """(n_rules x num_perm) uint64 MinHash matrix.
+
+    Universal hashing (a * x + b) mod (2^61 - 1) over 32-bit token hashes;
+    all tokens of a batch of rules are hashed at once and reduced per rule
+    with np.minimum.reduceat."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    n = len(shingle_sets)
+    sigs = np.full((n, num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    batch_tokens = max(BATCH_BYTES // (8 * num_perm), 1)
+    start = 0
+    while start < n:
+        stop = start
+        total = 0
+        while stop < n and (total == 0 or total + len(shingle_sets[stop]) <= batch_tokens):
+            total += max(len(shingle_sets[stop]), 1)
+            stop += 1
+        batch = shingle_sets[start:stop]
+        lengths = np.array([len(s) for s in batch])
+        nonempty = np.flatnonzero(lengths)
+        if len(nonempty):
+            x = np.fromiter(
+                (_hash_token(t) & _MASK32 for s in batch for t in s),
+                dtype=np.uint64,
+                count=int(lengths.sum()),
+            )
+            # In place: one (num_perm x tokens) matrix, no temporaries.
+            hv = np.multiply.outer(a, x)
+            hv += b[:, None]
+            hv %= _PRIME
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])[nonempty]
+            sigs[start + nonempty] = np.minimum.reduceat(hv, offsets, axis=1).T
+            del hv  # free it before the next batch allocates its own
+        start = stop
+    return sigs
+
+
+def _agreement(sigs, left, right):
+    """Share of equal signature rows per (left[k], right[k]) pair, batched."""
+    step = max(BATCH_BYTES // (8 * sigs.shape[1]), 1)
+    return np.concatenate([
+        (sigs[left[k:k + step]] == sigs[right[k:k + step]]).mean(axis=1)
+        for k in range(0, len(left), step)
+    ]) if len(left) else np.empty(0)
+
+
+def _pivot_pairs(sigs, members, min_agree):
+    """Candidate pairs of one large band bucket as i * n + j keys (i < j).
+
+    Instead of all O(size^2) pairs, each pivot pairs with the members whose
+    signatures agree with it and only the rest go on to the next pivot, so
+    the work is O(MAX_PIVOTS * size)."""
+    n = sigs.shape[0]
+    keys = []
+    rest = members
+    for _ in range(MAX_PIVOTS):
+        if len(rest) < 2:
+            break
+        pivot, rest = rest[0], rest[1:]
+        close = _agreement(sigs, np.full(len(rest), pivot), rest) >= min_agree
+        keys.append(np.int64(pivot) * n + rest[close])
+        rest = rest[~close]
+    return keys
+
+
+def _lsh_candidates(sigs, bands, min_agree=0.0):
+    """Unique (i, j) index pairs, i < j, sharing at least one band bucket.
+
+    Buckets of up to MAX_BUCKET rules yield all their pairs, expanded for all
+    buckets of one size at once; larger (template-like) buckets go through
+    _pivot_pairs with ``min_agree`` as the required signature agreement."""
+    n = sigs.shape[0]
+    rows = sigs.shape[1] // bands
+    mix = np.random.default_rng(0).integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    keys = []
+    for band in range(bands):
+        # One 64-bit key per band row; a rare collision only adds candidates,
+        # which the signature agreement filter removes again.
+        band_key = (sigs[:, band * rows:(band + 1) * rows] * mix).sum(axis=1)
+        order = np.argsort(band_key, kind="stable")
+        sorted_key = band_key[order]
+        starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+        sizes = np.diff(np.r_[starts, n])
+        for size in np.unique(sizes[sizes > 1]):
+            group = starts[sizes == size]
+            if size > MAX_BUCKET:
+                for start in group:
+                    keys.extend(_pivot_pairs(sigs, np.sort(order[start:start + size]), min_agree))
+                continue
+            members = np.sort(order[group[:, None] + np.arange(size)], axis=1).astype(np.int64)
+            i, j = np.triu_indices(size, k=1)
+            keys.append((members[:, i] * n + members[:, j]).ravel())
+    if not keys:
+        return np.empty((0, 2), dtype=np.int64)
+    keys = np.unique(np.concatenate(keys))
+    return np.stack([keys // n, keys % n], axis=1)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+@profiled("find_duplicate_rules")
+def find_duplicate_rules(rule_meta, threshold=0.8, num_perm=128, bands=32, seed=42, logsource=False):
+    """Cluster near-duplicate rules.
+
+    With 32 bands of 4 rows, pairs at Jaccard 0.8 become candidates with
+    probability ~1.0 and pairs at 0.3 with ~0.23; candidates are then
+    checked exactly against ``threshold``.
+
+    Returns a DataFrame (cluster, path, title, cluster_size, representative)
+    with one row per rule that belongs to a cluster of two or more."""
+    paths = list(rule_meta)
+    shingles = [rule_shingles(rule_meta[p], logsource=logsource) for p in paths]
+    sigs = minhash_signatures(shingles, num_perm=num_perm, seed=seed)
+
+    # Signature agreement estimates Jaccard; drop clear misses before the
+    # exact set comparison (the 0.1 margin absorbs estimator variance).
+    min_agree = threshold - 0.1
+    pairs = _lsh_candidates(sigs, bands, min_agree)
+    if len(pairs):
+        pairs = pairs[_agreement(sigs, pairs[:, 0], pairs[:, 1]) >= min_agree]
+
+    parent = list(range(len(paths)))
+    for i, j in pairs.tolist():
+        si, sj = shingles[i], shingles[j]
+        if not si or not sj:
+            continue
+        if len(si & sj) / len(si | sj) >= threshold:
+            ri, rj = _find(parent, i), _find(parent, j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+    clusters = {}
+    for i in range(len(paths)):
+        clusters.setdefault(_find(parent, i), []).append(i)
+
+    rows = []
+    cluster_id = 0
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        member_paths = sorted(paths[m] for m in members)
+        for p in member_paths:
+            rows.append(
+                {
+                    "cluster": cluster_id,
+                    "path": p,
+                    "title": rule_meta[p].get("title", ""),
+                    "cluster_size": len(member_paths),
+                    "representative": member_paths[0],
+                }
+            )
+        cluster_id += 1
+    print(f"[+] Found {cluster_id} near-duplicate clusters covering {len(rows)} rules.")
+    return pd.DataFrame(rows, columns=["cluster", "path", "title", "cluster_size", "representative"])
+
+
+def dedup_sigma_map(sigma_map, df_dups):
+    """sigma_map with one rule per duplicate cluster and technique.
+
+    A technique keeps the cluster representative when it is tagged with it,
+    otherwise the first cluster member it is tagged with, so no technique is
+    credited with a rule that does not carry its tag."""
+    cluster = dict(zip(df_dups["path"], df_dups["cluster"]))
+    representative = dict(zip(df_dups["cluster"], df_dups["representative"]))
+    out = {}
+    for tid, paths in sigma_map.items():
+        kept = {}
+        for p in paths:
+            c = cluster.get(p)
+            key = ("path", p) if c is None else ("cluster", c)
+            if key not in kept or p == representative[c]:
+                kept[key] = p
+        out[tid] = list(kept.values())
+    return out
+
+
+def compute_dedup_metrics(techniques, sigma_map, dedup_map):
+    """Raw vs deduplicated rule counts, weighted scores and coverage per technique.
+
+    ``dedup_rule_count`` is the number of distinct detections (duplicate
+    clusters, singletons counting as their own) among a technique's rules.
+    Single-rule coverage cannot change under deduplication, so coverage is
+    reported as redundant coverage: at least two rules (``redundant_covered``)
+    vs at least two distinct detections (``dedup_redundant_covered``)."""
+    raw = compute_weighted_metrics(techniques, sigma_map)
+    dedup = compute_weighted_metrics(techniques, dedup_map)
+    df = raw[["technique", "name", "rule_count", "weighted_rule_score"]].copy()
+    df["dedup_rule_count"] = dedup["rule_count"].values
+    df["dedup_weighted_rule_score"] = dedup["weighted_rule_score"].values
+    df["duplicate_rules"] = df["rule_count"] - df["dedup_rule_count"]
+    df["covered"] = (df["rule_count"] > 0).astype(int)
+    df["redundant_covered"] = (df["rule_count"] >= 2).astype(int)
+    df["dedup_redundant_covered"] = (df["dedup_rule_count"] >= 2).astype(int)
+    return df
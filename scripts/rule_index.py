@@ -0,0 +1,389 @@
+"""Field-level inverted index over Sigma detections.
+
+Every rule is indexed under terms for the fields, modifiers and literal
+values it uses, plus technique / logsource / origin facets:
+
+    field:commandline            mod:contains          technique:t1059.001
+    commandline=-enc             commandline|contains=-enc
+    product:windows  service:security  category:process_creation  origin:sigmahq
+
+Terms are kept sorted with one sorted posting list (rule numbers) each, so an
+exact term is a binary search and a prefix is a contiguous term range.
+AND / OR / NOT run on boolean masks over all rules. The index is persisted in
+data/cache/rule_index.npz together with a fingerprint of the parsed rules
+and the rule roots it was built from, and is rebuilt only when the rules
+change. The command line, which does not parse the rules, treats the file as
+stale once a rule file or directory under those roots is newer than it.
+
+Query syntax (case-insensitive, implicit AND between terms):
+
+    CommandLine|contains=-enc            value under a field/modifier chain
+    CommandLine~enc                      substring of any value of the field
+    eventName=ConsoleLogin product:aws   facets: technique, product, service,
+                                         category, origin, field, mod
+    technique:T1059*  Image|endswith=\\powershell.exe    trailing * = prefix
+    (a OR b) AND NOT c                   boolean operators and parentheses
+    -enc                                 bare word: substring of any value (slow path)
+
+Usage:
+
+    python -m scripts.rule_index "CommandLine~-enc AND product:windows"
+    python -m scripts.rule_index --rules-root sigmahq=data/sigma --rules-root internal=../detections "origin:internal"
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import shlex
+import time
+
+import numpy as np
+
+from .parse_sigma import RULE_SUFFIXES, extract_sigma_mappings, resolve_roots, rule_dirs
+from .profiling import profiled
+
+CACHE_DIR = os.path.join("data", "cache")
+INDEX_FILE = "rule_index.npz"
+FACETS = ("technique", "product", "service", "category", "origin", "field", "mod")
+_SEP = "\x00"
+
+
+def _values(value):
+    if isinstance(value, list):
+        for v in value:
+            yield from _values(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _values(v)
+    elif value is None:
+        yield "null"
+    else:
+        yield str(value).strip().lower()
+
+
+def rule_terms(meta):
+    """Index terms of one rule (see the module docstring)."""
+    terms = {f"technique:{t.lower()}" for t in meta.get("techniques", [])}
+    for facet, key in (("product", "log_product"), ("service", "log_service"), ("category", "log_category")):
+        if meta.get(key):
+            terms.add(f"{facet}:{str(meta[key]).lower()}")
+    if meta.get("origin"):
+        terms.add(f"origin:{str(meta['origin']).lower()}")
+
+    for name, search in (meta.get("detection") or {}).items():
+        if name in ("condition", "timeframe"):
+            continue
+        for item in search if isinstance(search, list) else [search]:
+            if not isinstance(item, dict):
+                terms.add("field:keywords")
+                terms.update(f"keywords={v}" for v in _values(item))
+                continue
+            for key, value in item.items():
+                field, *mods = str(key).lower().split("|")
+                terms.add(f"field:{field}")
+                terms.update(f"mod:{m}" for m in mods)
+                chain = "|".join([field] + mods)
+                for v in _values(value):
+                    terms.add(f"{field}={v}")
+                    if mods:
+                        terms.add(f"{chain}={v}")
+    return terms
+
+
+def rules_fingerprint(rule_meta):
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(rule_meta):
+        meta = rule_meta[path]
+        digest.update(path.encode("utf-8"))
+        digest.update(
+            json.dumps(
+                [meta.get("content_hash"), meta.get("id"), meta.get("title"),
+                 meta.get("techniques"), meta.get("origin"),
+                 meta.get("log_product"), meta.get("log_service"), meta.get("log_category"),
+                 None if meta.get("content_hash") else meta.get("detection")],
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+        )
+    return digest.hexdigest()
+
+
+def _root_list(roots):
+    return [[origin, os.path.abspath(path)] for origin, path in roots or []]
+
+
+def rules_mtime(roots):
+    """Newest mtime of the rule files and directories under ``roots``.
+
+    Directories count too, so deleting or adding a rule is noticed."""
+    newest = 0.0
+    for _, root in roots:
+        newest = max(newest, os.path.getmtime(root))
+        for base in rule_dirs(root):
+            for dirpath, _, files in os.walk(base):
+                newest = max(newest, os.path.getmtime(dirpath))
+                for file in files:
+                    if file.endswith(RULE_SUFFIXES):
+                        newest = max(newest, os.path.getmtime(os.path.join(dirpath, file)))
+    return newest
+
+
+class RuleIndex:
+    """Sorted term dictionary + posting lists over a fixed list of rules."""
+
+    def __init__(self, terms, offsets, postings, docs, fingerprint="", roots=None):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.docs = docs
+        self.fingerprint = fingerprint
+        self.roots = _root_list(roots)
+
+    @classmethod
+    @profiled("build_rule_index")
+    def build(cls, rule_meta, roots=None):
+        posting_lists = {}
+        docs = []
+        for doc, (path, meta) in enumerate(rule_meta.items()):
+            docs.append([path, meta.get("id") or "", meta.get("title", "")])
+            for term in rule_terms(meta):
+                posting_lists.setdefault(term, []).append(doc)
+        terms = sorted(posting_lists)
+        lengths = np.fromiter((len(posting_lists[t]) for t in terms), dtype=np.int64, count=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        postings = np.fromiter(
+            (d for t in terms for d in posting_lists[t]), dtype=np.int32, count=int(offsets[-1])
+        )
+        return cls(terms, offsets, postings, docs, rules_fingerprint(rule_meta), roots)
+
+    # -- persistence ---------------------------------------------------------
+
+    def save(self, cache_dir=CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, INDEX_FILE)
+        tmp = path + ".tmp.npz"
+        np.savez(
+            tmp,
+            terms=np.frombuffer(_SEP.join(self.terms).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            postings=self.postings,
+            docs=np.frombuffer(json.dumps(self.docs).encode("utf-8"), dtype=np.uint8),
+            fingerprint=np.frombuffer(self.fingerprint.encode("ascii"), dtype=np.uint8),
+            roots=np.frombuffer(json.dumps(self.roots).encode("utf-8"), dtype=np.uint8),
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, cache_dir=CACHE_DIR):
+        with np.load(os.path.join(cache_dir, INDEX_FILE)) as data:
+            raw_terms = data["terms"].tobytes().decode("utf-8")
+            return cls(
+                raw_terms.split(_SEP) if raw_terms else [],
+                data["offsets"],
+                data["postings"],
+                json.loads(data["docs"].tobytes().decode("utf-8")),
+                data["fingerprint"].tobytes().decode("ascii"),
+                json.loads(data["roots"].tobytes().decode("utf-8")) if "roots" in data.files else None,
+            )
+
+    def is_stale(self, roots, cache_dir=CACHE_DIR):
+        """True if the saved index was built from other roots or a rule changed since it was saved."""
+        if self.roots != _root_list(roots):
+            return True
+        return rules_mtime(roots) > os.path.getmtime(os.path.join(cache_dir, INDEX_FILE))
+
+    # -- lookups -------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _posting(self, i):
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def _union(self, indices):
+        lists = [self._posting(i) for i in indices]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        if len(lists) == 1:
+            return lists[0]
+        return np.unique(np.concatenate(lists))
+
+    def term(self, term):
+        i = bisect.bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return self._posting(i)
+        return np.empty(0, dtype=np.int32)
+
+    def _prefix_range(self, prefix):
+        lo = bisect.bisect_left(self.terms, prefix)
+        hi = bisect.bisect_left(self.terms, prefix + "\U0010ffff")
+        return range(lo, hi)
+
+    def prefix(self, prefix):
+        return self._union(self._prefix_range(prefix))
+
+    def substring(self, field_prefix, text):
+        """Rules with a term ``<field_prefix>...`` whose value contains ``text``."""
+        start = len(field_prefix)
+        terms = self.terms
+        return self._union(i for i in self._prefix_range(field_prefix) if text in terms[i][start:])
+
+    def _any_value_substring(self, text):
+        terms = self.terms
+        return self._union(
+            i for i, t in enumerate(terms) if "=" in t and ":" not in t.split("=", 1)[0] and text in t.split("=", 1)[1]
+        )
+
+    def lookup(self, token):
+        """Posting list for a single query term."""
+        token = token.lower()
+        op_at = min((token.find(op) for op in "=~" if op in token), default=-1)
+        if op_at > 0:
+            field, op, value = token[:op_at], token[op_at], token[op_at + 1:]
+            if op == "~":
+                return self.substring(f"{field}=", value)
+            if value.endswith("*"):
+                return self.prefix(f"{field}={value[:-1]}")
+            return self.term(f"{field}={value}")
+        facet, sep, value = token.partition(":")
+        if sep and facet in FACETS:
+            if value.endswith("*"):
+                return self.prefix(f"{facet}:{value[:-1]}")
+            return self.term(f"{facet}:{value}")
+        return self._any_value_substring(token)
+
+    # -- boolean queries -----------------------------------------------------
+
+    def query(self, text):
+        """Evaluate a boolean query; returns the sorted matching rule numbers."""
+        n = len(self.docs)
+        lex = shlex.shlex(text, posix=True, punctuation_chars="()")
+        lex.whitespace_split = True
+        lex.escape = ""  # keep Windows path backslashes literal
+        tokens = list(lex)
+        pos = 0
+
+        def peek():
+            return tokens[pos].upper() if pos < len(tokens) else None
+
+        def parse_or():
+            nonlocal pos
+            result = parse_and()
+            while peek() == "OR":
+                pos += 1
+                result = result | parse_and()
+            return result
+
+        def parse_and():
+            nonlocal pos
+            result = parse_not()
+            while peek() not in (None, "OR", ")"):
+                if peek() == "AND":
+                    pos += 1
+                result = result & parse_not()
+            return result
+
+        def parse_not():
+            nonlocal pos
+            if peek() == "NOT":
+                pos += 1
+                return ~parse_not()
+            return parse_atom()
+
+        def parse_atom():
+            nonlocal pos
+            if pos >= len(tokens):
+                raise ValueError(f"Unexpected end of query: {text!r}")
+            token = tokens[pos]
+            pos += 1
+            if token == "(":
+                result = parse_or()
+                if peek() != ")":
+                    raise ValueError(f"Missing ')' in query: {text!r}")
+                pos += 1
+                return result
+            if token == ")":
+                raise ValueError(f"Unexpected ')' in query: {text!r}")
+            mask = np.zeros(n, dtype=bool)
+            mask[self.lookup(token)] = True
+            return mask
+
+        result = parse_or()
+        if pos != len(tokens):
+            raise ValueError(f"Unexpected {tokens[pos]!r} in query: {text!r}")
+        return np.flatnonzero(result)
+
+    def search(self, text):
+        """Matching rules as dicts (path, id, title)."""
+        return [dict(zip(("path", "id", "title"), self.docs[i])) for i in self.query(text)]
+
+
+def load_or_build_index(rule_meta, cache_dir=CACHE_DIR, roots=None):
+    """Cached index for ``rule_meta``; rebuilt and saved when the rules changed.
+
+    ``roots`` are the (origin, path) pairs the rules were parsed from; they
+    are saved with the index so the command line can check it for staleness."""
+    fingerprint = rules_fingerprint(rule_meta)
+    try:
+        index = RuleIndex.load(cache_dir)
+        if index.fingerprint == fingerprint:
+            print(f"[+] Loaded rule index ({len(index.terms)} terms) from {cache_dir}")
+            if roots is not None and index.roots != _root_list(roots):
+                index.roots = _root_list(roots)
+                index.save(cache_dir)
+            else:
+                # Still current: mark it as checked against the rules on disk.
+                os.utime(os.path.join(cache_dir, INDEX_FILE))
+            return index
+    except (OSError, KeyError, ValueError):
+        pass
+    index = RuleIndex.build(rule_meta, roots)
+    path = index.save(cache_dir)
+    print(f"[+] Built rule index: {len(index.terms)} terms over {len(index)} rules -> {path}")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search Sigma rules by field, modifier, value and facets")
+    parser.add_argument("query", nargs="+", help="query, e.g. \"CommandLine~-enc AND product:windows\"")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="re-parse the Sigma rules and rebuild the index")
+    parser.add_argument(
+        "--rules-root",
+        action="append",
+        default=None,
+        metavar="[NAME=]PATH",
+        help="Sigma rule repository to index, as in main.py (repeatable). "
+        "Default: the roots the saved index was built from, else the SigmaHQ rules under data/sigma",
+    )
+    parser.add_argument("--parse-workers", type=int, default=None, help="processes for parsing rule shards")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    roots = resolve_roots(args.rules_root) if args.rules_root else None
+    index = None
+    if not args.rebuild:
+        try:
+            index = RuleIndex.load(args.cache_dir)
+        except (OSError, KeyError, ValueError):
+            pass
+    if index is not None:
+        roots = roots or [tuple(r) for r in index.roots] or resolve_roots()
+        if index.is_stale(roots, args.cache_dir):
+            print(f"[!] {INDEX_FILE} is older than the rules or was built from other roots; rebuilding")
+            index = None
+    if index is None:
+        roots = roots or resolve_roots()
+        _, rule_meta = extract_sigma_mappings(roots=roots, workers=args.parse_workers)
+        index = load_or_build_index(rule_meta, args.cache_dir, roots=roots)
+
+    text = " ".join(args.query)
+    start = time.perf_counter()
+    hits = index.search(text)
+    elapsed = (time.perf_counter() - start) * 1e3
+    for hit in hits[:args.limit]:
+        print(f"{hit['id'] or '-':<38} {hit['title']}\n    {hit['path']}")
+    print(f"[+] {len(hits)} rules match ({elapsed:.1f} ms)")
@@ -2,6 +2,8 @@ import os
 
 import pandas as pd
 
+from .profiling import profiled
+
 try:
     from sentence_transformers import SentenceTransformer
     from sklearn.cluster import KMeans
@@ -35,16 +37,16 @@ def build_rule_corpus(rule_meta, max_rules=1000):
     return paths, texts
 
 
+@profiled("run_clustering")
 def run_clustering(rule_meta, out_csv="output/semantic_clusters.csv", n_clusters=10):
     if not HAVE_EMBED:
         print("[!] sentence-transformers / scikit-learn not available, skipping semantic clustering.")
-        return
+        return None
 
-    os.makedirs("output", exist_ok=True)
     paths, texts = build_rule_corpus(rule_meta)
     if not texts:
         print("[!] No rules to cluster.")
-        return
+        return None
 
     print(f"[+] Encoding {len(texts)} rules with sentence-transformers...")
     model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -69,8 +71,11 @@ def run_clustering(rule_meta, out_csv="output/semantic_clusters.csv", n_clusters
             }
         )
     df = pd.DataFrame(rows)
-    df.to_csv(out_csv, index=False)
-    print(f"[+] Saved semantic clusters to {out_csv}")
+    if out_csv:
+        os.makedirs(os.path.dirname(out_csv) or ".", exist_ok=True)
+        df.to_csv(out_csv, index=False)
+        print(f"[+] Saved semantic clusters to {out_csv}")
+    return df
 
 
 if __name__ == "__main__":
@@ -0,0 +1,856 @@
+"""Compile Sigma ``detection`` blocks into matcher closures and replay local events.
+
+Coverage elsewhere in the pipeline is tag-based. This module measures
+*empirical* coverage instead: which rules actually fire on a set of local
+JSON/JSONL event exports (Sysmon, Windows Security, CloudTrail, ...).
+
+    python -m scripts.sigma_eval events/*.jsonl --workers 8
+"""
+import argparse
+import base64
+import fnmatch
+import gzip
+import ipaddress
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from .profiling import count, profiled
+
+# Public helpers shared with scripts.event_router: the sentinel field_getter()
+# returns for absent fields, and patterns for unescaped / escaped wildcards.
+MISSING = object()
+WILDCARD = re.compile(r"(?<!\\)[*?]")
+ESCAPED_WILDCARD = re.compile(r"\\[*?\\]")
+_WINDASH = ("-", "/", "–", "—", "―")
+# Only a dash or slash that starts a word is a command-line flag, as in
+# pySigma; dashes inside words (Set-MpPreference) are left alone.
+_WINDASH_FLAG = re.compile(r"\B[-/]\b")
+
+
+class UnsupportedRule(Exception):
+    """Raised when a rule uses a construct the evaluator cannot compile."""
+
+
+# ---------------------------------------------------------------------------
+# Field values
+# ---------------------------------------------------------------------------
+
+
+def field_getter(field):
+    """``get(event)`` for a (possibly dotted) field name; MISSING when absent."""
+    if "." not in field:
+        return lambda event: event.get(field, MISSING)
+    parts = field.split(".")
+
+    def get(event):
+        value = event.get(field, MISSING)
+        if value is not MISSING:
+            return value
+        cur = event
+        for part in parts:
+            if not isinstance(cur, dict) or part not in cur:
+                return MISSING
+            cur = cur[part]
+        return cur
+
+    return get
+
+
+def _wildcard_regex(pattern):
+    """Sigma wildcards (* and ?, backslash-escapable) to an anchored regex."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern) and pattern[i + 1] in "*?\\":
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        out.append(".*" if c == "*" else "." if c == "?" else re.escape(c))
+        i += 1
+    return "^" + "".join(out) + "$"
+
+
+def _base64_variants(value, offset):
+    if not offset:
+        return [base64.b64encode(value).decode()]
+    start_offsets = (0, 2, 3)
+    end_offsets = (None, -3, -2)
+    return [
+        base64.b64encode(i * b" " + value)[start_offsets[i]:end_offsets[(len(value) + i) % 3]].decode()
+        for i in range(3)
+    ]
+
+
+def _transform(value, mods):
+    """Apply the value-transforming modifiers; returns a list of string variants."""
+    variants = [value]
+    if "windash" in mods:
+        variants = list(dict.fromkeys(_WINDASH_FLAG.sub(d, v) for v in variants for d in _WINDASH))
+    if "base64" in mods or "base64offset" in mods:
+        if "utf16le" in mods or "wide" in mods:
+            encoding = "utf-16le"
+        elif "utf16be" in mods:
+            encoding = "utf-16be"
+        elif "utf16" in mods:
+            encoding = "utf-16"
+        else:
+            encoding = "utf-8"
+        variants = [
+            enc
+            for v in variants
+            for enc in _base64_variants(v.encode(encoding), "base64offset" in mods)
+        ]
+    return variants
+
+
+_SUPPORTED_MODS = {
+    "contains", "startswith", "endswith", "all", "re", "i", "m", "s", "cased", "exists",
+    "windash", "base64", "base64offset", "utf16le", "utf16be", "utf16", "wide",
+    "lt", "lte", "gt", "gte", "cidr",
+}
+_COMPARE = {
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+}
+
+
+def _all_of(preds):
+    # Small arities are unrolled: generator-based all()/any() dominates the
+    # per-event cost when called millions of times.
+    if len(preds) == 1:
+        return preds[0]
+    if len(preds) == 2:
+        a, b = preds
+        return lambda event: a(event) and b(event)
+    if len(preds) == 3:
+        a, b, c = preds
+        return lambda event: a(event) and b(event) and c(event)
+    return lambda event: all(p(event) for p in preds)
+
+
+def _any_of(preds):
+    if len(preds) == 1:
+        return preds[0]
+    if len(preds) == 2:
+        a, b = preds
+        return lambda event: a(event) or b(event)
+    if len(preds) == 3:
+        a, b, c = preds
+        return lambda event: a(event) or b(event) or c(event)
+    return lambda event: any(p(event) for p in preds)
+
+
+class _FieldTest:
+    """All values of one ``field|modifiers`` key, grouped by match kind.
+
+    Plain equality goes to a set; prefixes, suffixes and substrings are folded
+    into one alternation regex so a field is tested with a single C call."""
+
+    def __init__(self, values, mods):
+        self.cased = "cased" in mods
+        self.null_ok = False
+        self.eq = set()
+        self.prefixes = []
+        self.suffixes = []
+        self.contains = []
+        self.others = []
+
+        for value in values:
+            if value is None:
+                self.null_ok = True
+                continue
+            self._add(value, mods)
+        self.any = self._build_any()
+
+    def is_empty(self):
+        return not (self.eq or self.prefixes or self.suffixes or self.contains or self.others)
+
+    def _fold(self, s):
+        return s if self.cased else s.lower()
+
+    def _add(self, value, mods):
+        for mod in _COMPARE:
+            if mod in mods:
+                try:
+                    bound = float(value)
+                except (TypeError, ValueError):
+                    raise UnsupportedRule(f"non-numeric value for |{mod}")
+                op = _COMPARE[mod]
+                self.others.append(lambda raw, low, op=op, bound=bound: _num_cmp(raw, op, bound))
+                return
+        if "cidr" in mods:
+            try:
+                net = ipaddress.ip_network(str(value), strict=False)
+            except ValueError:
+                raise UnsupportedRule(f"invalid CIDR {value!r}")
+            self.others.append(lambda raw, low, net=net: _in_network(raw, net))
+            return
+        if "re" in mods:
+            flags = (re.I if "i" in mods else 0) | (re.M if "m" in mods else 0) | (re.S if "s" in mods else 0)
+            try:
+                rx = re.compile(str(value), flags)
+            except re.error as e:
+                raise UnsupportedRule(f"invalid regex: {e}")
+            self.others.append(lambda raw, low, rx=rx: rx.search(raw) is not None)
+            return
+
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        base_kind = next((m for m in ("contains", "startswith", "endswith") if m in mods), "eq")
+        for variant in _transform(str(value), mods):
+            text = self._fold(variant)
+            kind = base_kind
+            # Leading/trailing wildcards on plain values are the common shapes
+            # (*\\rundll32.exe, cmd*, *-enc*); map them onto the fast paths.
+            if kind == "eq" and not ESCAPED_WILDCARD.search(text):
+                inner = text.strip("*")
+                if inner and not WILDCARD.search(inner) and text != inner:
+                    lead = text.startswith("*")
+                    trail = text.endswith("*")
+                    kind = "contains" if lead and trail else "endswith" if lead else "startswith"
+                    text = inner
+            if WILDCARD.search(text) or ESCAPED_WILDCARD.search(text):
+                # Fall back to a regex for embedded or escaped wildcards.
+                pattern = _wildcard_regex(text)
+                if kind == "contains":
+                    pattern = pattern[1:-1].join([".*", ".*"])
+                elif kind == "startswith":
+                    pattern = pattern[:-1] + ".*$"
+                elif kind == "endswith":
+                    pattern = "^.*" + pattern[1:]
+                rx = re.compile(pattern, re.S)
+                self.others.append(lambda raw, low, rx=rx: rx.match(low) is not None)
+            elif kind == "contains":
+                self.contains.append(text)
+            elif kind == "startswith":
+                self.prefixes.append(text)
+            elif kind == "endswith":
+                self.suffixes.append(text)
+            else:
+                self.eq.add(text)
+
+    def _build_any(self):
+        eq = frozenset(self.eq)
+        parts = []
+        if self.prefixes:
+            parts.append("\\A(?:" + "|".join(map(re.escape, self.prefixes)) + ")")
+        if self.suffixes:
+            parts.append("(?:" + "|".join(map(re.escape, self.suffixes)) + ")\\Z")
+        if self.contains:
+            parts.append("(?:" + "|".join(map(re.escape, self.contains)) + ")")
+        search = re.compile("|".join(parts), re.S).search if parts else None
+        others = list(self.others)
+
+        if not others:
+            if search is None:
+                return lambda raw, low: low in eq
+            if not eq:
+                return lambda raw, low: search(low) is not None
+            return lambda raw, low: low in eq or search(low) is not None
+
+        def test(raw, low):
+            if low in eq or (search is not None and search(low) is not None):
+                return True
+            for p in others:
+                if p(raw, low):
+                    return True
+            return False
+
+        return test
+
+
+
+def _num_cmp(raw, op, bound):
+    try:
+        return op(float(raw), bound)
+    except ValueError:
+        return False
+
+
+def _in_network(raw, net):
+    try:
+        return ipaddress.ip_address(raw) in net
+    except ValueError:
+        return False
+
+
+def _all_values(checks):
+    if len(checks) == 1:
+        return checks[0]
+    return lambda raw, low: all(c(raw, low) for c in checks)
+
+
+def _compile_field(key, value):
+    field, *mods = str(key).split("|")
+    mods = {m.lower() for m in mods}
+    unknown = mods - _SUPPORTED_MODS
+    if unknown:
+        raise UnsupportedRule(f"unsupported modifier(s) {sorted(unknown)}")
+    get = field_getter(field)
+
+    if "exists" in mods:
+        expected = bool(value)
+        return lambda event: (get(event) not in (MISSING, None)) == expected
+
+    values = value if isinstance(value, list) else [value]
+    test = _FieldTest(values, mods)
+    check = test.any
+    if "all" in mods:
+        # Every value must match, but the variants of one value (windash,
+        # base64offset) are alternatives: AND across values of per-value ORs.
+        check = _all_values([_FieldTest([v], mods).any for v in values if v is not None])
+    cased = test.cased
+    null_ok = test.null_ok
+    only_null = null_ok and test.is_empty()
+
+    def match(event):
+        v = get(event)
+        if v is MISSING or v is None:
+            return null_ok
+        if v.__class__ is str:
+            if not v and null_ok:
+                return True
+            return not only_null and check(v, v if cased else v.lower())
+        if only_null:
+            return False
+        if isinstance(v, list):
+            for x in v:
+                raw = value_str(x)
+                if check(raw, raw if cased else raw.lower()):
+                    return True
+            return False
+        raw = value_str(v)
+        return check(raw, raw if cased else raw.lower())
+
+    if null_ok or cased or "." in field:
+        return match
+
+    # The common shape (plain field, case-insensitive, no null values) reads
+    # the event dict directly: this closure runs once per rule and event, and
+    # the getter call plus null handling were about a third of its cost.
+    def match_plain(event):
+        v = event.get(field)
+        if v.__class__ is str:
+            return check(v, v.lower())
+        return v is not None and match(event)
+
+    return match_plain
+
+
+def value_str(v):
+    """Event value as the string rules compare against (booleans lower-case)."""
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    return v if isinstance(v, str) else str(v)
+
+
+def _compile_keywords(keywords):
+    test = _FieldTest(keywords, {"contains"})
+
+    def match(event):
+        for v in _iter_strings(event):
+            if test.any(v, v.lower()):
+                return True
+        return False
+
+    return match
+
+
+def _iter_strings(obj):
+    if isinstance(obj, dict):
+        for v in obj.values():
+            yield from _iter_strings(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _iter_strings(v)
+    elif isinstance(obj, str):
+        yield obj
+    elif obj is not None:
+        yield str(obj)
+
+
+def _compile_map(mapping):
+    return _all_of([_compile_field(k, v) for k, v in mapping.items()])
+
+
+def compile_search(definition):
+    """Compile one search identifier (selection/filter) into ``match(event) -> bool``."""
+    if isinstance(definition, dict):
+        return _compile_map(definition)
+    if isinstance(definition, list):
+        if all(isinstance(d, dict) for d in definition):
+            return _any_of([_compile_map(d) for d in definition])
+        if all(not isinstance(d, (dict, list)) for d in definition):
+            return _compile_keywords(definition)
+    if isinstance(definition, (str, int)):
+        return _compile_keywords([definition])
+    raise UnsupportedRule("unsupported search identifier layout")
+
+
+# ---------------------------------------------------------------------------
+# Conditions
+# ---------------------------------------------------------------------------
+
+_TOKEN = re.compile(r"\s*(\(|\)|[^\s()]+)")
+
+
+def tokenize_condition(condition):
+    """Split a Sigma condition into words and parentheses."""
+    tokens = _TOKEN.findall(condition)
+    if "|" in tokens or any(t.startswith("|") for t in tokens):
+        raise UnsupportedRule("aggregation conditions are not supported")
+    return tokens
+
+
+class _ConditionParser:
+    """Recursive descent over ``or`` < ``and`` < ``not`` < atoms."""
+
+    def __init__(self, tokens, searches):
+        self.tokens = tokens
+        self.pos = 0
+        self.searches = searches
+
+    def _peek(self):
+        return self.tokens[self.pos].lower() if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        expr = self._or()
+        if self.pos != len(self.tokens):
+            raise UnsupportedRule(f"unexpected token {self.tokens[self.pos]!r} in condition")
+        return expr
+
+    def _or(self):
+        parts = [self._and()]
+        while self._peek() == "or":
+            self._next()
+            parts.append(self._and())
+        return _any_of(parts)
+
+    def _and(self):
+        parts = [self._not()]
+        while self._peek() == "and":
+            self._next()
+            parts.append(self._not())
+        return _all_of(parts)
+
+    def _not(self):
+        if self._peek() == "not":
+            self._next()
+            inner = self._not()
+            return lambda event: not inner(event)
+        return self._atom()
+
+    def _atom(self):
+        tok = self._peek()
+        if tok is None:
+            raise UnsupportedRule("condition ended unexpectedly")
+        if tok == "(":
+            self._next()
+            expr = self._or()
+            if self._peek() != ")":
+                raise UnsupportedRule("unbalanced parentheses in condition")
+            self._next()
+            return expr
+        if tok in ("1", "any", "all") and self.pos + 1 < len(self.tokens) and self.tokens[self.pos + 1].lower() == "of":
+            quantifier = self._next().lower()
+            self._next()
+            target = self._next()
+            return self._quantified(quantifier, target)
+        name = self._next()
+        if name not in self.searches:
+            raise UnsupportedRule(f"unknown search identifier {name!r}")
+        return self.searches[name]
+
+    def _quantified(self, quantifier, target):
+        if target.lower() == "them":
+            names = [n for n in self.searches if not n.startswith("_")]
+        else:
+            names = [n for n in self.searches if fnmatch.fnmatchcase(n, target)]
+        if not names:
+            raise UnsupportedRule(f"no search identifiers match {target!r}")
+        parts = [self.searches[n] for n in names]
+        return _all_of(parts) if quantifier == "all" else _any_of(parts)
+
+
+def compile_detection(detection):
+    """Compile a Sigma ``detection`` block into ``match(event) -> bool``.
+
+    Raises UnsupportedRule for aggregations, unknown modifiers and other
+    constructs that cannot be evaluated on single events."""
+    if not isinstance(detection, dict) or "condition" not in detection:
+        raise UnsupportedRule("detection has no condition")
+    searches = {
+        name: compile_search(definition)
+        for name, definition in detection.items()
+        if name not in ("condition", "timeframe")
+    }
+    conditions = detection["condition"]
+    if not isinstance(conditions, list):
+        conditions = [conditions]
+    return _any_of([_ConditionParser(tokenize_condition(str(c)), searches).parse() for c in conditions])
+
+
+def compile_rules(rule_meta):
+    """Compile every rule in ``rule_meta``.
+
+    Returns ([(rule_path, match), ...], {rule_path: reason})."""
+    compiled = []
+    unsupported = {}
+    for path, meta in rule_meta.items():
+        try:
+            compiled.append((path, compile_detection(meta.get("detection"))))
+        except UnsupportedRule as e:
+            unsupported[path] = str(e)
+    return compiled, unsupported
+
+
+# ---------------------------------------------------------------------------
+# Events
+# ---------------------------------------------------------------------------
+
+
+def normalize_event(event):
+    """Lift fields out of common export wrappers so rules see flat field names.
+
+    Handles Windows XML-to-JSON (``Event.System`` / ``Event.EventData``) and
+    winlogbeat (``winlog.event_data``) layouts; other events pass through."""
+    if not isinstance(event, dict):
+        return {}
+    wrapped = event.get("Event")
+    if isinstance(wrapped, dict):
+        flat = dict(event)
+        for section in ("System", "EventData", "UserData"):
+            part = wrapped.get(section)
+            if isinstance(part, dict):
+                flat.update(_unwrap_section(part))
+        return flat
+    winlog = event.get("winlog")
+    if isinstance(winlog, dict):
+        flat = dict(event)
+        flat.update(winlog.get("event_data") or {})
+        if "event_id" in winlog:
+            flat.setdefault("EventID", winlog["event_id"])
+        if "channel" in winlog:
+            flat.setdefault("Channel", winlog["channel"])
+        return flat
+    return event
+
+
+def _unwrap_section(section):
+    out = {}
+    for key, value in section.items():
+        if key == "Data" and isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    name = item.get("@Name") or item.get("Name")
+                    if name:
+                        out[name] = item.get("#text")
+        elif isinstance(value, dict) and "#text" in value:
+            out[key] = value["#text"]
+        else:
+            out[key] = value
+    return out
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_event_chunks(paths, chunk_size=2000):
+    """Yield lists of raw JSON lines (JSONL) or decoded events (JSON documents).
+
+    JSONL lines are left undecoded so the JSON parsing happens in the workers.
+    A JSON document may be a list of events, a CloudTrail ``{"Records": [...]}``
+    export or a single event."""
+    chunk = []
+    for path in paths:
+        base = path[:-3] if path.endswith(".gz") else path
+        with _open(path) as f:
+            lines = base.endswith((".jsonl", ".ndjson"))
+            if not lines:
+                try:
+                    doc = json.load(f)
+                except json.JSONDecodeError:
+                    # Plenty of "JSON" exports are really one event per line;
+                    # lines that still fail to decode are counted as bad events.
+                    count("json_read_as_jsonl")
+                    print(f"[+] {path} is not a single JSON document; reading it as JSONL")
+                    f.seek(0)
+                    lines = True
+            if lines:
+                for line in f:
+                    if line.strip():
+                        chunk.append(line)
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                continue
+        if isinstance(doc, dict) and isinstance(doc.get("Records"), list):
+            doc = doc["Records"]
+        for event in doc if isinstance(doc, list) else [doc]:
+            chunk.append(event)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def find_event_files(inputs):
+    exts = (".json", ".jsonl", ".ndjson", ".json.gz", ".jsonl.gz", ".ndjson.gz")
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in sorted(files) if f.endswith(exts))
+        else:
+            paths.append(item)
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# Replay
+# ---------------------------------------------------------------------------
+
+class LinearEvaluator:
+    """Evaluate every compiled rule against every event."""
+
+    def __init__(self, compiled):
+        self.matchers = [match for _, match in compiled]
+        self.evaluations = 0
+
+    def matches(self, event):
+        self.evaluations += len(self.matchers)
+        return [i for i, match in enumerate(self.matchers) if match(event)]
+
+    def take_counters(self):
+        counters = {"evaluations": self.evaluations}
+        self.evaluations = 0
+        return counters
+
+
+def _make_evaluator(rule_meta, routed):
+    compiled, unsupported = compile_rules(rule_meta)
+    if routed:
+        from .event_router import EventRouter
+
+        return EventRouter(compiled, rule_meta), compiled, unsupported
+    return LinearEvaluator(compiled), compiled, unsupported
+
+
+_WORKER_EVALUATOR = None
+
+
+def _init_worker(rule_meta, routed):
+    global _WORKER_EVALUATOR
+    _WORKER_EVALUATOR, _, _ = _make_evaluator(rule_meta, routed)
+
+
+def _decode(item):
+    if isinstance(item, str):
+        try:
+            return json.loads(item)
+        except json.JSONDecodeError:
+            return None
+    return item
+
+
+def _eval_chunk(chunk, evaluator=None):
+    evaluator = _WORKER_EVALUATOR if evaluator is None else evaluator
+    hits = {}
+    events = 0
+    bad = 0
+    for item in chunk:
+        event = _decode(item)
+        if event is None:
+            bad += 1
+            continue
+        event = normalize_event(event)
+        events += 1
+        for i in evaluator.matches(event):
+            hits[i] = hits.get(i, 0) + 1
+    return events, bad, hits, evaluator.take_counters()
+
+
+def _replay_fields(meta):
+    # Only what the workers need; the full rule_meta is not shipped to them.
+    return {
+        "detection": meta.get("detection"),
+        "log_product": meta.get("log_product"),
+        "log_service": meta.get("log_service"),
+        "log_category": meta.get("log_category"),
+    }
+
+
+@profiled("replay_events")
+def replay_events(paths, rule_meta, workers=None, chunk_size=2000, routed=True):
+    """Stream events from ``paths`` through the compiled rules.
+
+    With ``routed`` (default) each event only reaches the rules for its
+    logsource that pass the prefilters of scripts.event_router; otherwise
+    every rule sees every event. With more than one worker, chunks are
+    evaluated in a process pool whose workers each compile the rules once;
+    at most two chunks per worker are in flight so memory stays flat
+    regardless of input size.
+
+    Returns (hits {rule_path: count}, unsupported {rule_path: reason}, stats)."""
+    workers = workers or os.cpu_count() or 1
+    replay_meta = {p: _replay_fields(m) for p, m in rule_meta.items()}
+    evaluator, compiled, unsupported = _make_evaluator(replay_meta, routed)
+    keys = [path for path, _ in compiled]
+    totals = [0] * len(keys)
+    counters = {}
+    events = bad = 0
+    start = time.perf_counter()
+
+    def merge(result):
+        nonlocal events, bad
+        n, b, hits, chunk_counters = result
+        events += n
+        bad += b
+        for i, c in hits.items():
+            totals[i] += c
+        for name, value in chunk_counters.items():
+            counters[name] = counters.get(name, 0) + value
+
+    chunks = iter_event_chunks(paths, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            merge(_eval_chunk(chunk, evaluator))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(replay_meta, routed)) as pool:
+            pending = set()
+            for chunk in chunks:
+                pending.add(pool.submit(_eval_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        merge(fut.result())
+            for fut in pending:
+                merge(fut.result())
+
+    elapsed = time.perf_counter() - start
+    count("events", events)
+    naive = events * len(keys)
+    evaluations = counters.pop("evaluations", naive)
+    stats = {
+        "events": events,
+        "bad_events": bad,
+        "rules_compiled": len(keys),
+        "rules_unsupported": len(unsupported),
+        "seconds": elapsed,
+        "events_per_second": events / elapsed if elapsed > 0 else 0.0,
+        "workers": workers,
+        "routed": routed,
+        "rule_evaluations": evaluations,
+        "skip_rate": 1.0 - evaluations / naive if naive else 0.0,
+    }
+    stats.update(counters)
+    return {k: c for k, c in zip(keys, totals)}, unsupported, stats
+
+
+def rule_hits_table(hits, unsupported, rule_meta):
+    rows = []
+    for path, meta in rule_meta.items():
+        rows.append(
+            {
+                "path": path,
+                "title": meta.get("title", ""),
+                "techniques": " ".join(meta.get("techniques") or []),
+                "status": "unsupported" if path in unsupported else "compiled",
+                "reason": unsupported.get(path, ""),
+                "hits": hits.get(path, 0),
+            }
+        )
+    return pd.DataFrame(rows, columns=["path", "title", "techniques", "status", "reason", "hits"])
+
+
+def compute_empirical_coverage(techniques, sigma_map, hits):
+    """Per-technique tag-based vs empirical coverage.
+
+    A technique is empirically covered when at least one of its rules fired."""
+    rows = []
+    for t in techniques:
+        tid = t["id"].upper()
+        paths = sigma_map.get(tid, [])
+        evaluated = [p for p in paths if p in hits]
+        firing = [p for p in evaluated if hits[p] > 0]
+        rows.append(
+            {
+                "technique": tid,
+                "name": t.get("name", ""),
+                "rule_count": len(paths),
+                "evaluated_rules": len(evaluated),
+                "firing_rules": len(firing),
+                "hit_count": sum(hits[p] for p in firing),
+                "tag_covered": 1 if paths else 0,
+                "empirically_covered": 1 if firing else 0,
+            }
+        )
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "technique",
+            "name",
+            "rule_count",
+            "evaluated_rules",
+            "firing_rules",
+            "hit_count",
+            "tag_covered",
+            "empirically_covered",
+        ],
+    )
+
+
+def print_replay_stats(stats):
+    print(
+        f"[+] Replayed {stats['events']} events through {stats['rules_compiled']} rules "
+        f"in {stats['seconds']:.2f}s ({stats['events_per_second']:.0f} events/s, "
+        f"{stats['workers']} workers)"
+    )
+    if stats.get("routed"):
+        print(
+            f"[+] Router: {stats['rule_evaluations']} rule evaluations, "
+            f"skip rate {stats['skip_rate']:.1%}, "
+            f"{stats.get('unclassified_events', 0)} unclassified events"
+        )
+    if stats["rules_unsupported"]:
+        print(f"[!] {stats['rules_unsupported']} rules could not be compiled (see rule_hits table).")
+    if stats["bad_events"]:
+        print(f"[!] Skipped {stats['bad_events']} undecodable events.")
+
+
+if __name__ == "__main__":
+    from .parse_sigma import extract_sigma_mappings
+
+    parser = argparse.ArgumentParser(description="Replay local events through compiled Sigma rules")
+    parser.add_argument("events", nargs="+", help="JSON/JSONL event files or directories")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-route", action="store_true", help="evaluate every rule on every event")
+    parser.add_argument("--out", default="output/rule_hits.csv")
+    args = parser.parse_args()
+
+    sigma_map, rule_meta = extract_sigma_mappings()
+    hits, unsupported, stats = replay_events(
+        find_event_files(args.events), rule_meta, workers=args.workers, routed=not args.no_route
+    )
+    print_replay_stats(stats)
+    df = rule_hits_table(hits, unsupported, rule_meta)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    df.to_csv(args.out, index=False)
+    print(f"[+] Saved rule hits to {args.out}")
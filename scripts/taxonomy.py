@@ -0,0 +1,115 @@
+"""Technique segmentation driven by config/taxonomy.yml.
+
+Segments are defined by platform substrings, tactics, explicit IDs or an ID
+regex (see the config file). The taxonomy is compiled into lookup tables
+once:
+
+* ``platform -> segments``: each distinct platform string is matched against
+  all platform keys the first time it is seen and memoised, so the substring
+  scan runs once per platform instead of once per technique;
+* ``tactic -> segments`` and ``ID -> segments``: plain dict lookups.
+
+``membership()`` assigns every technique to all of its segments in one pass
+and returns a boolean (techniques x segments) matrix; segment sizes and
+coverage are column reductions over it.
+"""
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import yaml
+
+TAXONOMY_FILE = os.path.join("config", "taxonomy.yml")
+CRITERIA = ("platforms", "tactics", "ids", "id_pattern")
+
+
+class Taxonomy:
+    """Compiled segment definitions."""
+
+    def __init__(self, segments):
+        self.segments = list(segments)
+        self.descriptions = {}
+        self._platform_keys = []
+        self._tactics = {}
+        self._ids = {}
+        self._patterns = []
+        self._platforms = {}
+        for col, (name, spec) in enumerate(segments.items()):
+            spec = spec or {}
+            unknown = set(spec) - set(CRITERIA) - {"description"}
+            if unknown:
+                raise ValueError(f"Unknown criteria for segment {name!r}: {sorted(unknown)}")
+            if not any(spec.get(c) for c in CRITERIA):
+                raise ValueError(f"Segment {name!r} has no platforms, tactics, ids or id_pattern")
+            self.descriptions[name] = spec.get("description", "")
+            self._platform_keys.extend((str(k).upper(), col) for k in spec.get("platforms") or [])
+            for tactic in spec.get("tactics") or []:
+                self._tactics.setdefault(str(tactic).lower(), set()).add(col)
+            for tid in spec.get("ids") or []:
+                self._ids.setdefault(str(tid).upper(), set()).add(col)
+            if spec.get("id_pattern"):
+                self._patterns.append((re.compile(spec["id_pattern"], re.IGNORECASE), col))
+
+    @classmethod
+    def from_file(cls, path=TAXONOMY_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        segments = config.get("segments")
+        if not segments:
+            raise ValueError(f"No segments defined in {path}")
+        return cls(segments)
+
+    def platform_segments(self, platform):
+        """Segment columns for one platform string (memoised)."""
+        cols = self._platforms.get(platform)
+        if cols is None:
+            upper = platform.upper()
+            cols = self._platforms[platform] = {col for key, col in self._platform_keys if key in upper}
+        return cols
+
+    def technique_segments(self, t):
+        cols = set()
+        for platform in t.get("platforms") or []:
+            cols |= self.platform_segments(platform)
+        for tactic in t.get("killchain") or []:
+            cols |= self._tactics.get(tactic, set())
+        tid = t["id"].upper()
+        cols |= self._ids.get(tid, set())
+        for pattern, col in self._patterns:
+            if pattern.search(tid):
+                cols.add(col)
+        return cols
+
+    def membership(self, techniques):
+        """Boolean (len(techniques) x len(segments)) membership matrix."""
+        rows, cols = [], []
+        for row, t in enumerate(techniques):
+            for col in self.technique_segments(t):
+                rows.append(row)
+                cols.append(col)
+        matrix = np.zeros((len(techniques), len(self.segments)), dtype=bool)
+        matrix[rows, cols] = True
+        return matrix
+
+    def split(self, techniques, membership=None):
+        """{segment: [techniques]} keeping the input order."""
+        if membership is None:
+            membership = self.membership(techniques)
+        return {
+            name: [techniques[i] for i in np.flatnonzero(membership[:, col])]
+            for col, name in enumerate(self.segments)
+        }
+
+    def select(self, techniques, segment):
+        """Techniques of one segment."""
+        if segment not in self.segments:
+            raise KeyError(f"Unknown segment {segment!r}; defined: {self.segments}")
+        col = self.segments.index(segment)
+        return [t for t in techniques if col in self.technique_segments(t)]
+
+
+@lru_cache(maxsize=None)
+def load_taxonomy(path=TAXONOMY_FILE):
+    """Compiled taxonomy for ``path`` (cached per path)."""
+    return Taxonomy.from_file(path)
@@ -1,12 +1,129 @@
 # scripts/telemetry_gap.py
 import pandas as pd
 
+from .profiling import profiled
 
-def compute_telemetry_gap(techniques, sigma_map, rule_meta):
+# Sigma logsource -> ATT&CK data components it provides. Category is the most
+# specific signal, then service; product is only a fallback for rules without
+# either (e.g. "product: m365").
+LOGSOURCE_COMPONENTS = {
+    "category": {
+        "process_creation": ("Process Creation", "Command Execution"),
+        "process_access": ("Process Access",),
+        "process_termination": ("Process Termination",),
+        "process_tampering": ("Process Modification",),
+        "create_remote_thread": ("OS API Execution", "Process Access"),
+        "raw_access_thread": ("Drive Access",),
+        "image_load": ("Module Load",),
+        "driver_load": ("Driver Load",),
+        "file_event": ("File Creation",),
+        "file_change": ("File Modification",),
+        "file_rename": ("File Modification",),
+        "file_delete": ("File Deletion",),
+        "file_access": ("File Access",),
+        "create_stream_hash": ("File Metadata",),
+        "registry_event": (
+            "Windows Registry Key Creation",
+            "Windows Registry Key Modification",
+            "Windows Registry Key Deletion",
+        ),
+        "registry_add": ("Windows Registry Key Creation",),
+        "registry_set": ("Windows Registry Key Modification",),
+        "registry_delete": ("Windows Registry Key Deletion",),
+        "registry_rename": ("Windows Registry Key Modification",),
+        "network_connection": ("Network Connection Creation",),
+        "firewall": ("Network Traffic Flow",),
+        "dns": ("Network Traffic Content",),
+        "dns_query": ("Network Traffic Content",),
+        "proxy": ("Network Traffic Content",),
+        "webserver": ("Network Traffic Content", "Application Log Content"),
+        "pipe_created": ("Named Pipe Metadata",),
+        "wmi_event": ("WMI Creation",),
+        "ps_script": ("Script Execution", "Command Execution"),
+        "ps_module": ("Script Execution", "Command Execution"),
+        "ps_classic_start": ("Script Execution",),
+        "ps_classic_provider_start": ("Script Execution",),
+        "antivirus": ("Application Log Content",),
+    },
+    "service": {
+        "security": (
+            "Logon Session Creation",
+            "User Account Authentication",
+            "User Account Modification",
+            "Active Directory Object Access",
+            "Active Directory Object Modification",
+            "Active Directory Credential Request",
+            "Scheduled Job Creation",
+            "Service Creation",
+        ),
+        "system": ("Service Creation", "Service Modification"),
+        "application": ("Application Log Content",),
+        "taskscheduler": ("Scheduled Job Creation", "Scheduled Job Modification"),
+        "powershell": ("Script Execution", "Command Execution"),
+        "powershell-classic": ("Script Execution",),
+        "windefend": ("Application Log Content",),
+        "wmi": ("WMI Creation",),
+        "bits-client": ("Network Connection Creation",),
+        "dns-client": ("Network Traffic Content",),
+        "auditd": ("Command Execution", "Process Creation", "File Modification"),
+        "sshd": ("Logon Session Creation",),
+        "cloudtrail": (
+            "Cloud Service Modification",
+            "Cloud Service Disable",
+            "Cloud Storage Access",
+            "Cloud Storage Modification",
+            "Instance Creation",
+            "Instance Modification",
+            "User Account Modification",
+        ),
+        "gcp.audit": (
+            "Cloud Service Modification",
+            "Cloud Storage Access",
+            "Instance Creation",
+            "User Account Modification",
+        ),
+        "signinlogs": ("Logon Session Creation", "User Account Authentication"),
+        "auditlogs": ("User Account Modification", "Active Directory Object Modification"),
+        "activitylogs": ("Cloud Service Modification", "Instance Modification"),
+        "okta": ("Logon Session Creation", "User Account Authentication"),
+    },
+    "product": {
+        "m365": ("Application Log Content", "Logon Session Creation"),
+        "azure": ("Cloud Service Modification",),
+        "aws": ("Cloud Service Modification",),
+        "gcp": ("Cloud Service Modification",),
+        "okta": ("Logon Session Creation", "User Account Authentication"),
+        "github": ("Application Log Content",),
+        "kubernetes": ("Container Creation", "Pod Creation"),
+    },
+}
+
+
+def _norm(value):
+    return str(value).strip().lower() if value else None
+
+
+def logsource_components(product, service, category, table=LOGSOURCE_COMPONENTS):
+    """Data components a (product, service, category) logsource provides."""
+    found = set(table["category"].get(_norm(category), ()))
+    found.update(table["service"].get(_norm(service), ()))
+    if not found:
+        found.update(table["product"].get(_norm(product), ()))
+    return frozenset(found)
+
+
+@profiled("compute_telemetry_gap")
+def compute_telemetry_gap(techniques, sigma_map, rule_meta, table=LOGSOURCE_COMPONENTS):
     """
-    techniques: list of techniques from load_mitre() (id, name, data_sources, vs.)
+    techniques: list of techniques from load_mitre() (id, name, data_components, ...)
     sigma_map : {tech_id -> [rule_path, ...]}
-    rule_meta : {rule_path -> {log_product, log_service, log_category, telemetry, ...}}
+    rule_meta : {rule_path -> {log_product, log_service, log_category, ...}}
+
+    Required telemetry is the set of ATT&CK data components that detect the
+    technique; provided telemetry is the set of components the technique's
+    Sigma rules read, via the logsource mapping table. Both sides are
+    resolved once per distinct logsource/rule, so the gap per technique is a
+    plain set intersection.
 
     Return:
         DataFrame: technique, required_telemetry, sigma_telemetry,
@@ -14,37 +131,35 @@ def compute_telemetry_gap(techniques, sigma_map, rule_meta):
                    required_count, provided_count, gap_count
     """
 
+    by_logsource = {}
+    by_rule = {}
+
+    def rule_components(path):
+        comps = by_rule.get(path)
+        if comps is None:
+            meta = rule_meta.get(path, {}) or {}
+            key = (meta.get("log_product"), meta.get("log_service"), meta.get("log_category"))
+            comps = by_logsource.get(key)
+            if comps is None:
+                comps = by_logsource[key] = logsource_components(*key, table=table)
+            by_rule[path] = comps
+        return comps
+
     rows = []
 
     for t in techniques:
         tid = t["id"].upper()
-        mitre_reqs = set([ds.strip() for ds in t.get("data_sources", []) if ds])
+        mitre_reqs = set(t.get("data_components") or [])
 
         if not mitre_reqs:
             continue
 
         sigma_tels = set()
-        rule_paths = sigma_map.get(tid, [])
-
-        for path in rule_paths:
-            meta = rule_meta.get(path, {}) or {}
-            lp = meta.get("log_product")
-            ls = meta.get("log_service")
-            lc = meta.get("log_category")
-
-            for x in (lp, ls, lc):
-                if x:
-                    sigma_tels.add(str(x).strip())
-
-            for cat in meta.get("telemetry", []):
-                sigma_tels.add(str(cat).strip())
+        for path in sigma_map.get(tid, []):
+            sigma_tels |= rule_components(path)
 
         overlap = mitre_reqs & sigma_tels
-
-        if len(mitre_reqs) > 0:
-            coverage = len(overlap) / len(mitre_reqs)
-        else:
-            coverage = 0.0
+        coverage = len(overlap) / len(mitre_reqs)
 
         rows.append(
             {
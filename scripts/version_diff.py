@@ -0,0 +1,492 @@
+"""Coverage drift across ATT&CK releases and Sigma revisions.
+
+A snapshot is one ATT&CK bundle paired with one Sigma revision (a rules
+directory or a git revision of data/sigma). Snapshots are streamed in order;
+the next snapshot's ATT&CK bundle and Sigma listing load in the background
+while the current pair is diffed. Everything is reduced to interned integers:
+
+* technique IDs and rule identities (Sigma ``id``, else the rule path) are
+  interned once across every version; files of one revision that share an
+  ``id`` are told apart by path, with a warning;
+* a Sigma revision is a set of (technique, rule) edges packed into ints plus
+  a rule -> content map, where content is the git blob id, so a rule file
+  that is unchanged from the previous revision is not parsed again;
+* only the latest snapshot is held in full; the series keeps per-version
+  deltas (edges added/removed, rules whose content changed), so memory grows
+  with the differences rather than with the number of versions.
+
+Usage:
+
+    python -m scripts.version_diff --attack v14.1 v15.1 --sigma r2024-01-01 HEAD
+    python -m scripts.version_diff --attack data/enterprise-attack.json --sigma /tmp/old-rules data/sigma
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+import yaml
+
+from .download_mitre import download_mitre_version
+from .parse_mitre import (
+    heuristic_difficulty_score,
+    heuristic_popularity_score,
+    load_mitre,
+)
+from .parse_sigma import RULE_SUFFIXES, SIGMA_ROOT, YAML_LOADER, rule_techniques
+from .profiling import profiled
+from .results_store import FORMATS, RESULTS_DIR, ResultsStore
+from .taxonomy import TAXONOMY_FILE, load_taxonomy
+
+# Rule files parsed per worker task.
+BLOB_BATCH = 400
+_RULE_BITS = 32
+
+DIFF_COLUMNS = [
+    "base", "target", "technique", "name", "attack_status",
+    "rules_base", "rules_target", "rules_added", "rules_removed", "rules_changed",
+    "covered_base", "covered_target", "coverage_change",
+    "rule_count_delta", "weighted_score_delta",
+]
+
+
+class Interner:
+    """Dense integer ids for strings, shared by every loaded version."""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def __call__(self, value):
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def __getitem__(self, idx):
+        return self.values[idx]
+
+    def __len__(self):
+        return len(self.values)
+
+
+# --- loading -----------------------------------------------------------------
+
+
+def _load_attack(path, taxonomy_path=TAXONOMY_FILE):
+    techniques = load_mitre(path)
+    taxonomy = load_taxonomy(taxonomy_path)
+    segments = taxonomy.split(techniques)
+    cloud = {t["id"] for t in segments.get("cloud", [])}
+    lateral = {t["id"] for t in segments.get("lateral", [])}
+    return [
+        (
+            t["id"].upper(),
+            t.get("name", ""),
+            heuristic_difficulty_score(t.get("detection_text", "")),
+            heuristic_popularity_score(t),
+            t["id"] in cloud,
+            t["id"] in lateral,
+        )
+        for t in techniques
+    ]
+
+
+def _git_blob_id(data):
+    # Same id git gives the blob, so directory and git revisions intern alike.
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def list_revision(spec, repo=SIGMA_ROOT, subdir="rules"):
+    """{rule path relative to the rules dir: (blob id, file path or None)}.
+
+    ``spec`` is a directory (a Sigma checkout or its rules dir) or a git
+    revision of ``repo``; git revisions are listed without a checkout."""
+    files = {}
+    if os.path.isdir(spec):
+        root = os.path.join(spec, subdir) if os.path.isdir(os.path.join(spec, subdir)) else spec
+        for dirpath, _, names in os.walk(root):
+            for name in names:
+                if not name.endswith(RULE_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, root)] = (_git_blob_id(f.read()), path)
+        return files
+
+    out = subprocess.run(
+        ["git", "-C", repo, "ls-tree", "-r", "-z", spec, "--", subdir],
+        capture_output=True,
+        check=True,
+    ).stdout
+    for record in out.split(b"\0"):
+        if not record:
+            continue
+        info, path = record.split(b"\t", 1)
+        _, kind, blob = info.split()
+        path = path.decode("utf-8")
+        if kind == b"blob" and path.endswith(RULE_SUFFIXES):
+            files[os.path.relpath(path, subdir)] = (blob.decode("ascii"), None)
+    return files
+
+
+def _cat_blobs(repo, blobs):
+    proc = subprocess.run(
+        ["git", "-C", repo, "cat-file", "--batch"],
+        input="".join(f"{b}\n" for b in blobs).encode("ascii"),
+        capture_output=True,
+        check=True,
+    )
+    out = proc.stdout
+    contents = {}
+    pos = 0
+    for blob in blobs:
+        eol = out.index(b"\n", pos)
+        header = out[pos:eol].split()
+        if header[-1] == b"missing":
+            pos = eol + 1
+            continue
+        size = int(header[2])
+        contents[blob] = out[eol + 1:eol + 1 + size]
+        pos = eol + 1 + size + 1
+    return contents
+
+
+def _rule_summary(data):
+    try:
+        rule = yaml.load(data, Loader=YAML_LOADER) or {}
+    except Exception:
+        return None
+    if not isinstance(rule, dict):
+        return None
+    techniques = rule_techniques(rule)
+    if not techniques:
+        return None
+    return str(rule.get("id") or ""), tuple(dict.fromkeys(techniques))
+
+
+def _parse_blobs(repo, items):
+    """{blob id: (sigma id, techniques) or None} for a batch of rule files."""
+    from_git = [blob for blob, path in items if path is None]
+    contents = _cat_blobs(repo, from_git) if from_git else {}
+    parsed = {}
+    for blob, path in items:
+        if path is None:
+            data = contents.get(blob)
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+        parsed[blob] = _rule_summary(data) if data is not None else None
+    return parsed
+
+
+def _resolve_attack(spec):
+    return spec if os.path.exists(spec) else download_mitre_version(spec)
+
+
+# --- delta storage -------------------------------------------------------------
+
+
+class VersionSeries:
+    """Per-version deltas; only the latest snapshot is held in full."""
+
+    def __init__(self):
+        self.labels = []
+        self.deltas = []
+        self.last = None
+
+    def append(self, label, edges, content):
+        """Add a snapshot and return its delta against the previous one
+        (None for the first): (edges added, edges removed, changed rules,
+        new rules, dropped rules)."""
+        delta = None
+        if self.last is not None:
+            prev_edges, prev_content = self.last
+            delta = (
+                edges - prev_edges,
+                prev_edges - edges,
+                {r: c for r, c in content.items() if prev_content.get(r, c) != c},
+                {r: c for r, c in content.items() if r not in prev_content},
+                [r for r in prev_content if r not in content],
+            )
+            self.deltas.append(delta)
+        self.labels.append(label)
+        self.last = (edges, content)
+        return delta
+
+    def __len__(self):
+        return len(self.labels)
+
+
+# --- diffing -------------------------------------------------------------------
+
+
+def _tech_counts(edges):
+    return Counter(e >> _RULE_BITS for e in edges)
+
+
+def _coverage(attack, counts, flag=None):
+    pool = [t for t, info in attack.items() if flag is None or info[flag]]
+    if not pool:
+        return 0.0
+    return sum(1 for t in pool if counts.get(t)) / len(pool)
+
+
+def _weighted(info, n_rules):
+    if info is None:
+        return 0.0
+    diff, pop = info[1], info[2]
+    return n_rules * pop / diff if diff > 0 else 0.0
+
+
+def _diff_pair(base, target, attack_a, attack_b, counts_a, counts_b, edges_b, delta, techs):
+    added, removed, changed, _, _ = delta
+    added_by_tech = _tech_counts(added)
+    removed_by_tech = _tech_counts(removed)
+    mask = (1 << _RULE_BITS) - 1
+    changed_by_tech = Counter(e >> _RULE_BITS for e in edges_b if (e & mask) in changed)
+
+    touched = set(added_by_tech) | set(removed_by_tech) | set(changed_by_tech)
+    touched |= set(attack_a).symmetric_difference(attack_b)
+
+    rows = []
+    for t in sorted(touched, key=lambda i: techs[i]):
+        info_a, info_b = attack_a.get(t), attack_b.get(t)
+        n_a, n_b = counts_a.get(t, 0), counts_b.get(t, 0)
+        covered_a = info_a is not None and n_a > 0
+        covered_b = info_b is not None and n_b > 0
+        if info_a is None and info_b is not None:
+            status = "added"
+        elif info_a is not None and info_b is None:
+            status = "removed"
+        elif info_a is None:
+            status = "untracked"
+        else:
+            status = "unchanged"
+        rows.append(
+            {
+                "base": base,
+                "target": target,
+                "technique": techs[t],
+                "name": (info_b or info_a or ("",))[0],
+                "attack_status": status,
+                "rules_base": n_a,
+                "rules_target": n_b,
+                "rules_added": added_by_tech.get(t, 0),
+                "rules_removed": removed_by_tech.get(t, 0),
+                "rules_changed": changed_by_tech.get(t, 0),
+                "covered_base": covered_a,
+                "covered_target": covered_b,
+                "coverage_change": "gained" if covered_b and not covered_a else "lost" if covered_a and not covered_b else "",
+                "rule_count_delta": n_b - n_a,
+                "weighted_score_delta": _weighted(info_b, n_b) - _weighted(info_a, n_a),
+            }
+        )
+    return rows
+
+
+def _summary(base, target, attack_a, attack_b, counts_a, counts_b, delta, n_rows):
+    added, removed, changed, new_rules, dropped_rules = delta
+    row = {
+        "base": base,
+        "target": target,
+        "techniques_base": len(attack_a),
+        "techniques_target": len(attack_b),
+        "techniques_added": len(set(attack_b) - set(attack_a)),
+        "techniques_removed": len(set(attack_a) - set(attack_b)),
+        "rules_added": len(new_rules),
+        "rules_removed": len(dropped_rules),
+        "rules_changed": len(changed),
+        "mappings_added": len(added),
+        "mappings_removed": len(removed),
+        "techniques_changed": n_rows,
+    }
+    for prefix, flag in (("", None), ("cloud_", 3), ("lateral_", 4)):
+        row[f"{prefix}coverage_base"] = _coverage(attack_a, counts_a, flag)
+        row[f"{prefix}coverage_target"] = _coverage(attack_b, counts_b, flag)
+    return row
+
+
+def _snapshot_labels(attack_specs, sigma_specs):
+    def short(spec):
+        return os.path.basename(os.path.normpath(spec)) if os.path.exists(spec) else spec
+
+    n = max(len(attack_specs), len(sigma_specs))
+    labels = []
+    for i in range(n):
+        a = short(attack_specs[min(i, len(attack_specs) - 1)])
+        s = short(sigma_specs[min(i, len(sigma_specs) - 1)])
+        if len(attack_specs) == 1:
+            labels.append(s)
+        elif len(sigma_specs) == 1:
+            labels.append(a)
+        else:
+            labels.append(f"{a}@{s}")
+    return labels
+
+
+def _snapshot(listing, parsed, techs, rules, contents):
+    """(edges, content, id collisions) of one Sigma revision.
+
+    A Sigma ``id`` identifies a rule across revisions; when several files of
+    one revision carry the same id, the first path (in sorted order) keeps it
+    and the others are keyed as ``id@path``."""
+    edges = set()
+    content = {}
+    owners = {}
+    collisions = 0
+    for rel_path in sorted(listing):
+        blob = listing[rel_path][0]
+        summary = parsed.get(blob)
+        if summary is None:
+            continue
+        sigma_id, tids = summary
+        key = sigma_id or rel_path
+        if sigma_id and owners.setdefault(sigma_id, rel_path) != rel_path:
+            collisions += 1
+            key = f"{sigma_id}@{rel_path}"
+        rule = rules(key)
+        content[rule] = contents(blob)
+        for tid in tids:
+            edges.add(techs(tid) << _RULE_BITS | rule)
+    return frozenset(edges), content, collisions
+
+
+@profiled("diff_versions")
+def diff_versions(attack_specs, sigma_specs, repo=SIGMA_ROOT, workers=None, taxonomy=TAXONOMY_FILE):
+    """Per-technique coverage drift between consecutive snapshots.
+
+    ``attack_specs`` are bundle paths or release versions ("v14.1"),
+    ``sigma_specs`` rules directories or git revisions of ``repo``. The two
+    lists are paired by position; a single entry is reused for every
+    snapshot. ``taxonomy`` is the segment config used for the cloud and
+    lateral coverage columns. Returns (diff DataFrame, summary DataFrame)."""
+    if len(attack_specs) > 1 and len(sigma_specs) > 1 and len(attack_specs) != len(sigma_specs):
+        raise ValueError("--attack and --sigma must have the same length, or one of them a single entry")
+    n = max(len(attack_specs), len(sigma_specs))
+    labels = _snapshot_labels(attack_specs, sigma_specs)
+    attack_paths = [_resolve_attack(spec) for spec in attack_specs]
+    workers = workers or os.cpu_count() or 1
+    defined = load_taxonomy(taxonomy).segments
+    for name in ("cloud", "lateral"):
+        if name not in defined:
+            print(f"[!] Taxonomy {taxonomy} defines no '{name}' segment; its coverage columns will be 0")
+
+    def attack_spec(i):
+        return attack_paths[min(i, len(attack_paths) - 1)]
+
+    def sigma_spec(i):
+        return sigma_specs[min(i, len(sigma_specs) - 1)]
+
+    techs = Interner()
+    rules = Interner()
+    contents = Interner()
+    series = VersionSeries()
+    rows = []
+    summary = []
+    parsed = {}
+    n_parsed = 0
+    prev = None  # (attack table, per-technique rule counts) of the previous snapshot
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=1) as lister:
+        attack_future = pool.submit(_load_attack, attack_spec(0), taxonomy)
+        listing_future = lister.submit(list_revision, sigma_spec(0), repo)
+        for i in range(n):
+            listing = listing_future.result()
+            attack_rows = attack_future.result()
+            # Prefetch the next snapshot while this one is parsed and diffed.
+            if i + 1 < n:
+                if attack_spec(i + 1) != attack_spec(i):
+                    attack_future = pool.submit(_load_attack, attack_spec(i + 1), taxonomy)
+                if sigma_spec(i + 1) != sigma_spec(i):
+                    listing_future = lister.submit(list_revision, sigma_spec(i + 1), repo)
+            attack = {techs(tid): (name, diff, pop, cloud, lat) for tid, name, diff, pop, cloud, lat in attack_rows}
+            del attack_rows
+
+            if i == 0 or sigma_spec(i) != sigma_spec(i - 1):
+                new = {}
+                for blob, path in listing.values():
+                    if blob not in parsed:
+                        new.setdefault(blob, path)
+                items = list(new.items())
+                futures = [
+                    pool.submit(_parse_blobs, repo, items[k:k + BLOB_BATCH])
+                    for k in range(0, len(items), BLOB_BATCH)
+                ]
+                # Keep parse results for this revision's blobs only.
+                parsed = {blob: parsed[blob] for blob, _ in listing.values() if blob in parsed}
+                for future in futures:
+                    parsed.update(future.result())
+                n_parsed += len(items)
+                edges, content, collisions = _snapshot(listing, parsed, techs, rules, contents)
+                if collisions:
+                    print(f"[!] {sigma_spec(i)}: {collisions} rule files reuse a Sigma id of another file; "
+                          "they are tracked by path")
+            del listing
+
+            delta = series.append(labels[i], edges, content)
+            if delta is None:
+                counts = _tech_counts(edges)
+            else:
+                attack_a, counts_a = prev
+                counts = counts_a.copy()
+                counts.update(_tech_counts(delta[0]))
+                counts.subtract(_tech_counts(delta[1]))
+                pair_rows = _diff_pair(
+                    labels[i - 1], labels[i], attack_a, attack, counts_a, counts, edges, delta, techs
+                )
+                rows.extend(pair_rows)
+                summary.append(
+                    _summary(labels[i - 1], labels[i], attack_a, attack, counts_a, counts, delta, len(pair_rows))
+                )
+            prev = (attack, counts)
+
+    print(f"[+] Parsed {n_parsed} distinct rule files across {len(set(sigma_specs))} Sigma revisions.")
+    print(f"[+] Interned {len(techs)} techniques, {len(rules)} rules, {len(contents)} rule contents.")
+    return pd.DataFrame(rows, columns=DIFF_COLUMNS), pd.DataFrame(summary)
+
+
+def print_summary(df_summary):
+    for row in df_summary.itertuples(index=False):
+        print(
+            f"[+] {row.base} -> {row.target}: coverage {row.coverage_base:.3f} -> {row.coverage_target:.3f}, "
+            f"techniques +{row.techniques_added}/-{row.techniques_removed}, "
+            f"rules +{row.rules_added}/-{row.rules_removed}/~{row.rules_changed}"
+        )
+
+
+def save_results(df_diff, df_summary, fmt="parquet", root=RESULTS_DIR):
+    """Add version_diff and version_diff_summary to the results store.
+
+    The store's manifest is extended, so tables of an earlier main.py run in
+    the same directory stay readable."""
+    store = ResultsStore(root, fmt=fmt)
+    store.write("version_diff", df_diff)
+    store.write("version_diff_summary", df_summary)
+    print(f"[+] Saved version_diff and version_diff_summary under {store.root}")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff coverage across ATT&CK versions and Sigma revisions")
+    parser.add_argument("--attack", nargs="+", default=[os.path.join("data", "enterprise-attack.json")],
+                        help="ATT&CK bundle paths or release versions (e.g. v14.1)")
+    parser.add_argument("--sigma", nargs="+", default=["HEAD"],
+                        help="Sigma rules directories or git revisions of --sigma-repo")
+    parser.add_argument("--sigma-repo", default=SIGMA_ROOT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--taxonomy", default=TAXONOMY_FILE, help="YAML file defining the technique segments")
+    parser.add_argument("--output-format", choices=sorted(FORMATS), default="parquet")
+    args = parser.parse_args()
+
+    if max(len(args.attack), len(args.sigma)) < 2:
+        parser.error("need at least two ATT&CK versions or Sigma revisions to diff")
+    df_diff, df_summary = diff_versions(
+        args.attack, args.sigma, repo=args.sigma_repo, workers=args.workers, taxonomy=args.taxonomy
+    )
+    print_summary(df_summary)
+    save_results(df_diff, df_summary, fmt=args.output_format)
@@ -1,12 +1,15 @@
 import os
 import matplotlib.pyplot as plt
 
+from .profiling import profiled
+
 
 def _ensure_dir(out_dir):
     os.makedirs(out_dir, exist_ok=True)
     return out_dir
 
 
+@profiled("plot.scatter_difficulty_vs_rules")
 def scatter_difficulty_vs_rules(df, title, filename, out_dir="output/figures"):
     _ensure_dir(out_dir)
     plt.figure(figsize=(7, 5))
@@ -21,6 +24,7 @@ def scatter_difficulty_vs_rules(df, title, filename, out_dir="output/figures"):
     print(f"[+] Saved {out_path}")
 
 
+@profiled("plot.scatter_weighted_vs_rules")
 def scatter_weighted_vs_rules(df, title, filename, out_dir="output/figures"):
     _ensure_dir(out_dir)
     plt.figure(figsize=(7, 5))
@@ -35,6 +39,7 @@ def scatter_weighted_vs_rules(df, title, filename, out_dir="output/figures"):
     print(f"[+] Saved {out_path}")
 
 
+@profiled("plot.boxplot_logsource_telemetry")
 def boxplot_logsource_telemetry(df_cloud, df_lat, out_dir="output/figures"):
     _ensure_dir(out_dir)
     plt.figure(figsize=(7, 5))
@@ -64,6 +69,7 @@ def boxplot_logsource_telemetry(df_cloud, df_lat, out_dir="output/figures"):
     print(f"[+] Saved {out_path}")
 
 
+@profiled("plot.histogram_coupling")
 def histogram_coupling(df_couple, title, filename, out_dir="output/figures"):
     _ensure_dir(out_dir)
     plt.figure(figsize=(7, 5))
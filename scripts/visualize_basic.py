@@ -1,7 +1,10 @@
 import os
 import matplotlib.pyplot as plt
 
+from .profiling import profiled
 
+
+@profiled("plot.plot_coverage")
 def plot_coverage(cloud_cov, lat_cov, out_dir="output/figures"):
     os.makedirs(out_dir, exist_ok=True)
     plt.figure(figsize=(6, 4))
@@ -16,6 +19,7 @@ def plot_coverage(cloud_cov, lat_cov, out_dir="output/figures"):
     print(f"[+] Saved {out_path}")
 
 
+@profiled("plot.plot_rule_density")
 def plot_rule_density(df_cloud, df_lat, out_dir="output/figures"):
     os.makedirs(out_dir, exist_ok=True)
     plt.figure(figsize=(7, 5))
@@ -0,0 +1,61 @@
+import json
+
+from benchmarks import run_benchmarks
+from benchmarks.run_benchmarks import compare, run_suite
+from benchmarks.synthetic import DATA_SOURCES, ensure_corpus, generate_stix_bundle
+from scripts.parse_mitre import load_mitre
+from scripts.parse_sigma import extract_sigma_mappings
+from scripts.telemetry_gap import LOGSOURCE_COMPONENTS, compute_telemetry_gap
+
+
+def _run(results):
+    return {"results": {k: {"median_s": v} for k, v in results.items()}}
+
+
+def test_compare_flags_regressions_and_missing_keys():
+    baseline = _run({"parse@1000": 1.0, "coverage@1000": 1.0, "renamed@1000": 1.0})
+    current = _run({"parse@1000": 1.5, "coverage@1000": 1.1, "new@1000": 9.0})
+    regressions, missing = compare(current, baseline, threshold=0.25)
+    assert regressions == [("parse@1000", 1.0, 1.5, 1.5)]
+    assert missing == ["renamed@1000"]
+    assert compare(current, _run({"coverage@1000": 1.0}), threshold=0.25) == ([], [])
+
+
+def test_synthetic_bundle_is_deterministic_and_uses_real_components(tmp_path):
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    ids = generate_stix_bundle(str(a), n_techniques=50, seed=7)
+    assert generate_stix_bundle(str(b), n_techniques=50, seed=7) == ids
+    assert a.read_bytes() == b.read_bytes()
+
+    names = {o["name"] for o in json.loads(a.read_text())["objects"] if o["type"] == "x-mitre-data-component"}
+    mapped = {c for section in LOGSOURCE_COMPONENTS.values() for comps in section.values() for c in comps}
+    assert names == {c for comps in DATA_SOURCES.values() for c in comps}
+    assert len(names & mapped) > len(names) / 2
+
+
+def test_synthetic_telemetry_gap_is_partial(tmp_path):
+    mitre_path, rules_dir = ensure_corpus(str(tmp_path), 300, n_techniques=120, seed=3)
+    techniques = load_mitre(mitre_path)
+    sigma_map, rule_meta = extract_sigma_mappings(rules_dir, workers=1)
+    gap = compute_telemetry_gap(techniques, sigma_map, rule_meta)["telemetry_gap"]
+    assert 0.0 < gap.mean() < 1.0
+    assert (gap < 1.0).any()
+
+
+def test_run_suite_and_baseline_gate(tmp_path, monkeypatch):
+    current = run_suite([200], n_techniques=60, repeat=1, work_dir=str(tmp_path), only={"coverage", "rule_density"})
+    assert set(current["results"]) == {"coverage@200", "rule_density@200"}
+    assert current["failed"] == {}
+
+    extra = {"gone@200": {"median_s": 1.0}, "parse_sigma@5000": {"median_s": 1.0}}
+    baseline = {"results": {**current["results"], **extra}}
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(baseline))
+    monkeypatch.setattr(run_benchmarks, "run_suite", lambda *a, **k: current)
+    argv = ["--sizes", "200", "--baseline", str(path), "--threshold", "100"]
+    # gone@200 is missing from the run; the 5000-rule entry was not selected.
+    assert run_benchmarks.main(argv) == 1
+    baseline["results"].pop("gone@200")
+    path.write_text(json.dumps(baseline))
+    assert run_benchmarks.main(argv) == 0
+    assert run_benchmarks.main(argv + ["--only", "coverage"]) == 0
@@ -0,0 +1,38 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from scripts.bootstrap_stats import bootstrap_ci, permutation_test
+from scripts.export_latex import latex_summary_table
+from scripts.plot_lorenz import calculate_gini
+
+
+def test_peak_memory_stays_near_chunk_cap():
+    values = np.random.default_rng(0).poisson(3, 20000).astype(float)
+    cap = 4 * 1024 * 1024
+    for run in (
+        lambda: bootstrap_ci(values, n_resamples=500, chunk_bytes=cap),
+        lambda: permutation_test(values[:9000], values[9000:], n_permutations=500, chunk_bytes=cap),
+    ):
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak < 1.1 * cap
+
+
+def test_gini_estimate_matches_lorenz():
+    values = np.random.default_rng(1).poisson(2, 300)
+    assert bootstrap_ci(values, statistics=("gini",), n_resamples=10)["gini"]["estimate"] == pytest.approx(
+        calculate_gini(values)
+    )
+
+
+def test_summary_table_rows_end_with_latex_newline():
+    stats = {f"{seg}_{k}": 1.0 for seg in ("cloud", "lat") for k in ("total", "cov", "mean", "median", "gini")}
+    rows = [line for line in latex_summary_table(stats).splitlines() if "&" in line]
+    assert len(rows) == 6
+    assert all(line.endswith(" \\\\") for line in rows)
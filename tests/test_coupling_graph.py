@@ -0,0 +1,83 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+from scripts.coupling_graph import (
+    COMMUNITY_METHODS,
+    CouplingGraph,
+    community_table,
+    modularity,
+    node_table,
+    pagerank,
+)
+from scripts.metrics import compute_technique_coupling
+
+
+def _two_clusters():
+    # T1-T3 share rules a/b/c, T4-T6 share d/e/f, one rule bridges T3 and T4.
+    sigma_map = {}
+    for techs, rules in ((("T1", "T2", "T3"), "abc"), (("T4", "T5", "T6"), "def")):
+        for t in techs:
+            sigma_map[t] = [f"{r}.yml" for r in rules]
+    sigma_map["T3"].append("bridge.yml")
+    sigma_map["T4"].append("bridge.yml")
+    return sigma_map
+
+
+def test_coupling_score_matches_pairwise_intersections():
+    sigma_map = _two_clusters()
+    expected = {
+        t: sum(1 for u in sigma_map if u != t and len(set(sigma_map[t]) & set(sigma_map[u])) >= 2)
+        for t in sigma_map
+    }
+    df = compute_technique_coupling(sigma_map, min_shared=2)
+    assert dict(zip(df["technique"], df["coupling_score"])) == expected
+
+
+def test_graph_structure_and_npz_round_trip(tmp_path):
+    graph = CouplingGraph.from_sigma_map(_two_clusters())
+    assert graph.n_edges == 7
+    weights = {(a, b): w for a, b, w in graph.iter_edges()}
+    assert weights[("T1", "T2")] == 3 and weights[("T3", "T4")] == 1
+
+    path = graph.save_npz(str(tmp_path / "coupling.npz"))
+    loaded = CouplingGraph.load_npz(path)
+    assert loaded.labels == graph.labels
+    assert np.array_equal(loaded.indptr, graph.indptr) and np.array_equal(loaded.data, graph.data)
+
+
+@pytest.mark.parametrize("method", sorted(COMMUNITY_METHODS))
+def test_communities_split_the_two_clusters(method):
+    graph = CouplingGraph.from_sigma_map(_two_clusters())
+    membership = COMMUNITY_METHODS[method](graph)
+    groups = {frozenset(np.array(graph.labels)[membership == c]) for c in set(membership)}
+    assert groups == {frozenset({"T1", "T2", "T3"}), frozenset({"T4", "T5", "T6"})}
+    assert modularity(graph, membership) > 0.3
+
+
+def test_pagerank_and_tables(tmp_path):
+    sigma_map = _two_clusters()
+    graph = CouplingGraph.from_sigma_map(sigma_map)
+    rank = pagerank(graph)
+    assert rank.sum() == pytest.approx(1.0)
+    assert rank[graph.labels.index("T3")] > rank[graph.labels.index("T1")]
+
+    techniques = [{"id": t, "killchain": ["execution"]} for t in sigma_map]
+    df_nodes = node_table(graph, COMMUNITY_METHODS["louvain"](graph))
+    df = community_table(graph, df_nodes, sigma_map, techniques, segments={"cloud": techniques[:3]})
+    assert df["size"].tolist() == [3, 3]
+    assert sorted(df["cloud_share"]) == [0.0, 1.0]
+    assert df["dominant_tactic"].tolist() == ["execution", "execution"]
+
+    graph.write_graphml(str(tmp_path / "g.graphml"), {"community": df_nodes["community"].to_numpy()})
+    root = ET.parse(tmp_path / "g.graphml").getroot()
+    assert len([e for e in root.iter() if e.tag.endswith("edge")]) == graph.n_edges
+
+
+def test_empty_graph():
+    graph = CouplingGraph.from_sigma_map({"T1": ["a.yml"]})
+    assert graph.n_edges == 0
+    assert list(COMMUNITY_METHODS["louvain"](graph)) == [0]
+    assert compute_technique_coupling({}).empty
+    assert list(graph.iter_edges()) == []
@@ -0,0 +1,183 @@
+import json
+import random
+
+import pytest
+
+from scripts.event_router import EventRouter, classify_event, extract_prefilter
+from scripts.sigma_eval import LinearEvaluator, compile_rules, normalize_event, replay_events
+
+WORDS = ["powershell", "cmd", "rundll32", "certutil", "-enc", "login", "bucket", "4624", "4688", "admin"]
+# Events also carry windash spellings, which only |windash rules match.
+EVENT_WORDS = WORDS + ["/enc", "\u2013enc"]
+LOGSOURCES = [
+    (("windows", None, "process_creation"), ["Image", "CommandLine", "ParentImage"]),
+    (("windows", "security", None), ["EventID", "TargetUserName"]),
+    (("aws", "cloudtrail", None), ["eventName", "eventSource", "userIdentity.type"]),
+    ((None, None, "proxy"), ["c-uri", "cs-host"]),
+]
+MODIFIERS = ["", "", "|contains", "|startswith", "|endswith", "|contains|all", "|windash|contains", "|re"]
+CONDITIONS = [
+    "selection_0",
+    "selection_0 and not filter",
+    "selection_0 and selection_1",
+    "all of selection_*",
+    "1 of selection_*",
+    "selection_0 or selection_1",
+    "selection_0 and (selection_1 or filter)",
+]
+
+
+def _random_rule(rng):
+    (product, service, category), fields = rng.choice(LOGSOURCES)
+    detection = {}
+    for s in range(2):
+        detection[f"selection_{s}"] = {
+            field + rng.choice(MODIFIERS): rng.sample(WORDS, rng.randint(1, 2))
+            for field in rng.sample(fields, rng.randint(1, len(fields)))
+        }
+    detection["filter"] = {f"{fields[0]}|contains": rng.choice(WORDS)}
+    detection["condition"] = rng.choice(CONDITIONS)
+    return {"detection": detection, "log_product": product, "log_service": service, "log_category": category}
+
+
+def _random_event(rng, classified):
+    logsource, fields = rng.choice(LOGSOURCES)
+    event = {f: " ".join(rng.sample(EVENT_WORDS, rng.randint(1, 3))) for f in fields if rng.random() < 0.9}
+    if "EventID" in event and rng.random() < 0.5:
+        event["EventID"] = int(rng.choice(["4624", "4688"]))
+    if classified:
+        event["_logsource"] = dict(zip(("product", "service", "category"), logsource))
+    return event
+
+
+def _in_logsource(meta, classes):
+    rule = (meta["log_product"], meta["log_service"], meta["log_category"])
+    return any(all(r is None or r == c for r, c in zip(rule, cls)) for cls in classes)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(7)
+    rule_meta = {f"rule_{i}.yml": _random_rule(rng) for i in range(300)}
+    compiled, unsupported = compile_rules(rule_meta)
+    assert not unsupported
+    return rng, rule_meta, compiled
+
+
+def test_unclassified_events_match_linear_exactly(corpus):
+    rng, rule_meta, compiled = corpus
+    linear, router = LinearEvaluator(compiled), EventRouter(compiled, rule_meta)
+    total = 0
+    for _ in range(300):
+        event = _random_event(rng, classified=False)
+        expected = sorted(linear.matches(event))
+        assert sorted(router.matches(event)) == expected
+        total += len(expected)
+    assert total > 0
+
+
+def test_classified_events_match_linear_within_logsource(corpus):
+    rng, rule_meta, compiled = corpus
+    paths = [p for p, _ in compiled]
+    linear, router = LinearEvaluator(compiled), EventRouter(compiled, rule_meta)
+    total = 0
+    for _ in range(300):
+        event = _random_event(rng, classified=True)
+        classes = classify_event(event)
+        expected = sorted(i for i in linear.matches(event) if _in_logsource(rule_meta[paths[i]], classes))
+        assert sorted(router.matches(event)) == expected
+        total += len(expected)
+    assert total > 0
+    assert router.take_counters()["evaluations"] < 300 * len(compiled)
+
+
+def test_replay_routed_equals_linear(corpus, tmp_path):
+    rng, rule_meta, _ = corpus
+    path = tmp_path / "events.jsonl"
+    path.write_text("".join(json.dumps(_random_event(rng, classified=False)) + "\n" for _ in range(200)))
+    linear_hits, _, _ = replay_events([str(path)], rule_meta, workers=1, routed=False)
+    routed_hits, _, stats = replay_events([str(path)], rule_meta, workers=1, routed=True)
+    assert routed_hits == linear_hits
+    assert sum(linear_hits.values()) > 0
+    assert stats["unclassified_events"] == 200
+
+
+def test_parallel_routed_replay_equals_linear(corpus, tmp_path):
+    rng, rule_meta, _ = corpus
+    path = tmp_path / "events.jsonl"
+    events = [_random_event(rng, classified=rng.random() < 0.5) for _ in range(400)]
+    path.write_text("".join(json.dumps(e) + "\n" for e in events))
+    linear_hits, _, _ = replay_events([str(path)], rule_meta, workers=1, routed=False, chunk_size=50)
+    routed_hits, _, stats = replay_events([str(path)], rule_meta, workers=3, routed=True, chunk_size=50)
+
+    # Classified events only reach the rules of their logsource.
+    paths = list(rule_meta)
+    expected = dict.fromkeys(paths, 0)
+    linear = LinearEvaluator(compile_rules(rule_meta)[0])
+    for event in events:
+        classes = classify_event(event)
+        for i in linear.matches(event):
+            if not classes or _in_logsource(rule_meta[paths[i]], classes):
+                expected[paths[i]] += 1
+    assert routed_hits == expected
+    assert sum(routed_hits.values()) > 0 and set(routed_hits) == set(linear_hits)
+    assert stats["workers"] == 3 and stats["events"] == 400
+    assert stats["skip_rate"] > 0.5
+
+
+def test_prefilter_kinds():
+    assert extract_prefilter({"sel": {"EventID": 4624, "LogonType": 3}, "condition": "sel"}) == (
+        "anchor", "EventID", {"4624"},
+    )
+    assert extract_prefilter({"sel": {"CommandLine|contains": ["-enc", "-e "]}, "condition": "sel"}) == (
+        "literal", "CommandLine", {"-enc", "-e "},
+    )
+    assert extract_prefilter({"sel": {"Image|endswith": "*x"}, "condition": "sel"}) == ("keys", frozenset({"Image"}))
+    assert extract_prefilter({"a": {"Image": "x"}, "b": {"User": "y"}, "condition": "a or b"}) == (
+        "union", [("anchor", "Image", {"x"}), ("anchor", "User", {"y"})],
+    )
+    assert extract_prefilter({"a": {"Image": "x"}, "b": ["mimikatz"], "condition": "a or b"}) is None
+    assert extract_prefilter({"a": {"Image": "x"}, "condition": "not a"}) is None
+
+
+def test_union_prefilters_for_alternatives():
+    detection = {
+        "selection_img": {"Image|endswith": "\\certutil.exe"},
+        "selection_cli": [{"CommandLine|contains": "urlcache"}, {"CommandLine|contains": "verifyctl"}],
+        "filter": {"User": "SYSTEM"},
+        "condition": "1 of selection_* and not filter",
+    }
+    assert extract_prefilter(detection) == (
+        "union",
+        [("literal", "Image", {"\\certutil.exe"}), ("literal", "CommandLine", {"urlcache"}),
+         ("literal", "CommandLine", {"verifyctl"})],
+    )
+    # Each branch of the disjunction keeps selection_img's requirement.
+    detection["condition"] = "selection_img and (selection_cli or filter)"
+    assert extract_prefilter(detection) == (
+        "union", [("literal", "Image", {"\\certutil.exe"}), ("anchor", "User", {"system"})],
+    )
+    detection["condition"] = ["selection_img", "filter"]
+    assert extract_prefilter(detection) == (
+        "union", [("literal", "Image", {"\\certutil.exe"}), ("anchor", "User", {"system"})],
+    )
+
+
+def test_union_rules_are_skipped_and_counted_once():
+    rule_meta = {
+        "r.yml": {
+            "detection": {"a": {"EventID": 1}, "b": {"EventID": 4688}, "condition": "a or b"},
+            "log_product": "windows", "log_service": None, "log_category": None,
+        }
+    }
+    compiled, _ = compile_rules(rule_meta)
+    router = EventRouter(compiled, rule_meta)
+    assert router.matches({"EventID": 4688, "Channel": "Security"}) == [0]
+    assert router.matches({"EventID": 4624, "Channel": "Security"}) == []
+    assert router.take_counters()["evaluations"] == 1
+
+
+def test_classify_windows_channels():
+    event = normalize_event({"winlog": {"channel": "Microsoft-Windows-Sysmon/Operational", "event_id": 1}})
+    assert classify_event(event) == [("windows", "sysmon", "process_creation")]
+    assert classify_event({"Channel": "Security", "EventID": 4688}) == [("windows", "security", "process_creation")]
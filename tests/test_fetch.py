@@ -0,0 +1,156 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from scripts import profiling
+from scripts.fetch import fetch_many, load_checksums
+
+NAME = "enterprise-attack/enterprise-attack.json"
+
+
+def _mirror(tmp_path, payload, listed_payload=None):
+    mirror = tmp_path / "mirror"
+    (mirror / "enterprise-attack").mkdir(parents=True)
+    (mirror / NAME).write_bytes(payload)
+    if listed_payload is not None:
+        digest = hashlib.sha256(listed_payload).hexdigest()
+        (mirror / "SHA256SUMS").write_text(f"{digest}  {NAME}\n")
+    return str(mirror)
+
+
+def _jobs(tmp_path):
+    return [("https://example.invalid/" + NAME, str(tmp_path / "data" / "attack.json"), NAME)]
+
+
+def test_verified_copy_then_cache_hit(tmp_path):
+    mirror = _mirror(tmp_path, b'{"objects": []}', listed_payload=b'{"objects": []}')
+    assert load_checksums(mirror) == {NAME: hashlib.sha256(b'{"objects": []}').hexdigest()}
+    dest = _jobs(tmp_path)[0][1]
+    assert fetch_many(_jobs(tmp_path), mirror=mirror) == {dest: True}
+    assert fetch_many(_jobs(tmp_path), mirror=mirror) == {dest: False}
+
+
+def test_checksum_mismatch_leaves_no_file(tmp_path):
+    mirror = _mirror(tmp_path, b"tampered", listed_payload=b"original")
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        fetch_many(_jobs(tmp_path), mirror=mirror)
+    assert list((tmp_path / "data").iterdir()) == []
+
+
+def test_mirror_without_checksums(tmp_path):
+    mirror = _mirror(tmp_path, b"{}")
+    assert load_checksums(mirror) == {}
+    assert fetch_many(_jobs(tmp_path), mirror=mirror) == {_jobs(tmp_path)[0][1]: True}
+
+
+class _MirrorHandler(SimpleHTTPRequestHandler):
+    """Serves the mirror directory; records paths and can cut bodies short."""
+
+    requests_seen = []
+    truncate = False
+
+    def do_GET(self):
+        self.requests_seen.append(self.path.lstrip("/"))
+        if self.truncate and self.path.endswith(".json"):
+            with open(self.translate_path(self.path), "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Last-Modified", self.date_time_string(time.time()))
+            self.end_headers()
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_mirror(tmp_path):
+    mirror = tmp_path / "mirror"
+    (mirror / "enterprise-attack").mkdir(parents=True)
+    handler = type("Handler", (_MirrorHandler,), {"requests_seen": [], "truncate": False})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=str(mirror)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield mirror, f"http://127.0.0.1:{server.server_address[1]}", handler
+    server.shutdown()
+    server.server_close()
+
+
+def _publish(mirror, payload, listed_payload=None, age=0):
+    path = mirror / NAME
+    path.write_bytes(payload)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    digest = hashlib.sha256(payload if listed_payload is None else listed_payload).hexdigest()
+    (mirror / "SHA256SUMS").write_text(f"{digest}  {NAME}\n")
+
+
+@pytest.fixture
+def counters():
+    profiling.enable()
+    yield lambda: profiling.summary()["counters"]
+    profiling.disable()
+    profiling.reset()
+
+
+def test_http_200_then_304(tmp_path, http_mirror, counters):
+    mirror, url, handler = http_mirror
+    _publish(mirror, b'{"objects": [1]}', age=60)
+    jobs = _jobs(tmp_path)
+    dest = jobs[0][1]
+
+    assert fetch_many(jobs, mirror=url) == {dest: True}
+    assert handler.requests_seen == [NAME, "SHA256SUMS"]
+    written = os.stat(dest).st_mtime_ns
+
+    handler.requests_seen.clear()
+    assert fetch_many(jobs, mirror=url) == {dest: False}
+    # A 304 needs neither a rewrite nor the checksum file.
+    assert handler.requests_seen == [NAME]
+    assert os.stat(dest).st_mtime_ns == written
+    assert counters() == {"downloads": 1, "cache_hits": 1}
+
+
+def test_http_checksum_mismatch_keeps_old_file(tmp_path, http_mirror):
+    mirror, url, _ = http_mirror
+    _publish(mirror, b"v1", age=60)
+    jobs = _jobs(tmp_path)
+    fetch_many(jobs, mirror=url)
+
+    _publish(mirror, b"v2 tampered", listed_payload=b"v2")
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        fetch_many(jobs, mirror=url)
+    assert sorted(p.name for p in (tmp_path / "data").iterdir()) == ["attack.json", "attack.json.meta.json"]
+    assert (tmp_path / "data" / "attack.json").read_bytes() == b"v1"
+
+
+def test_aborted_download_keeps_old_file(tmp_path, http_mirror):
+    mirror, url, handler = http_mirror
+    _publish(mirror, b"v1" * 1000, age=60)
+    jobs = _jobs(tmp_path)
+    dest = jobs[0][1]
+    fetch_many(jobs, mirror=url)
+    meta = open(dest + ".meta.json").read()
+
+    _publish(mirror, b"v2" * 1000)
+    handler.truncate = True
+    with pytest.raises(requests.RequestException):
+        fetch_many(jobs, mirror=url)
+    assert open(dest, "rb").read() == b"v1" * 1000
+    assert open(dest + ".meta.json").read() == meta
+    assert sorted(p.name for p in (tmp_path / "data").iterdir()) == ["attack.json", "attack.json.meta.json"]
+
+    handler.truncate = False
+    assert fetch_many(jobs, mirror=url) == {dest: True}
+    assert open(dest, "rb").read() == b"v2" * 1000
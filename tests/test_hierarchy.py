@@ -0,0 +1,47 @@
+from scripts.hierarchy import rollup_rule_meta, rollup_sigma_map, technique_tree
+
+
+def _techniques():
+    # Shaped like load_mitre() output, including the precomputed hierarchy.
+    return [
+        {"id": "T1078", "parent": None, "subtechniques": ["T1078.001", "T1078.004"]},
+        {"id": "T1078.001", "parent": "T1078", "subtechniques": []},
+        {"id": "T1078.004", "parent": "T1078", "subtechniques": []},
+        {"id": "T1059", "parent": None, "subtechniques": []},
+    ]
+
+
+SIGMA_MAP = {
+    "T1078": ["parent.yml"],
+    "T1078.004": ["cloud.yml"],
+    "T1059": ["shell.yml"],
+    "T1110.003": ["spray.yml"],  # not in the bundle
+}
+
+
+def test_tree_uses_precomputed_fields_and_places_unknown_tags():
+    tree = technique_tree(_techniques(), SIGMA_MAP)
+    assert tree == {"T1078": ["T1078.001", "T1078.004"], "T1059": [], "T1110": ["T1110.003"]}
+
+
+def test_rollup_modes():
+    techniques = _techniques()
+    assert rollup_sigma_map(SIGMA_MAP, techniques, "exact") is SIGMA_MAP
+    up = rollup_sigma_map(SIGMA_MAP, techniques, "parent")
+    assert up["T1078"] == ["parent.yml", "cloud.yml"]
+    assert up["T1110"] == ["spray.yml"]
+    down = rollup_sigma_map(SIGMA_MAP, techniques, "children")
+    assert down["T1078.001"] == ["parent.yml"]
+    assert down["T1078.004"] == ["cloud.yml", "parent.yml"]
+
+
+def test_rule_meta_follows_rollup():
+    rule_meta = {
+        "parent.yml": {"techniques": ["T1078"]},
+        "cloud.yml": {"techniques": ["T1078.004"]},
+        "shell.yml": {"techniques": ["T1059"]},
+    }
+    rolled = rollup_rule_meta(rule_meta, rollup_sigma_map(SIGMA_MAP, _techniques(), "parent"))
+    assert rolled["cloud.yml"]["techniques"] == ["T1078.004", "T1078"]
+    assert rolled["parent.yml"] is rule_meta["parent.yml"]
+    assert rule_meta["cloud.yml"]["techniques"] == ["T1078.004"]
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from scripts.parse_mitre import build_stix_index, load_mitre
+
+
+def _technique(stix_id, tech_id, **extra):
+    return {
+        "type": "attack-pattern",
+        "id": stix_id,
+        "name": f"Technique {tech_id}",
+        "x_mitre_platforms": ["Windows"],
+        "kill_chain_phases": [{"kill_chain_name": "mitre-attack", "phase_name": "execution"}],
+        "external_references": [{"source_name": "mitre-attack", "external_id": tech_id}],
+        **extra,
+    }
+
+
+SOURCE = {"type": "x-mitre-data-source", "id": "x-mitre-data-source--proc", "name": "Process"}
+COMPONENTS = [
+    {"type": "x-mitre-data-component", "id": "x-mitre-data-component--create", "name": "Process Creation",
+     "x_mitre_data_source_ref": SOURCE["id"]},
+    {"type": "x-mitre-data-component", "id": "x-mitre-data-component--cmd", "name": "Command Execution",
+     "x_mitre_data_source_ref": "x-mitre-data-source--command"},
+    {"type": "x-mitre-data-component", "id": "x-mitre-data-component--old", "name": "Old Component",
+     "x_mitre_data_source_ref": SOURCE["id"], "x_mitre_deprecated": True},
+]
+COMMAND = {"type": "x-mitre-data-source", "id": "x-mitre-data-source--command", "name": "Command"}
+
+
+def _detects(source_ref, target_ref, **extra):
+    return {"type": "relationship", "id": f"relationship--{source_ref}-{target_ref}",
+            "relationship_type": "detects", "source_ref": source_ref, "target_ref": target_ref, **extra}
+
+
+# ATT&CK v10-v17: data components detect techniques directly.
+V10 = [
+    SOURCE, COMMAND, *COMPONENTS,
+    _technique("attack-pattern--a", "T1059"),
+    _technique("attack-pattern--b", "T1059.001"),
+    _technique("attack-pattern--c", "T1021"),
+    _detects("x-mitre-data-component--create", "attack-pattern--a"),
+    _detects("x-mitre-data-component--cmd", "attack-pattern--a"),
+    _detects("x-mitre-data-component--cmd", "attack-pattern--b"),
+    _detects("x-mitre-data-component--old", "attack-pattern--b"),
+    _detects("x-mitre-data-component--create", "attack-pattern--c", revoked=True),
+]
+
+# ATT&CK v18+: detection strategies detect techniques via analytics.
+V18 = [
+    SOURCE, COMMAND, *COMPONENTS,
+    _technique("attack-pattern--a", "T1059"),
+    _technique("attack-pattern--c", "T1021"),
+    {"type": "x-mitre-analytic", "id": "x-mitre-analytic--1", "x_mitre_log_source_references": [
+        {"x_mitre_data_component_ref": "x-mitre-data-component--create", "name": "sysmon:1"},
+        {"x_mitre_data_component_ref": "x-mitre-data-component--old", "name": "legacy"},
+    ]},
+    {"type": "x-mitre-analytic", "id": "x-mitre-analytic--2", "x_mitre_log_source_references": [
+        {"x_mitre_data_component_ref": "x-mitre-data-component--cmd", "name": "auditd:EXECVE"},
+    ]},
+    {"type": "x-mitre-detection-strategy", "id": "x-mitre-detection-strategy--1",
+     "x_mitre_analytic_refs": ["x-mitre-analytic--1", "x-mitre-analytic--2"]},
+    {"type": "x-mitre-detection-strategy", "id": "x-mitre-detection-strategy--2",
+     "x_mitre_analytic_refs": ["x-mitre-analytic--2"], "x_mitre_deprecated": True},
+    _detects("x-mitre-detection-strategy--1", "attack-pattern--a"),
+    _detects("x-mitre-detection-strategy--2", "attack-pattern--c"),
+]
+
+# Before v10: only "Source: Component" strings on the technique.
+V9 = [
+    _technique("attack-pattern--a", "T1059", x_mitre_data_sources=[
+        "Process: Process Creation", "Command: Command Execution", "Process: Process Creation",
+    ]),
+    _technique("attack-pattern--c", "T1021", x_mitre_data_sources=["Authentication logs"]),
+]
+
+
+def _load(tmp_path, objects):
+    path = tmp_path / "enterprise-attack.json"
+    path.write_text(json.dumps({"type": "bundle", "objects": objects}), encoding="utf-8")
+    return {t["id"]: t for t in load_mitre(str(path))}
+
+
+def test_v10_detects_data_components():
+    index = build_stix_index(V10)
+    assert index["sources"]["x-mitre-data-source--proc"] == "Process"
+    assert "x-mitre-data-component--old" not in index["components"]
+    assert index["source_components"] == {"Process": {"Process Creation"}, "Command": {"Command Execution"}}
+    assert index["technique_components"] == {
+        "attack-pattern--a": {"x-mitre-data-component--create", "x-mitre-data-component--cmd"},
+        "attack-pattern--b": {"x-mitre-data-component--cmd"},
+    }
+
+
+def test_v10_bundle_loads_components(tmp_path):
+    techniques = _load(tmp_path, V10)
+    assert techniques["T1059"]["data_components"] == ["Command Execution", "Process Creation"]
+    assert techniques["T1059"]["data_sources"] == ["Command: Command Execution", "Process: Process Creation"]
+    assert techniques["T1059.001"]["data_components"] == ["Command Execution"]
+    assert techniques["T1059.001"]["parent"] == "T1059"
+    assert techniques["T1021"]["data_components"] == []
+
+
+def test_v18_detection_strategies_resolve_through_analytics(tmp_path):
+    index = build_stix_index(V18)
+    assert index["technique_components"] == {
+        "attack-pattern--a": {"x-mitre-data-component--create", "x-mitre-data-component--cmd"},
+    }
+    techniques = _load(tmp_path, V18)
+    assert techniques["T1059"]["data_components"] == ["Command Execution", "Process Creation"]
+    assert techniques["T1021"]["data_components"] == []
+
+
+def test_pre_v10_data_source_strings(tmp_path):
+    assert build_stix_index(V9)["technique_components"] == {}
+    techniques = _load(tmp_path, V9)
+    assert techniques["T1059"]["data_sources"] == ["Command: Command Execution", "Process: Process Creation"]
+    assert techniques["T1059"]["data_components"] == ["Command Execution", "Process Creation"]
+    assert techniques["T1021"]["data_components"] == ["Authentication logs"]
+
+
+@pytest.mark.parametrize("objects", [V9, V10, V18])
+def test_every_schema_yields_the_same_components_for_t1059(tmp_path, objects):
+    assert _load(tmp_path, objects)["T1059"]["data_components"] == ["Command Execution", "Process Creation"]
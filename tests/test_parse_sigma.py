@@ -0,0 +1,81 @@
+import pytest
+
+from scripts.metrics import compute_origin_metrics, filter_sigma_map
+from scripts.parse_sigma import extract_sigma_mappings
+
+RULE = """title: {title}
+id: {id}
+tags: [{tags}]
+logsource: {{product: windows, category: process_creation}}
+detection:
+  sel: {{CommandLine|contains: "{needle}"}}
+  condition: sel
+"""
+
+TECHNIQUES = [{"id": "T1059", "name": "Command and Scripting Interpreter"},
+              {"id": "T1105", "name": "Ingress Tool Transfer"},
+              {"id": "T1218", "name": "System Binary Proxy Execution"}]
+
+
+def _rule(root, rel, uid, needle, tags, title="Rule"):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(RULE.format(title=title, id=uid, tags=tags, needle=needle), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def roots(tmp_path):
+    upstream, internal = tmp_path / "sigma", tmp_path / "internal"
+    paths = {
+        "a": _rule(upstream, "rules/windows/a.yml", "aaaa", "certutil", "attack.t1105"),
+        "b": _rule(upstream, "rules/windows/b.yml", "bbbb", "powershell", "attack.t1059"),
+        "c": _rule(upstream, "rules-threat-hunting/c.yml", "cccc", "rundll32", "attack.t1218"),
+        # Same id as a.yml, re-titled and tagged with an extra technique.
+        "a_fork": _rule(internal, "win/a.yml", "aaaa", "certutil -urlcache", "attack.t1105, attack.t1059", "Fork"),
+        # Different id, same detection as b.yml.
+        "b_copy": _rule(internal, "win/b.yml", "eeee", "powershell", "attack.t1059"),
+        "own": _rule(internal, "linux/own.yml", "ffff", "curl", "attack.t1105"),
+    }
+    return [("sigmahq", str(upstream)), f"internal={internal}"], paths
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_multi_root_first_root_wins(roots, workers):
+    specs, p = roots
+    sigma_map, rule_meta = extract_sigma_mappings(roots=specs, workers=workers)
+
+    assert set(rule_meta) == {p["a"], p["b"], p["c"], p["own"]}
+    assert {m["origin"] for m in rule_meta.values()} == {"sigmahq", "internal"}
+    assert rule_meta[p["own"]]["origin"] == "internal"
+    assert rule_meta[p["a"]]["duplicates"] == [p["a_fork"]]
+    assert rule_meta[p["b"]]["duplicates"] == [p["b_copy"]]
+
+    # The fork's extra tag is credited to the kept upstream rule.
+    assert rule_meta[p["a"]]["techniques"] == ["T1105", "T1059"]
+    assert sigma_map["T1059"] == [p["b"], p["a"]]
+    assert sorted(sigma_map["T1105"]) == sorted([p["a"], p["own"]])
+    assert sigma_map["T1218"] == [p["c"]]
+
+
+def test_root_order_decides_the_kept_copy(roots):
+    specs, p = roots
+    _, rule_meta = extract_sigma_mappings(roots=specs[::-1], workers=1)
+    assert p["a_fork"] in rule_meta and p["a"] not in rule_meta
+    assert rule_meta[p["a_fork"]]["duplicates"] == [p["a"]]
+
+
+def test_filter_and_origin_metrics(roots):
+    specs, p = roots
+    sigma_map, rule_meta = extract_sigma_mappings(roots=specs, workers=1)
+
+    assert filter_sigma_map(sigma_map, rule_meta, "internal") == {"T1105": [p["own"]]}
+    assert set(filter_sigma_map(sigma_map, rule_meta, "sigmahq")) == {"T1059", "T1105", "T1218"}
+
+    df = compute_origin_metrics(TECHNIQUES, sigma_map, rule_meta).set_index("origin")
+    assert df.loc["sigmahq", "rules"] == 3 and df.loc["internal", "rules"] == 1
+    assert df.loc["sigmahq", "techniques_covered"] == 3
+    assert df.loc["internal", "coverage"] == pytest.approx(1 / 3)
+    assert df.loc["sigmahq", "unique_techniques"] == 2
+    assert df.loc["internal", "unique_techniques"] == 0
+    assert df.loc["sigmahq", "mean_rule_density"] == pytest.approx(4 / 3)
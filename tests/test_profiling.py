@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+import pytest
+
+from scripts import profiling
+from scripts.parse_sigma import extract_sigma_mappings
+from scripts.profiling import chrome_trace, collect, count, merge, profiled, stage, summary
+
+RULE = """title: Rule {n}
+id: 00000000-0000-0000-0000-{n:012d}
+tags: [attack.t1059]
+logsource: {{product: windows, category: process_creation}}
+detection:
+  sel: {{CommandLine|contains: "cmd{n}"}}
+  condition: sel
+"""
+
+
+@pytest.fixture
+def profile():
+    profiling.enable(trace_memory=True)
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+@profiled("helper", trace=False)
+def _helper():
+    count("items", 2)
+
+
+def test_disabled_hooks_record_nothing():
+    profiling.reset()
+    with stage("off"):
+        _helper()
+    assert summary()["stages"] == {} and summary()["total_wall_s"] is None
+
+
+def test_stages_counters_and_aggregates(profile):
+    with stage("outer"):
+        with stage("inner"):
+            count("files_parsed", 3)
+            buf = bytearray(1 << 20)
+            del buf
+        for _ in range(4):
+            _helper()
+
+    s = summary()
+    assert s["counters"] == {"files_parsed": 3, "items": 8}
+    assert s["stages"]["inner"]["counters"] == {"files_parsed": 3}
+    assert s["stages"]["outer"]["counters"] == {"items": 8}
+    assert s["stages"]["inner"]["peak_mem_bytes"] >= 1 << 20
+    assert s["stages"]["outer"]["peak_mem_bytes"] >= s["stages"]["inner"]["peak_mem_bytes"]
+    assert s["stages"]["helper"]["calls"] == 4
+    assert s["stages"]["outer"]["wall_s"] >= s["stages"]["inner"]["wall_s"]
+    json.dumps(s)
+
+
+def test_chrome_trace_format(profile):
+    with stage("outer"):
+        time.sleep(0.001)
+        with stage("inner"):
+            count("cache_hits")
+
+    trace = chrome_trace()
+    assert trace["displayTimeUnit"] == "ms"
+    outer, inner = trace["traceEvents"]
+    assert [outer["name"], inner["name"]] == ["outer", "inner"]
+    for event in (outer, inner):
+        assert event["ph"] == "X" and event["pid"] == os.getpid()
+        assert {"cpu_ms", "peak_mem_bytes"} <= set(event["args"])
+    assert outer["ts"] <= inner["ts"] and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"] + 1
+    assert inner["args"]["cache_hits"] == 1
+
+
+def test_write_reports(profile, tmp_path):
+    with stage("step"):
+        pass
+    summary_path, trace_path = profiling.write_reports(str(tmp_path))
+    with open(summary_path, encoding="utf-8") as f:
+        assert "step" in json.load(f)["stages"]
+    with open(trace_path, encoding="utf-8") as f:
+        assert json.load(f)["traceEvents"][0]["name"] == "step"
+
+
+def test_collect_isolates_and_merge_folds_back(profile):
+    with stage("parent"):
+        count("before")
+        with collect() as stats:
+            with stage("shard"):
+                _helper()
+        assert summary()["counters"] == {"before": 1}
+        merge(stats)
+
+    assert stats["counters"] == {"items": 2}
+    assert stats["aggregates"]["shard"]["calls"] == 1
+    s = summary()
+    assert s["counters"] == {"before": 1, "items": 2}
+    assert s["stages"]["parent"]["counters"] == {"before": 1, "items": 2}
+    assert s["stages"]["helper"]["calls"] == 1 and s["stages"]["shard"]["calls"] == 1
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_worker_profiles_reach_the_parent(profile, tmp_path, workers):
+    for n in range(6):
+        sub = tmp_path / "rules" / f"sub{n % 3}"
+        sub.mkdir(parents=True, exist_ok=True)
+        (sub / f"r{n}.yml").write_text(RULE.format(n=n), encoding="utf-8")
+
+    extract_sigma_mappings(rules_dir=str(tmp_path / "rules"), workers=workers)
+
+    stages = summary()["stages"]
+    assert stages["categorize_telemetry"]["calls"] == 6
+    assert stages["parse_shard"]["calls"] == 3
+    assert stages["extract_sigma_mappings"]["counters"]["files_parsed"] == 6
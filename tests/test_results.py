@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+from scripts.export_latex import run_latex_export
+from scripts.plot_lorenz import calculate_gini, run_lorenz
+from scripts.results import PipelineResults
+from scripts.results_store import ResultsStore
+from scripts.timeline_analysis import run_timeline
+
+CLOUD = [{"id": "T1078.004", "name": "Cloud Accounts"}, {"id": "T1530", "name": "Data from Cloud Storage"}]
+LATERAL = [{"id": "T1021", "name": "Remote Services"}, {"id": "T1570", "name": "Lateral Tool Transfer"}]
+
+RULE_META = {
+    "a.yml": {"date": "2018-03-01", "techniques": ["T1078.004"]},
+    "b.yml": {"date": "2019/06/30", "techniques": ["T1078.004", "T1021"]},
+    "c.yml": {"date": "2021-01-15", "techniques": ["T1021"]},
+    "d.yml": {"date": "2021-02-01", "techniques": ["T1570"]},
+    "e.yml": {"date": None, "techniques": ["T1530"]},
+    "f.yml": {"date": "2010-01-01", "techniques": ["T1021"]},
+}
+
+
+def _density(techniques, counts):
+    return pd.DataFrame(
+        {"technique": [t["id"] for t in techniques], "name": [t["name"] for t in techniques], "rule_count": counts}
+    )
+
+
+@pytest.fixture
+def results(tmp_path):
+    store = ResultsStore(str(tmp_path / "results"), fmt="csv")
+    res = PipelineResults([], {"cloud": CLOUD, "lateral": LATERAL}, {}, RULE_META, store=store)
+    res.put("rule_density", _density(CLOUD, [2, 0]), segment="cloud")
+    res.put("rule_density", _density(LATERAL, [3, 1]), segment="lateral")
+    return res
+
+
+def test_tables_are_served_from_memory_and_store(results):
+    assert results.table("rule_density", "cloud")["rule_count"].tolist() == [2, 0]
+    assert results.table("rule_density", "lateral", columns=["technique"]).columns.tolist() == ["technique"]
+
+    reloaded = PipelineResults.from_store(root=results.root)
+    assert reloaded.segments["lateral"] == LATERAL
+    assert reloaded.table("rule_density", "cloud")["rule_count"].tolist() == [2, 0]
+
+
+def test_lorenz_stage(results, tmp_path):
+    ginis = run_lorenz(results, out_dir=str(tmp_path / "figures"))
+    assert ginis == {"cloud": pytest.approx(calculate_gini([2, 0])), "lateral": pytest.approx(calculate_gini([3, 1]))}
+    assert (tmp_path / "figures" / "lorenz_curve.png").stat().st_size > 0
+
+
+def test_latex_stage(results, tmp_path):
+    out = tmp_path / "latex" / "summary.tex"
+    table = run_latex_export(results, out_path=str(out), n_resamples=200)
+    assert out.read_text(encoding="utf-8") == table + "\n"
+    assert "\\# Techniques & 2 & 2 \\\\" in table
+    assert "Coverage (rule>0) & 0.50 & 1.00 \\\\" in table
+    assert "Mean Rule Density & 1.00 & 2.00 \\\\" in table
+    assert "tab:coverage-ci" in table
+
+
+def test_timeline_stage(results, tmp_path):
+    timeline = run_timeline(results, out_dir=str(tmp_path / "figures"))
+    assert timeline.index.tolist() == [2018, 2019, 2021]
+    assert timeline["Cloud"].tolist() == [1, 2, 2]
+    assert timeline["Lateral"].tolist() == [0, 1, 3]
+    assert (tmp_path / "figures" / "timeline_growth.png").exists()
+
+
+def test_timeline_without_dated_rules(tmp_path):
+    res = PipelineResults([], {"cloud": CLOUD, "lateral": LATERAL}, {}, {"x.yml": {"date": None}})
+    assert run_timeline(res, out_dir=str(tmp_path)).empty
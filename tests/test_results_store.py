@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.results_store import HAVE_ARROW, ResultsStore, load_manifest, read_table
+
+FORMATS = ["csv"] + (["parquet", "arrow"] if HAVE_ARROW else [])
+
+
+def _density(n, offset=0):
+    return pd.DataFrame(
+        {
+            "technique": [f"T{1000 + offset + i}" for i in range(n)],
+            "rule_count": np.arange(n, dtype="int64"),
+            "coverage": np.linspace(0, 1, n),
+        }
+    )
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip_projection_and_segments(tmp_path, fmt):
+    store = ResultsStore(str(tmp_path), fmt=fmt)
+    cloud, lateral = _density(3), _density(2, offset=10)
+    store.write("rule_density", cloud, segment="cloud")
+    store.write("rule_density", lateral, segment="lateral")
+    store.write("summary", pd.DataFrame({"metric": ["a"], "value": [1.5]}))
+
+    root = str(tmp_path)
+    pd.testing.assert_frame_equal(read_table("rule_density", segments="cloud", root=root), cloud, check_dtype=False)
+    assert read_table("rule_density", segments="cloud", root=root)["rule_count"].dtype == np.int64
+
+    both = read_table("rule_density", columns=["technique", "segment"], root=root)
+    assert list(both.columns) == ["technique", "segment"]
+    assert both["segment"].tolist() == ["cloud"] * 3 + ["lateral"] * 2
+
+    only = read_table("rule_density", columns=["coverage"], segments=["lateral"], root=root)
+    assert list(only.columns) == ["coverage"] and len(only) == 2
+    assert read_table("summary", root=root)["value"].tolist() == [1.5]
+
+    with pytest.raises(KeyError):
+        read_table("rule_density", segments="missing", root=root)
+
+
+def test_csv_dtypes_are_kept_per_segment(tmp_path):
+    store = ResultsStore(str(tmp_path), fmt="csv")
+    store.write("gap", pd.DataFrame({"technique": ["T1"], "count": [3]}), segment="cloud")
+    store.write("gap", pd.DataFrame({"technique": ["T2", "T3"], "count": [1.0, np.nan]}), segment="lateral")
+
+    table = load_manifest(str(tmp_path))["tables"]["gap"]
+    assert table["segments"]["cloud"]["columns"]["count"] == "int64"
+    assert table["segments"]["lateral"]["columns"]["count"] == "float64"
+    assert read_table("gap", segments="cloud", root=str(tmp_path))["count"].dtype == np.int64
+    lateral = read_table("gap", segments="lateral", root=str(tmp_path))
+    assert lateral["count"].dtype == np.float64 and lateral["count"].isna().sum() == 1
+
+
+def test_second_writer_extends_the_manifest(tmp_path):
+    root = str(tmp_path)
+    first = ResultsStore(root, fmt="csv")
+    first.write("rule_density", _density(3), segment="cloud")
+    first.write("rule_density", _density(2), segment="lateral")
+
+    second = ResultsStore(root, fmt="csv")
+    second.write("version_diff", pd.DataFrame({"version": ["v1"], "rules": [10]}))
+
+    assert set(load_manifest(root)["tables"]) == {"rule_density", "version_diff"}
+    assert len(read_table("rule_density", segments="lateral", root=root)) == 2
+
+
+def test_rewrite_drops_stale_segments(tmp_path):
+    root = str(tmp_path)
+    first = ResultsStore(root, fmt="csv")
+    first.write("rule_density", _density(3), segment="cloud")
+    first.write("rule_density", _density(2), segment="retired")
+    stale = os.path.join(root, "rule_density", "retired.csv")
+    assert os.path.exists(stale)
+
+    second = ResultsStore(root, fmt="csv")
+    second.write("rule_density", _density(4), segment="cloud")
+
+    table = load_manifest(root)["tables"]["rule_density"]
+    assert list(table["segments"]) == ["cloud"]
+    assert not os.path.exists(stale)
+    assert len(read_table("rule_density", root=root)) == 4
+
+
+@pytest.mark.skipif(not HAVE_ARROW, reason="pyarrow not installed")
+def test_format_switch_keeps_other_tables_readable(tmp_path):
+    root = str(tmp_path)
+    ResultsStore(root, fmt="parquet").write("rule_density", _density(3), segment="cloud")
+    store = ResultsStore(root, fmt="csv")
+    store.write("summary", pd.DataFrame({"metric": ["a"], "value": [1]}))
+    store.write("rule_density", _density(2), segment="cloud")
+
+    assert not os.path.exists(os.path.join(root, "rule_density", "cloud.parquet"))
+    assert len(read_table("rule_density", segments="cloud", root=root)) == 2
+    assert read_table("summary", root=root)["value"].tolist() == [1]
+
+
+def test_legacy_csv_fallback_and_export(tmp_path):
+    csv_dir = tmp_path / "output"
+    store = ResultsStore(str(tmp_path / "results"), fmt="csv", csv_export=True, csv_dir=str(csv_dir))
+    store.write("rule_density", _density(3), segment="cloud")
+    store.write("rule_density", _density(2), segment="lateral")
+    assert (csv_dir / "rule_density_cloud.csv").exists()
+
+    empty = str(tmp_path / "no_store")
+    df = read_table("rule_density", columns=["technique", "segment"], segments=["cloud", "lateral"],
+                    root=empty, csv_dir=str(csv_dir))
+    assert df["segment"].tolist() == ["cloud"] * 3 + ["lateral"] * 2
+    with pytest.raises(FileNotFoundError):
+        read_table("unknown", root=empty, csv_dir=str(csv_dir))
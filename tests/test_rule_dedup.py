@@ -0,0 +1,100 @@
+import itertools
+import tracemalloc
+
+import pandas as pd
+
+from scripts import rule_dedup
+from scripts.rule_dedup import compute_dedup_metrics, dedup_sigma_map, find_duplicate_rules, rule_shingles
+
+
+def _rule(product, values, title="rule"):
+    return {
+        "title": title,
+        "log_product": product,
+        "log_category": "process_creation",
+        "detection": {
+            "selection": {"CommandLine|contains": values, "Image|endswith": "\\powershell.exe"},
+            "condition": "selection",
+        },
+    }
+
+
+def test_forks_across_product_folders_cluster():
+    values = ["-enc", "-nop", "-w hidden", "iex", "downloadstring"]
+    rule_meta = {
+        "windows/a.yml": _rule("windows", values),
+        "linux/b.yml": _rule("linux", values),
+        "windows/c.yml": _rule("windows", ["whoami", "net user", "net group"]),
+    }
+    assert "log_product=windows" not in rule_shingles(rule_meta["windows/a.yml"])
+    assert "log_product=windows" in rule_shingles(rule_meta["windows/a.yml"], logsource=True)
+    df = find_duplicate_rules(rule_meta, threshold=0.8)
+    assert sorted(df["path"]) == ["linux/b.yml", "windows/a.yml"]
+    assert set(df["representative"]) == {"linux/b.yml"}
+
+
+def test_dedup_map_keeps_a_member_tagged_with_the_technique():
+    df_dups = pd.DataFrame(
+        {
+            "cluster": [0, 0, 0],
+            "path": ["a.yml", "b.yml", "c.yml"],
+            "title": ["", "", ""],
+            "cluster_size": [3, 3, 3],
+            "representative": ["a.yml", "a.yml", "a.yml"],
+        }
+    )
+    sigma_map = {"T1": ["b.yml", "a.yml", "x.yml"], "T2": ["c.yml", "b.yml"], "T3": ["x.yml"]}
+    dedup = dedup_sigma_map(sigma_map, df_dups)
+    assert dedup == {"T1": ["a.yml", "x.yml"], "T2": ["c.yml"], "T3": ["x.yml"]}
+
+    techniques = [{"id": t, "name": t} for t in ("T1", "T2", "T3")]
+    df = compute_dedup_metrics(techniques, sigma_map, dedup).set_index("technique")
+    assert df["dedup_rule_count"].to_dict() == {"T1": 2, "T2": 1, "T3": 1}
+    assert df["redundant_covered"].to_dict() == {"T1": 1, "T2": 1, "T3": 0}
+    assert df["dedup_redundant_covered"].to_dict() == {"T1": 1, "T2": 0, "T3": 0}
+
+
+def _template_rules(n, shared=20):
+    common = [f"common{k}" for k in range(shared)]
+    return {
+        f"r{i}.yml": {"detection": {"sel": {"CommandLine|contains": common + [f"u{i}"]}, "condition": "sel"}}
+        for i in range(n)
+    }
+
+
+def test_lsh_candidates_match_brute_force_band_sharing():
+    shingles = [rule_shingles(m) for m in _template_rules(40, shared=3).values()]
+    shingles += [{f"x{i}", f"y{i % 5}", "z"} for i in range(40)]
+    sigs = rule_dedup.minhash_signatures(shingles)
+    bands, rows = 32, 4
+    expected = {
+        (i, j)
+        for i, j in itertools.combinations(range(len(sigs)), 2)
+        if any((sigs[i, b * rows:(b + 1) * rows] == sigs[j, b * rows:(b + 1) * rows]).all() for b in range(bands))
+    }
+    assert {tuple(p) for p in rule_dedup._lsh_candidates(sigs, bands).tolist()} == expected
+
+
+def test_large_buckets_are_split_around_pivots(monkeypatch):
+    monkeypatch.setattr(rule_dedup, "MAX_BUCKET", 8)
+    rule_meta = _template_rules(300)
+    sigs = rule_dedup.minhash_signatures([rule_shingles(m) for m in rule_meta.values()])
+    pairs = rule_dedup._lsh_candidates(sigs, 32, min_agree=0.7)
+    # All-pairs expansion would give 300 * 299 / 2 = 44850 candidates.
+    assert len(pairs) < 300 * rule_dedup.MAX_PIVOTS
+    df = find_duplicate_rules(rule_meta, threshold=0.8)
+    assert len(df) > 0.9 * len(rule_meta)
+
+
+def test_minhash_batches_bound_memory(monkeypatch):
+    monkeypatch.setattr(rule_dedup, "BATCH_BYTES", 2 << 20)
+    shingles = [{f"t{i}_{k}" for k in range(50)} for i in range(4000)]
+    expected = rule_dedup.minhash_signatures(shingles[:10])
+    tracemalloc.start()
+    try:
+        sigs = rule_dedup.minhash_signatures(shingles)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < sigs.nbytes + 1.5 * rule_dedup.BATCH_BYTES
+    assert (sigs[:10] == expected).all()
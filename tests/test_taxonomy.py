@@ -0,0 +1,93 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from scripts import parse_mitre
+from scripts.metrics import compute_segment_coverage
+from scripts.parse_mitre import get_cloud_techniques, get_lateral_techniques
+from scripts.taxonomy import Taxonomy, load_taxonomy
+
+# The hard-coded heuristic the default config/taxonomy.yml replaces.
+LEGACY_CLOUD_KEYS = {
+    "AWS", "AZURE", "GCP", "AZURE AD", "OFFICE 365", "SAAS", "IAAS", "GOOGLE WORKSPACE",
+    "GOOGLE CLOUD PLATFORM", "MICROSOFT 365", "O365", "CONTAINER", "KUBERNETES",
+}
+
+
+def legacy_cloud(techniques):
+    return [
+        t for t in techniques
+        if any(any(k in p.upper() for k in LEGACY_CLOUD_KEYS) for p in t.get("platforms") or [])
+    ]
+
+
+def legacy_lateral(techniques):
+    return [t for t in techniques if "lateral-movement" in (t.get("killchain") or [])]
+
+
+PLATFORMS = ["Windows", "Linux", "macOS", "AWS", "Azure AD", "Office 365", "SaaS", "IaaS", "Google Workspace",
+             "Containers", "Network", "PRE", "Identity Provider", "ESXi"]
+TACTICS = ["initial-access", "execution", "lateral-movement", "collection", None]
+
+
+@pytest.fixture(scope="module")
+def techniques():
+    out = []
+    for i, (platforms, tactic) in enumerate(
+        itertools.product(itertools.combinations(PLATFORMS, 2), TACTICS)
+    ):
+        out.append({
+            "id": f"T{1000 + i}",
+            "platforms": list(platforms),
+            "killchain": [tactic] if tactic else [],
+        })
+    out.append({"id": "T9000", "platforms": None, "killchain": None})
+    return out
+
+
+def test_default_taxonomy_matches_legacy_heuristic(techniques):
+    assert get_cloud_techniques(techniques) == legacy_cloud(techniques)
+    assert get_lateral_techniques(techniques) == legacy_lateral(techniques)
+    segments = load_taxonomy().split(techniques)
+    assert segments["cloud"] == legacy_cloud(techniques)
+    assert segments["lateral"] == legacy_lateral(techniques)
+
+
+def test_ids_patterns_and_multi_membership():
+    taxonomy = Taxonomy({
+        "creds": {"tactics": ["credential-access"], "ids": ["t1078"]},
+        "subs": {"id_pattern": r"\.\d{3}$"},
+        "cloud": {"platforms": ["aws"]},
+    })
+    techniques = [
+        {"id": "T1078.004", "platforms": ["AWS"], "killchain": ["persistence"]},
+        {"id": "T1078", "platforms": ["Windows"], "killchain": []},
+        {"id": "T1003", "platforms": ["Windows"], "killchain": ["credential-access"]},
+    ]
+    membership = taxonomy.membership(techniques)
+    assert membership.tolist() == [[False, True, True], [True, False, False], [True, False, False]]
+
+    df = compute_segment_coverage(techniques, {"T1003": ["a.yml"], "T1078.004": ["b.yml"]}, taxonomy, membership)
+    assert df["techniques"].tolist() == [2, 1, 1]
+    assert df["covered"].tolist() == [1, 1, 1]
+    assert np.allclose(df["coverage"], [0.5, 1.0, 1.0])
+
+
+@pytest.mark.parametrize(
+    "segments, message",
+    [
+        ({"empty": {}}, "has no platforms"),
+        ({"typo": {"platform": ["AWS"]}}, "Unknown criteria"),
+    ],
+)
+def test_invalid_segments(segments, message):
+    with pytest.raises(ValueError, match=message):
+        Taxonomy(segments)
+
+
+def test_wrappers_without_cloud_or_lateral(monkeypatch, techniques, capsys):
+    monkeypatch.setattr(parse_mitre, "load_taxonomy", lambda: Taxonomy({"other": {"platforms": ["Linux"]}}))
+    assert get_cloud_techniques(techniques) == []
+    assert get_lateral_techniques(techniques) == []
+    assert "defines no 'cloud' segment" in capsys.readouterr().out
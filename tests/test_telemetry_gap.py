@@ -0,0 +1,57 @@
+import pytest
+
+from scripts.telemetry_gap import compute_telemetry_gap, logsource_components
+
+
+def _rule(product=None, service=None, category=None):
+    return {"log_product": product, "log_service": service, "log_category": category}
+
+
+def test_logsource_components_resolution_order():
+    assert logsource_components("windows", None, "process_creation") == {"Process Creation", "Command Execution"}
+    assert logsource_components("Windows", "Security", None) >= {"Logon Session Creation"}
+    # Product is only a fallback when neither category nor service is known.
+    assert logsource_components("aws", "cloudtrail", None) >= {"Cloud Storage Access"}
+    assert logsource_components("m365", None, None) == {"Application Log Content", "Logon Session Creation"}
+    assert logsource_components("unknown", None, None) == frozenset()
+
+
+def test_telemetry_gap_and_coverage_ratio():
+    techniques = [
+        {"id": "T1059", "name": "Interpreter", "data_components": ["Process Creation", "Command Execution",
+                                                                   "Script Execution", "Module Load"]},
+        {"id": "t1078.004", "name": "Cloud Accounts", "data_components": ["Logon Session Creation",
+                                                                          "User Account Authentication"]},
+        {"id": "T1021", "name": "Remote Services", "data_components": ["Network Traffic Flow"]},
+        {"id": "T1595", "name": "Active Scanning", "data_components": []},
+    ]
+    sigma_map = {
+        "T1059": ["proc.yml", "ps.yml"],
+        "T1078.004": ["signin.yml"],
+    }
+    rule_meta = {
+        "proc.yml": _rule("windows", None, "process_creation"),
+        "ps.yml": _rule("windows", None, "ps_script"),
+        "signin.yml": _rule("azure", "signinlogs", None),
+    }
+    df = compute_telemetry_gap(techniques, sigma_map, rule_meta).set_index("technique")
+
+    assert list(df.index) == ["T1059", "T1078.004", "T1021"]
+    row = df.loc["T1059"]
+    assert row["sigma_telemetry"] == "Command Execution; Process Creation; Script Execution"
+    assert row["required_count"] == 4 and row["provided_count"] == 3 and row["gap_count"] == 1
+    assert row["telemetry_coverage"] == pytest.approx(0.75)
+    assert row["telemetry_gap"] == pytest.approx(0.25)
+    assert df.loc["T1078.004", "telemetry_coverage"] == 1.0
+    assert df.loc["T1021", "telemetry_gap"] == 1.0 and df.loc["T1021", "sigma_telemetry"] == ""
+    assert ((df["telemetry_coverage"] + df["telemetry_gap"]) == 1.0).all()
+
+
+def test_custom_table_and_empty_input():
+    table = {"category": {"proxy": ("Web Traffic",)}, "service": {}, "product": {}}
+    techniques = [{"id": "T1071", "name": "Web Protocols", "data_components": ["Web Traffic"]}]
+    df = compute_telemetry_gap(techniques, {"T1071": ["p.yml"]}, {"p.yml": _rule(category="proxy")}, table=table)
+    assert df["telemetry_gap"].tolist() == [0.0]
+
+    empty = compute_telemetry_gap([], {}, {})
+    assert empty.empty and "telemetry_gap" in empty.columns
@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from scripts.results_store import ResultsStore, load_manifest, read_table
+from scripts.version_diff import diff_versions, save_results
+
+
+def _bundle(path, techniques):
+    objects = [
+        {
+            "type": "attack-pattern",
+            "id": f"attack-pattern--{i}",
+            "name": name,
+            "external_references": [{"source_name": "mitre-attack", "external_id": tid}],
+            "x_mitre_platforms": platforms,
+            "kill_chain_phases": [{"kill_chain_name": "mitre-attack", "phase_name": tactic}],
+        }
+        for i, (tid, name, platforms, tactic) in enumerate(techniques)
+    ]
+    path.write_text(json.dumps({"type": "bundle", "objects": objects}))
+    return str(path)
+
+
+def _rule(directory, name, rule_id, techniques):
+    directory.mkdir(parents=True, exist_ok=True)
+    tags = "".join(f"    - attack.{t.lower()}\n" for t in techniques)
+    (directory / name).write_text(
+        f"title: {name}\nid: {rule_id}\ntags:\n{tags}logsource:\n    product: windows\n"
+        "detection:\n    sel:\n        Image: x\n    condition: sel\n"
+    )
+
+
+TECHNIQUES = [
+    ("T1078", "Valid Accounts", ["AWS", "Windows"], "initial-access"),
+    ("T1021", "Remote Services", ["Windows"], "lateral-movement"),
+]
+
+
+def test_diff_between_rule_directories(tmp_path):
+    attack = _bundle(tmp_path / "attack.json", TECHNIQUES)
+    old, new = tmp_path / "old", tmp_path / "new"
+    _rule(old, "a.yml", "id-a", ["T1078"])
+    _rule(new / "moved", "a.yml", "id-a", ["T1078"])  # moved, same id: not a change
+    _rule(new, "b.yml", "id-b", ["T1021"])
+
+    df, summary = diff_versions([attack], [str(old), str(new)], workers=1)
+    assert df.set_index("technique")["coverage_change"].to_dict() == {"T1021": "gained"}
+    row = summary.iloc[0]
+    assert (row.rules_added, row.rules_removed, row.rules_changed) == (1, 0, 0)
+    assert (row.cloud_coverage_base, row.lateral_coverage_target) == (1.0, 1.0)
+
+
+def test_duplicate_ids_in_one_revision_are_kept_apart(tmp_path, capsys):
+    attack = _bundle(tmp_path / "attack.json", TECHNIQUES)
+    old, new = tmp_path / "old", tmp_path / "new"
+    _rule(old, "a.yml", "same", ["T1078"])
+    _rule(new, "a.yml", "same", ["T1078"])
+    _rule(new, "b.yml", "same", ["T1021"])
+
+    df, summary = diff_versions([attack], [str(old), str(new)], workers=1)
+    assert summary.iloc[0].rules_added == 1
+    assert df.set_index("technique").loc["T1021", "rules_target"] == 1
+    assert "reuse a Sigma id" in capsys.readouterr().out
+
+
+def test_taxonomy_without_cloud_or_lateral(tmp_path, capsys):
+    attack = _bundle(tmp_path / "attack.json", TECHNIQUES)
+    taxonomy = tmp_path / "taxonomy.yml"
+    taxonomy.write_text("segments:\n  access:\n    tactics: [initial-access]\n")
+    old, new = tmp_path / "old", tmp_path / "new"
+    _rule(old, "a.yml", "id-a", ["T1078"])
+    _rule(new, "b.yml", "id-b", ["T1021"])
+
+    _, summary = diff_versions([attack], [str(old), str(new)], workers=1, taxonomy=str(taxonomy))
+    assert summary.iloc[0].cloud_coverage_base == 0.0
+    assert "defines no 'cloud' segment" in capsys.readouterr().out
+
+
+def test_saving_keeps_the_main_run_tables(tmp_path):
+    root = str(tmp_path / "results")
+    main_store = ResultsStore(root, fmt="csv")
+    main_store.write("rule_density", pd.DataFrame({"technique": ["T1"], "rule_count": [2]}), segment="cloud")
+
+    save_results(pd.DataFrame({"technique": ["T1"]}), pd.DataFrame({"base": ["a"], "target": ["b"]}),
+                 fmt="csv", root=root)
+
+    assert set(load_manifest(root)["tables"]) == {"rule_density", "version_diff", "version_diff_summary"}
+    assert read_table("rule_density", segments="cloud", root=root)["rule_count"].tolist() == [2]
+    assert read_table("version_diff_summary", root=root)["target"].tolist() == ["b"]
+
+
+def test_cli_rejects_unknown_output_format():
+    proc = subprocess.run(
+        [sys.executable, "-m", "scripts.version_diff", "--output-format", "parqet"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    assert proc.returncode == 2
+    assert "invalid choice: 'parqet'" in proc.stderr